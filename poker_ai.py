@@ -0,0 +1,607 @@
+# 服务器端的机器人（填补空座位、接替断线的玩家）
+# 叫分：安装了 numpy 时用 poker_estimate 模拟估计当地主的胜率，否则按大牌和炸弹估计手牌的强弱
+# 出牌：在限定的时间内反复搜索，时间到了返回当前最好的出牌（随时可以停止，时间预算是硬性的，避免一桌机器人占满 CPU）
+#   每次搜索把没有见过的牌随机分给另外两个玩家（牌数与实际相同，地主手中还没出的底牌是已知的），
+#   用 UCB 选择一个候选出牌，按快速的规则策略模拟到一局结束，统计本方的胜率
+#   模拟策略是确定的，同一个局面的结果也是确定的：置换表保存模拟经过的每个局面的胜利者，
+#   残局时没有见过的牌很少，不同的随机分配常常得到相同的局面，可以直接查表
+# 搜索中的手牌用牌型签名表示（每个点数 5 位的牌数），出牌就是签名相减
+
+import math
+import time
+import random
+
+try:
+    from poker_estimate import WinEstimator
+except ImportError:
+    WinEstimator = None  # 没有安装 numpy 时叫分只按大牌估计
+
+from poker_rules import PlayTable, CARD_ORDER_TYPE, RANK_COUNT, RANK_POWERS, PLAY_MAX_CARDS, SIGNATURE_BITS, \
+    get_signature_size, make_signature
+
+BOMB_TYPE = CARD_ORDER_TYPE['炸弹']
+ROCKET_TYPE = CARD_ORDER_TYPE['王炸']
+BOMB_TYPES = (BOMB_TYPE, ROCKET_TYPE)
+BID_RATES = (0.55, 0.65, 0.75)  # 估计的地主胜率达到第 i 个值时叫 i + 1 分（规则策略模拟中地主先出牌、多 3 张底牌，胜率普遍偏高）
+SIMPLE_TYPES = {CARD_ORDER_TYPE['一张']: 1, CARD_ORDER_TYPE['一对']: 2, CARD_ORDER_TYPE['三张']: 3}  # 只有一个点数的牌型 -> 牌数
+ROCKET_SIGNATURE = make_signature({13: 1, 14: 1})
+RANK_MASK = (1 << SIGNATURE_BITS) - 1
+
+
+# 叫分：2、大小王、A 和炸弹越多分数越高，叫分不超过当前最高叫分时不叫（0）
+def bid(counts, max_mark=0):
+    score = counts[14] * 4 + counts[13] * 3 + counts[12] * 2 + counts[11]
+    score += 4 * sum(1 for count in counts[:13] if count == 4)
+    if counts[13] and counts[14]:
+        score += 2
+    mark = 3 if score >= 14 else 2 if score >= 10 else 1 if score >= 7 else 0
+    return mark if mark > max_mark else 0
+
+
+# 按模拟估计的地主胜率叫分，estimator 为 None 时按大牌估计（bid）；deadline 为 time.perf_counter() 的截止时间
+# 截止时间之前来不及模拟时也按大牌估计
+def estimate_bid(counts, max_mark=0, estimator=None, deadline=None):
+    if estimator is None:
+        return bid(counts, max_mark)
+    rate = estimator.estimate(counts, deadline)[0]
+    if estimator.get_games() == 0:
+        return bid(counts, max_mark)
+    mark = sum(1 for bid_rate in BID_RATES if rate >= bid_rate)
+    return mark if mark > max_mark else 0
+
+
+# 机器人看到的局面（只包含这个座位能知道的信息）
+class TableView:
+
+    # seat 为自己的座位下标，signature 为自己的手牌，sizes 为三个座位的剩余牌数
+    # unseen 为另外两个座位手牌的合计（全部牌减去自己的手牌和已经出过的牌），known 为每个座位已知的牌（地主手中还没出的底牌）
+    # last 为上次出牌 (出牌类型, 权值, 牌数)，出任意牌时为 None；last_index 为上次出牌的座位下标
+    def __init__(self, seat, landlord_index, signature, sizes, unseen, known, last, last_index):
+        self.__seat = seat
+        self.__landlord_index = landlord_index
+        self.__signature = signature
+        self.__sizes = list(sizes)
+        self.__unseen = unseen
+        self.__known = list(known)
+        self.__last = last
+        self.__last_index = last_index
+
+    def get_seat(self):
+        return self.__seat
+
+    def get_landlord_index(self):
+        return self.__landlord_index
+
+    def get_signature(self):
+        return self.__signature
+
+    def get_sizes(self):
+        return self.__sizes.copy()
+
+    def get_unseen(self):
+        return self.__unseen
+
+    def get_known(self):
+        return self.__known.copy()
+
+    def get_last(self):
+        return self.__last
+
+    def get_last_index(self):
+        return self.__last_index
+
+
+# 出牌搜索
+class SearchPlayer:
+    BUDGET = 0.1  # 每次出牌的搜索秒数
+    MAX_CANDIDATES = 2  # 出牌类型、权值、牌数都相同（只是带的牌不同）的候选出牌最多保留几个（带的牌最小的）
+    MAX_TABLE_SIZE = 200000  # 置换表超过这个大小时清空
+    MAX_CACHE_SIZE = 100000  # 出牌缓存超过这个大小时清空
+    EXPLORATION = 0.7  # UCB 的探索系数
+    ENDGAME_CARDS = 15  # 三个玩家的剩余牌数合计不超过这个数时用残局求解器代替模拟
+    CHECK_STEPS = 8  # 模拟时每隔几步检查一次是否超时
+    __moves = {}  # (手牌签名, 上次出牌) -> 能出的牌 (牌型签名, 出牌类型, 权值, 牌数) 的元组（所有搜索共用的缓存）
+
+    # max_playouts 为每次出牌最多的模拟次数（None 为不限制，只受时间预算限制；模拟时限制次数使结果与机器的速度无关）
+    def __init__(self, budget=None, rng=None, max_playouts=None):
+        self.__budget = budget if budget is not None else SearchPlayer.BUDGET
+        self.__rng = rng if rng is not None else random.Random()
+        self.__max_playouts = max_playouts
+        self.__table = {}  # 置换表：局面 -> 按模拟策略出牌的胜利者下标
+        self.__solver = EndgameSolver()  # 残局求解器（置换表在多次出牌之间共用）
+        self.__playouts = 0  # 上次搜索的模拟次数
+
+    def get_budget(self):
+        return self.__budget
+
+    def get_playouts(self):
+        return self.__playouts
+
+    def set_rng(self, rng):
+        self.__rng = rng
+
+    # 一手牌能出的所有牌（弱的在前，炸弹在后；权值相同时牌数多的在前）
+    @staticmethod
+    def get_moves(signature, last=None):
+        key = (signature, last)
+        moves = SearchPlayer.__moves.get(key)
+        if moves is None:
+            if len(SearchPlayer.__moves) >= SearchPlayer.MAX_CACHE_SIZE:
+                SearchPlayer.__moves.clear()
+            counts = [signature >> rank_index * SIGNATURE_BITS & RANK_MASK for rank_index in range(RANK_COUNT)]
+            moves = [(move, card_type, power, get_signature_size(move))
+                     for move, card_type, power in PlayTable.generate_count_moves(counts, last)]
+            moves.sort(key=lambda move: (move[1] in BOMB_TYPES, move[2], -move[3], move[0]))
+            moves = tuple(moves)
+            SearchPlayer.__moves[key] = moves
+        return moves
+
+    # 模拟策略：能一次出完就出完；跟牌时不压同伴，压对手用最小的牌，对手快出完时才用炸弹；
+    # 出任意牌时从最小的点数开始出（能连成顺子、连对的先出，三张带最小的单张或对子，不拆炸弹），
+    # 下家是只剩一张牌的对手时避免出单张
+    # 模拟时每一步都是新的手牌，生成全部出牌太慢，这里直接按每个点数的牌数选择
+    @staticmethod
+    def policy(hands, sizes, turn, last, last_index, landlord_index):
+        hand = hands[turn]
+        size = sizes[turn]
+        if size <= PLAY_MAX_CARDS:
+            whole = PlayTable.classify(hand)
+            if whole is not None and (last is None or PlayTable.beats(whole[0], whole[1], size, last)):
+                return hand, whole[0], whole[1], size
+
+        if last is not None:
+            if turn != landlord_index and last_index != landlord_index:
+                return None
+            return SearchPlayer.__follow(hand, last, sizes[last_index] <= 4)
+
+        next_index = (turn + 1) % 3
+        avoid_single = sizes[next_index] == 1 and (turn == landlord_index or next_index == landlord_index)
+        return SearchPlayer.__lead(hand, avoid_single)
+
+    # 跟牌：能压过 last 的最小的牌（单张、对子、三张优先不拆更多的同点数牌），allow_bomb 为 False 时不用炸弹
+    @staticmethod
+    def __follow(hand, last, allow_bomb):
+        last_type, last_power, last_size = last
+        if last_type is ROCKET_TYPE:
+            return None
+
+        count = SIMPLE_TYPES.get(last_type)
+        if count is not None:
+            for exact in (True, False):
+                for rank_index in range(RANK_COUNT):
+                    have = hand >> rank_index * SIGNATURE_BITS & RANK_MASK
+                    if RANK_POWERS[rank_index] > last_power and (have == count if exact else count < have < 4):
+                        return count << rank_index * SIGNATURE_BITS, last_type, RANK_POWERS[rank_index], count
+        elif last_type is not BOMB_TYPE:
+            moves = SearchPlayer.get_moves(hand, last)
+            if moves and moves[0][1] not in BOMB_TYPES:
+                return moves[0]
+
+        if not allow_bomb:
+            return None
+        for rank_index in range(13):
+            if hand >> rank_index * SIGNATURE_BITS & RANK_MASK == 4:
+                if last_type is not BOMB_TYPE or RANK_POWERS[rank_index] > last_power:
+                    return 4 << rank_index * SIGNATURE_BITS, BOMB_TYPE, RANK_POWERS[rank_index], 4
+        if hand & ROCKET_SIGNATURE == ROCKET_SIGNATURE:
+            return ROCKET_SIGNATURE, ROCKET_TYPE, RANK_POWERS[14], 2
+        return None
+
+    # 出任意牌：从最小的点数开始选择
+    @staticmethod
+    def __lead(hand, avoid_single):
+        counts = [hand >> rank_index * SIGNATURE_BITS & RANK_MASK for rank_index in range(RANK_COUNT)]
+        ranks = [rank_index for rank_index in range(RANK_COUNT) if counts[rank_index] > 0]
+        singles = []
+        for rank_index in ranks:
+            count = counts[rank_index]
+            if count == 4:
+                continue
+            shift = rank_index * SIGNATURE_BITS
+
+            # 顺子、连对：从这个点数开始尽量长（2 和大小王不能连）
+            for width, min_length in ((1, 5), (2, 3)):
+                end = rank_index
+                while end + 1 < 12 and width <= counts[end + 1] < 4:
+                    end += 1
+                if count >= width and end - rank_index + 1 >= min_length:
+                    signature = sum(width << index * SIGNATURE_BITS for index in range(rank_index, end + 1))
+                    return SearchPlayer.__make_move(signature)
+
+            if count == 3:
+                for kicker_count in (1, 2):
+                    for kicker in ranks:
+                        if kicker != rank_index and counts[kicker] == kicker_count and kicker < 12:
+                            return SearchPlayer.__make_move((3 << shift) + (kicker_count << kicker * SIGNATURE_BITS))
+            if count == 1 and avoid_single:
+                singles.append(rank_index)
+                continue
+            return SearchPlayer.__make_move(count << shift)
+
+        if singles:
+            return SearchPlayer.__make_move(1 << singles[-1] * SIGNATURE_BITS)
+        # 只剩炸弹和王炸
+        if hand & ROCKET_SIGNATURE == ROCKET_SIGNATURE:
+            return SearchPlayer.__make_move(ROCKET_SIGNATURE)
+        return SearchPlayer.__make_move(4 << ranks[0] * SIGNATURE_BITS)
+
+    @staticmethod
+    def __make_move(signature):
+        card_type, power = PlayTable.classify(signature)
+        return signature, card_type, power, get_signature_size(signature)
+
+    # 从一个局面按模拟策略出牌到一局结束，返回胜利者下标；超过 deadline 时返回 None
+    def rollout(self, hands, sizes, turn, last, last_index, landlord_index, deadline):
+        table = self.__table
+        policy = SearchPlayer.policy
+        path = []
+        steps = 0
+        while True:
+            if last is None:
+                last_index = turn
+            key = (hands[0], hands[1], hands[2], turn, last, last_index)
+            winner = table.get(key)
+            if winner is not None:
+                break
+            path.append(key)
+
+            move = policy(hands, sizes, turn, last, last_index, landlord_index)
+            if move is not None:
+                hands[turn] -= move[0]
+                sizes[turn] -= move[3]
+                if sizes[turn] == 0:
+                    winner = turn
+                    break
+                last = (move[1], move[2], move[3])
+                last_index = turn
+
+            turn = (turn + 1) % 3
+            if turn == last_index:
+                last = None
+
+            steps += 1
+            if steps % SearchPlayer.CHECK_STEPS == 0 and time.perf_counter() > deadline:
+                return None
+
+        if len(table) + len(path) > SearchPlayer.MAX_TABLE_SIZE:
+            table.clear()
+        for key in path:
+            table[key] = winner
+        return winner
+
+    # 把没有见过的牌随机分给另外两个座位（已知的牌先分给对应的座位）
+    def determinize(self, view):
+        seat = view.get_seat()
+        sizes = view.get_sizes()
+        known = view.get_known()
+        hands = [0, 0, 0]
+        hands[seat] = view.get_signature()
+
+        rest = view.get_unseen()
+        for index in range(3):
+            if index != seat:
+                hands[index] = known[index]
+                rest -= known[index]
+
+        rank_list = []
+        for rank_index in range(RANK_COUNT):
+            rank_list.extend([rank_index] * (rest >> rank_index * SIGNATURE_BITS & RANK_MASK))
+        self.__rng.shuffle(rank_list)
+
+        position = 0
+        for index in range(3):
+            if index == seat:
+                continue
+            need = sizes[index] - get_signature_size(known[index])
+            for rank_index in rank_list[position:position + need]:
+                hands[index] += 1 << rank_index * SIGNATURE_BITS
+            position += need
+        return hands
+
+    # 根据局面的信息选择出牌，返回 (牌型签名, 出牌类型, 权值, 牌数)，不出时返回 None
+    def choose(self, view):
+        self.__playouts = 0
+        deadline = time.perf_counter() + self.__budget
+        seat = view.get_seat()
+        landlord_index = view.get_landlord_index()
+        last = view.get_last()
+        last_index = view.get_last_index()
+        size = view.get_sizes()[seat]
+
+        candidates = []
+        kinds = {}
+        for move in SearchPlayer.get_moves(view.get_signature(), last):
+            if move[3] == size:
+                return move
+            kind = move[1:]
+            if kinds.get(kind, 0) < SearchPlayer.MAX_CANDIDATES:
+                kinds[kind] = kinds.get(kind, 0) + 1
+                candidates.append(move)
+        if last is not None:
+            candidates.append(None)
+        if len(candidates) == 0:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+
+        wins = [0] * len(candidates)
+        visits = [0] * len(candidates)
+        total = 0
+        endgame = sum(view.get_sizes()) <= SearchPlayer.ENDGAME_CARDS
+        while time.perf_counter() < deadline and total != self.__max_playouts:
+            # UCB：先把每个候选出牌模拟一次
+            if total < len(candidates):
+                choice = total
+            else:
+                log_total = math.log(total)
+                choice = max(range(len(candidates)), key=lambda i: wins[i] / visits[i] +
+                             SearchPlayer.EXPLORATION * math.sqrt(log_total / visits[i]))
+
+            hands = self.determinize(view)
+            sizes = view.get_sizes()
+            move = candidates[choice]
+            next_last, next_last_index = last, last_index
+            if move is not None:
+                hands[seat] -= move[0]
+                sizes[seat] -= move[3]
+                next_last, next_last_index = (move[1], move[2], move[3]), seat
+            turn = (seat + 1) % 3
+            if turn == next_last_index:
+                next_last = None
+
+            # 残局时每次随机分配都用残局求解器求出准确的胜负，否则按模拟策略模拟
+            if endgame:
+                try:
+                    landlord_wins = self.__solver.solve(hands, landlord_index, turn, next_last, next_last_index, deadline)[0]
+                except SolverTimeout:
+                    break
+            else:
+                winner = self.rollout(hands, sizes, turn, next_last, next_last_index, landlord_index, deadline)
+                if winner is None:
+                    break
+                landlord_wins = winner == landlord_index
+            wins[choice] += 1 if landlord_wins == (seat == landlord_index) else 0
+            visits[choice] += 1
+            total += 1
+
+        self.__playouts = total
+        if total < len(candidates):
+            # 时间不够每个候选出牌模拟一次：按模拟策略出牌
+            hands = [0, 0, 0]
+            hands[seat] = view.get_signature()
+            return SearchPlayer.policy(hands, view.get_sizes(), seat, last, last_index, landlord_index)
+        best = max(range(len(candidates)), key=lambda i: (wins[i] / visits[i], -i))
+        return candidates[best]
+
+
+# 残局求解超时
+class SolverTimeout(Exception):
+    pass
+
+
+# 残局求解：三个玩家的手牌都已知（完全信息，残局时手牌很少）时，求出双方都按最优出牌时地主能否获胜
+# 地主一方对抗两个合作的农民，用布尔值的 alpha-beta（AND/OR 搜索）：找到一个让出牌一方获胜的出牌就不再搜索其余的出牌
+# 置换表按 (三个手牌的签名, 出牌的座位, 上次出牌, 上次出牌的座位) 保存结果，签名与花色无关，
+# 不同顺序到达的同一个局面只求解一次，置换表在多次求解之间共用（同一个地主）
+class EndgameSolver:
+    MAX_TABLE_SIZE = 2000000  # 置换表超过这个大小时清空
+    CHECK_NODES = 256  # 每搜索几个局面检查一次是否超时
+    __ordered = {}  # (手牌签名, 上次出牌) -> 按搜索顺序排列的出牌（所有求解共用的缓存）
+
+    def __init__(self):
+        self.__table = {}  # 局面 -> 地主是否获胜
+        self.__landlord_index = None
+        self.__nodes = 0  # 搜索过的局面数
+        self.__deadline = None
+
+    def get_nodes(self):
+        return self.__nodes
+
+    def get_table_size(self):
+        return len(self.__table)
+
+    # hands 为三个玩家每个点数的牌数（点数编号 -> 牌数）或者牌型签名，turn 为出牌的座位
+    # last 为上次出牌 (出牌类型, 权值, 牌数)，出任意牌时为 None；last_index 为上次出牌的座位
+    # 返回 (地主是否获胜, 出牌座位的出牌)：出牌一方能获胜时为获胜的出牌，否则为第一个出牌；出牌为 (牌型签名, 出牌类型, 权值, 牌数)，不出为 None
+    # deadline 为 time.perf_counter() 的截止时间，超过时抛出 SolverTimeout
+    def solve(self, hands, landlord_index, turn, last=None, last_index=None, deadline=None):
+        hands = tuple(hand if isinstance(hand, int) else make_signature(dict(enumerate(hand))) for hand in hands)
+        if landlord_index != self.__landlord_index:
+            self.__table.clear()
+            self.__landlord_index = landlord_index
+        if len(self.__table) > EndgameSolver.MAX_TABLE_SIZE:
+            self.__table.clear()
+        self.__deadline = deadline
+        if last is None or last_index is None:
+            last, last_index = None, turn
+
+        mover_wins = turn == landlord_index
+        options = list(self.__options(hands, turn, last, last_index))
+        for move, child in options:
+            landlord_wins = mover_wins if child is None else self.__landlord_wins(*child)
+            if landlord_wins == mover_wins:
+                return landlord_wins, move
+        return not mover_wins, options[0][0]
+
+    # 地主是否获胜
+    def __landlord_wins(self, hands, turn, last, last_index):
+        key = (hands, turn, last, last_index)
+        result = self.__table.get(key)
+        if result is not None:
+            return result
+
+        self.__nodes += 1
+        if self.__nodes % EndgameSolver.CHECK_NODES == 0 and self.__deadline is not None and \
+                time.perf_counter() > self.__deadline:
+            raise SolverTimeout()
+
+        mover_wins = turn == self.__landlord_index
+        result = not mover_wins
+        for move, child in self.__options(hands, turn, last, last_index):
+            if child is None or self.__landlord_wins(*child) == mover_wins:
+                result = mover_wins
+                break
+        self.__table[key] = result
+        return result
+
+    # 出牌座位的所有选择 (出牌, 之后的局面) 的生成器，一次出完时之后的局面为 None
+    # 先试一次出完，跟同伴的牌时先试不出，其余按出牌的牌数从多到少（尽快出完）、权值从小到大，最后试不出
+    def __options(self, hands, turn, last, last_index):
+        hand = hands[turn]
+        size = get_signature_size(hand)
+        if size <= PLAY_MAX_CARDS:
+            whole = PlayTable.classify(hand)
+            if whole is not None and (last is None or PlayTable.beats(whole[0], whole[1], size, last)):
+                yield (hand, whole[0], whole[1], size), None
+                return
+
+        next_index = (turn + 1) % 3
+        pass_option = None
+        if last is not None:
+            if next_index == last_index:
+                pass_option = (None, (hands, next_index, None, next_index))
+            else:
+                pass_option = (None, (hands, next_index, last, last_index))
+            if turn != self.__landlord_index and last_index != self.__landlord_index:
+                yield pass_option
+                pass_option = None
+
+        key = (hand, last)
+        moves = EndgameSolver.__ordered.get(key)
+        if moves is None:
+            if len(EndgameSolver.__ordered) >= SearchPlayer.MAX_CACHE_SIZE:
+                EndgameSolver.__ordered.clear()
+            moves = sorted(SearchPlayer.get_moves(hand, last), key=lambda move: (-move[3], move[2]))
+            EndgameSolver.__ordered[key] = moves
+        for move in moves:
+            next_hands = list(hands)
+            next_hands[turn] -= move[0]
+            yield move, (tuple(next_hands), next_index, (move[1], move[2], move[3]), turn)
+        if pass_option is not None:
+            yield pass_option
+
+
+# 测试
+def test():
+    from poker_rules import Hand, Card, Deck
+
+    def signature_of(names):
+        return Hand([Card.parse(name) for name in names.split()]).get_signature()
+
+    # 叫分
+    assert bid(Hand([Card.parse(name) for name in "大王 小王 ♥2 ♠2 ♣2 ◆2".split()]).get_counts()) == 3
+    assert bid(Hand([Card.parse(name) for name in "♥3 ♠4 ♣5".split()]).get_counts()) == 0
+    assert bid(Hand([Card.parse(name) for name in "大王 ♥2 ♠A".split()]).get_counts(), 3) == 0
+
+    # 按估计的胜率叫分（没有估计器时与 bid 相同）
+    strong = Hand([Card.parse(name) for name in
+                   "大王 小王 ♥2 ♠2 ♣2 ◆2 ♥K ♠K ♣K ◆K ♥A ♠A ♥3 ♥4 ♥5 ♥6 ♥7".split()]).get_counts()
+    assert estimate_bid(strong) == bid(strong) == 3
+    if WinEstimator is not None:
+        assert estimate_bid(strong, 0, WinEstimator(1)) == 3
+        assert estimate_bid(strong, 3, WinEstimator(1)) == 0
+        # 来不及模拟时按大牌估计
+        weak = Hand([Card.parse(name) for name in "♥3 ♠3 ♥4 ♥5 ♠5 ♥6 ♥7 ♠7 ♥8 ♥9 ♠9 ♥10 ♥J ♠J ♥Q ♠Q ♥K".split()]).get_counts()
+        assert estimate_bid(strong, 0, WinEstimator(1), deadline=0) == bid(strong) == 3
+        assert estimate_bid(weak, 0, WinEstimator(1), deadline=0) == bid(weak) == 0
+
+    # 能一次出完就出完
+    player = SearchPlayer(0.05, random.Random(1))
+    view = TableView(0, 0, signature_of("♥3 ♠3 ♣3 ♥4"), [4, 1, 1], signature_of("♥5 ♠5"), [0, 0, 0], None, 0)
+    move = player.choose(view)
+    assert move is not None and move[1] == CARD_ORDER_TYPE['三带一']
+
+    # 只剩两张大牌：对手只剩一张牌时先出大的
+    rng = random.Random(2)
+    hand = signature_of("大王 ♥3")
+    deck = Hand([card for card in Card.get_all() if card not in (Card.parse("大王"), Card.parse("♥3"))])
+    others = Hand(rng.sample(deck.get_cards(), 2))
+    view = TableView(0, 0, hand, [2, 1, 1], others.get_signature(), [0, 0, 0], None, 0)
+    move = SearchPlayer(0.05, random.Random(1)).choose(view)
+    assert move[0] == make_signature({14: 1})
+
+    # 时间预算是硬性的：搜索的耗时不超过预算太多，并且总能返回合法的出牌
+    deck = Deck(random.Random(3))
+    for budget in (0.0, 0.02, 0.05):
+        hands, bottom = deck.deal_hands()
+        hands[0].add_cards(bottom)
+        unseen = hands[1].get_signature() + hands[2].get_signature()
+        player = SearchPlayer(budget, random.Random(4))
+        start = time.perf_counter()
+        move = player.choose(TableView(0, 0, hands[0].get_signature(), [20, 17, 17], unseen, [0, 0, 0], None, 0))
+        assert time.perf_counter() - start < budget + 0.05
+        assert move is not None and PlayTable.classify(move[0]) == (move[1], move[2])
+        assert hands[0].get_signature() - move[0] >= 0
+
+        # 跟牌：出的牌必须压过上家，不出也是合法的
+        last = (CARD_ORDER_TYPE['一张'], 8, 1)
+        move = player.choose(TableView(1, 0, hands[1].get_signature(), [19, 17, 17],
+                                       hands[0].get_signature() - make_signature({5: 1}) + hands[2].get_signature(),
+                                       [0, 0, 0], last, 0))
+        assert move is None or PlayTable.beats(move[1], move[2], move[3], last)
+
+    # 残局求解：地主先出大王（没有人能压），再出最后一张牌
+    solver = EndgameSolver()
+    hands = [signature_of("大王 ♥3"), signature_of("♠A"), signature_of("♣K")]
+    landlord_wins, move = solver.solve(hands, 0, 0)
+    assert landlord_wins and move[0] == make_signature({14: 1})
+    # 农民先出：乙只剩一张牌，直接出完
+    assert solver.solve(hands, 0, 1) == (False, (signature_of("♠A"), CARD_ORDER_TYPE['一张'], 14, 1))
+    # 跟牌：地主用大王压过丙的 2，再出 3；地主只有两个 3 时压不过，丙出 5 获胜
+    hands = [signature_of("大王 ♥3"), signature_of("♠4 ♠6"), signature_of("♣5")]
+    big_joker = (make_signature({14: 1}), CARD_ORDER_TYPE['一张'], 100, 1)
+    assert solver.solve(hands, 0, 0, (CARD_ORDER_TYPE['一张'], 20, 1), 2) == (True, big_joker)
+    hands = [signature_of("◆3 ♥3"), signature_of("♠4 ♠6"), signature_of("♣5")]
+    assert solver.solve(hands, 0, 0, (CARD_ORDER_TYPE['一张'], 20, 1), 2) == (False, None)
+
+    # 残局求解与不剪枝、没有置换表的完全搜索结果相同
+    def brute_force(hands, landlord_index, turn, last, last_index):
+        if last_index == turn:
+            last = None
+        mover_wins = turn == landlord_index
+        results = []
+        counts = [hands[turn] >> rank_index * SIGNATURE_BITS & RANK_MASK for rank_index in range(RANK_COUNT)]
+        for move, card_type, power in PlayTable.generate_count_moves(counts, last):
+            if move == hands[turn]:
+                return mover_wins
+            next_hands = list(hands)
+            next_hands[turn] -= move
+            results.append(brute_force(next_hands, landlord_index, (turn + 1) % 3,
+                                       (card_type, power, get_signature_size(move)), turn))
+        if last is not None:
+            results.append(brute_force(hands, landlord_index, (turn + 1) % 3, last, last_index))
+        return mover_wins if mover_wins in results else not mover_wins
+
+    rng = random.Random(6)
+    for i in range(60):
+        size = rng.randint(1, 4)
+        cards = rng.sample(Card.get_all(), size * 3)
+        hands = [Hand(cards[index * size:(index + 1) * size]).get_counts() for index in range(3)]
+        landlord_index = rng.randint(0, 2)
+        turn = rng.randint(0, 2)
+        expected = brute_force([make_signature(dict(enumerate(hand))) for hand in hands], landlord_index, turn, None, turn)
+        landlord_wins, move = EndgameSolver().solve(hands, landlord_index, turn)
+        assert landlord_wins == expected
+
+    # 超时
+    cards = Card.get_all()[:30]
+    hands = [Hand(cards[index::3]).get_counts() for index in range(3)]
+    try:
+        EndgameSolver().solve(hands, 0, 0, deadline=time.perf_counter())
+    except SolverTimeout:
+        pass
+    else:
+        assert False, "没有超时"
+
+    # 地主手中还没出的底牌是已知的，随机分配时总是分给地主
+    player = SearchPlayer(0.01, random.Random(5))
+    known = signature_of("大王 小王")
+    view = TableView(1, 0, signature_of("♥3 ♠5"), [3, 2, 2], signature_of("大王 小王 ♥4 ♠6 ♣8"), [known, 0, 0], None, 1)
+    for i in range(20):
+        hands = player.determinize(view)
+        assert hands[0] & known == known and [get_signature_size(hand) for hand in hands] == [3, 2, 2]
+        assert hands[0] + hands[2] == view.get_unseen()
+
+
+if __name__ == '__main__':
+    test()
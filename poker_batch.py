@@ -0,0 +1,197 @@
+# 批量判断牌型、比较大小（numpy 向量化，用于模拟和统计分析，需要安装 numpy）
+# 一次输入 N 手牌，可以是：
+#   (N, 15) 的点数牌数矩阵（列为点数编号，与 Hand.get_counts() 相同）
+#   (N, 54) 的 0/1 矩阵（第 i 列表示有没有编号为 i 的牌）
+#   N 个 54 位的掩码（与 Hand.get_mask() 相同，dtype 为 uint64）
+# 返回出牌类型编号（CARD_ORDER_TYPE 的数值，不是合法的出牌时为 0）、权值（不合法时为 0）和牌数三个向量
+# 牌型表的签名每个点数占 5 位，15 个点数放不进 int64，所以这里按每个点数的最大牌数（3~2 为 0~4，大小王为 0~1）
+# 把牌数编码成混合进制的一个 int64，在排好序的合法出牌编码中二分查找
+
+import numpy as np
+
+from poker_rules import (PlayTable, PlayDominance, CARD_ORDER_TYPE, RANK_COUNT, RANK_LIMITS, RANK_POWERS, SIGNATURE_BITS,
+                        PLAY_MAX_CARDS, get_signature_size)
+
+
+# 向量化的牌型表（与 PlayTable 的内容相同）
+class BatchTable:
+    __weights = None  # 点数编号 -> 混合进制编码中的位权
+    __limits = None  # 点数编号 -> 最大牌数
+    __keys = None  # 排好序的合法出牌编码
+    __types = None  # 与 __keys 对应的出牌类型编号
+    __powers = None  # 与 __keys 对应的权值
+    __class_index = None  # (出牌类型编号, 权值, 牌数) -> 出牌类别编号（PlayDominance，不是合法的出牌时为最后一个编号）
+    __beat_matrix = None  # [出牌类别编号, 上次出牌类别编号] -> 能否压过（压制表展开成矩阵，最后一行一列全为 False）
+    __bit_counts = np.array([bin(i).count("1") for i in range(16)], dtype=np.int64)  # 4 位数中 1 的个数
+
+    # 从 PlayTable 生成（导入时调用）
+    @staticmethod
+    def init():
+        if BatchTable.__keys is not None:
+            return
+
+        limits = np.array(RANK_LIMITS, dtype=np.int64)
+        weights = np.ones(RANK_COUNT, dtype=np.int64)
+        for rank_index in range(1, RANK_COUNT):
+            weights[rank_index] = weights[rank_index - 1] * (limits[rank_index - 1] + 1)
+
+        # 签名按每个点数 5 位拆开：先拆成 3 个 25 位的整数，再用 numpy 拆出每个点数的牌数
+        table = PlayTable.get_all()
+        parts = np.array([[signature >> shift & ((1 << 25) - 1) for shift in (0, 25, 50)] for signature in table], dtype=np.int64)
+        shifts = np.arange(5, dtype=np.int64) * SIGNATURE_BITS
+        counts = (parts[:, :, None] >> shifts & ((1 << SIGNATURE_BITS) - 1)).reshape(len(table), RANK_COUNT)
+        types = np.array([card_type.value for card_type, power in table.values()], dtype=np.int8)
+        powers = np.array([power for card_type, power in table.values()], dtype=np.int16)
+
+        keys = counts @ weights
+        order = np.argsort(keys)
+        BatchTable.__weights = weights
+        BatchTable.__limits = limits
+        BatchTable.__keys = keys[order]
+        BatchTable.__types = types[order]
+        BatchTable.__powers = powers[order]
+
+        # 压制表：权值和牌数超出范围时都查到最后一个（不合法的）类别
+        count = PlayDominance.get_size()
+        class_index = np.full((len(CARD_ORDER_TYPE) + 1, max(RANK_POWERS) + 2, PLAY_MAX_CARDS + 2), count, dtype=np.int16)
+        beat_matrix = np.zeros((count + 1, count + 1), dtype=bool)
+        for class_id in range(count):
+            card_type, power, size = PlayDominance.get_play(class_id)
+            class_index[card_type.value, power, size] = class_id
+            beat_matrix[list(PlayDominance.get_beaters(class_id)), class_id] = True
+        BatchTable.__class_index = class_index
+        BatchTable.__beat_matrix = beat_matrix
+
+    # (N, 54) 的 0/1 矩阵 -> (N, 15) 的点数牌数矩阵
+    @staticmethod
+    def counts_from_cards(cards):
+        cards = np.asarray(cards, dtype=np.int64)
+        counts = np.empty((len(cards), RANK_COUNT), dtype=np.int64)
+        counts[:, :13] = cards[:, :52].reshape(len(cards), 13, 4).sum(axis=2)
+        counts[:, 13:] = cards[:, 52:]
+        return counts
+
+    # N 个 54 位掩码 -> (N, 15) 的点数牌数矩阵
+    # 同一个点数的 4 张牌在掩码中是连续的 4 位：按字节拆开后低 4 位是偶数编号的点数、高 4 位是奇数编号的点数，
+    # 查 4 位数中 1 的个数就是这个点数的牌数；第 7 个字节的高 4 位是大小王（第 52、53 位）
+    @staticmethod
+    def counts_from_masks(masks):
+        masks = np.asarray(masks, dtype=np.uint64)
+        data = masks.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :7]
+        counts = np.empty((len(masks), RANK_COUNT), dtype=np.int64)
+        counts[:, 0:13:2] = BatchTable.__bit_counts[data & 15]
+        counts[:, 1:12:2] = BatchTable.__bit_counts[data[:, :6] >> 4]
+        counts[:, 13] = data[:, 6] >> 4 & 1
+        counts[:, 14] = data[:, 6] >> 5 & 1
+        return counts
+
+    # 判断 (N, 15) 的点数牌数矩阵的牌型，返回 (出牌类型编号, 权值, 牌数)
+    @staticmethod
+    def classify_counts(counts):
+        counts = np.asarray(counts, dtype=np.int64).reshape(-1, RANK_COUNT)
+        sizes = counts.sum(axis=1)
+        # 某个点数的牌数超出范围（例如同一张牌出现多次）时不是合法的出牌
+        valid = ((counts >= 0) & (counts <= BatchTable.__limits)).all(axis=1)
+        keys = np.where(valid, counts @ BatchTable.__weights, -1)
+
+        positions = np.searchsorted(BatchTable.__keys, keys)
+        positions = np.minimum(positions, len(BatchTable.__keys) - 1)
+        found = valid & (BatchTable.__keys[positions] == keys)
+        types = np.where(found, BatchTable.__types[positions], 0).astype(np.int8)
+        powers = np.where(found, BatchTable.__powers[positions], 0).astype(np.int16)
+        return types, powers, sizes
+
+    # 判断 (N, 54) 的 0/1 矩阵的牌型
+    @staticmethod
+    def classify_cards(cards):
+        return BatchTable.classify_counts(BatchTable.counts_from_cards(cards))
+
+    # 判断 N 个 54 位掩码的牌型
+    @staticmethod
+    def classify_masks(masks):
+        return BatchTable.classify_counts(BatchTable.counts_from_masks(masks))
+
+    # 每一手牌能否压过上次出牌（查 PlayDominance 的压制表，与 PlayTable.beats、Play.compare_last 相同），不合法的出牌都压不过
+    # last_type、last_power、last_size 可以是一个值（所有出牌和同一个上次出牌比较），也可以是与出牌一一对应的向量
+    # last_type 为出牌类型编号（CARD_ORDER_TYPE 的数值）
+    @staticmethod
+    def beats(types, powers, sizes, last_type, last_power, last_size):
+        return BatchTable.__beat_matrix[BatchTable.classes(types, powers, sizes),
+                                        BatchTable.classes(last_type, last_power, last_size)]
+
+    # (出牌类型编号, 权值, 牌数) -> 出牌类别编号（PlayDominance），不是合法的出牌时为 PlayDominance.get_size()
+    @staticmethod
+    def classes(types, powers, sizes):
+        shape = BatchTable.__class_index.shape
+        types = np.clip(np.asarray(types, dtype=np.int64), 0, shape[0] - 1)
+        powers = np.clip(np.asarray(powers, dtype=np.int64), 0, shape[1] - 1)
+        sizes = np.clip(np.asarray(sizes, dtype=np.int64), 0, shape[2] - 1)
+        return BatchTable.__class_index[types, powers, sizes]
+
+
+BatchTable.init()
+
+
+# 测试（与逐个判断的 PlayTable.classify、PlayTable.beats 对照）
+def test():
+    import random
+    from poker_rules import Card, Hand, make_signature
+
+    rng = random.Random(1)
+
+    def signature_of(counts):
+        return make_signature({rank_index: int(count) for rank_index, count in enumerate(counts)})
+
+    def counts_of(signature):
+        return [signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1) for rank_index in range(RANK_COUNT)]
+
+    # 全部合法出牌
+    table = PlayTable.get_all()
+    types, powers, sizes = BatchTable.classify_counts([counts_of(signature) for signature in table])
+    assert [(CARD_ORDER_TYPE(int(t)), int(p)) for t, p in zip(types, powers)] == list(table.values())
+    assert list(sizes) == [get_signature_size(signature) for signature in table]
+
+    # 随机的牌数（包括超出范围的牌数）
+    counts = np.array([[rng.choice((0, 0, 0, 1, 2, 3, 4, 5)) if rng.random() < 0.3 else 0 for i in range(RANK_COUNT)]
+                       for j in range(3000)], dtype=np.int64)
+    types, powers, sizes = BatchTable.classify_counts(counts)
+    for row, card_type, power in zip(counts, types, powers):
+        expected = PlayTable.classify(signature_of(row)) if (row <= np.array(RANK_LIMITS)).all() else None
+        assert (expected is None and card_type == 0 and power == 0) or expected == (CARD_ORDER_TYPE(int(card_type)), int(power))
+
+    # 0/1 矩阵和掩码
+    hands = [Hand(rng.sample(Card.get_all(), rng.randint(1, 8))) for i in range(3000)]
+    masks = np.array([hand.get_mask() for hand in hands], dtype=np.uint64)
+    types, powers, sizes = BatchTable.classify_masks(masks)
+    cards = np.array([[hand.get_mask() >> card_id & 1 for card_id in range(54)] for hand in hands], dtype=np.int64)
+    assert (BatchTable.counts_from_cards(cards) == BatchTable.counts_from_masks(masks)).all()
+    assert (BatchTable.counts_from_masks(masks) == np.array([hand.get_counts() for hand in hands])).all()
+    for hand, card_type, power, size in zip(hands, types, powers, sizes):
+        expected = PlayTable.classify_cards(hand.get_cards())
+        assert size == len(hand)
+        assert (expected is None and card_type == 0) or expected == (CARD_ORDER_TYPE(int(card_type)), int(power))
+
+    # 比较大小：随机的合法出牌两两比较（一个上次出牌和逐个对应的上次出牌）
+    signatures = list(table)
+    plays = [rng.choice(signatures) for i in range(3000)]
+    lasts = [rng.choice(signatures) for i in range(3000)]
+    play_types, play_powers, play_sizes = BatchTable.classify_counts([counts_of(signature) for signature in plays])
+    last_types, last_powers, last_sizes = BatchTable.classify_counts([counts_of(signature) for signature in lasts])
+    result = BatchTable.beats(play_types, play_powers, play_sizes, last_types, last_powers, last_sizes)
+    for i in range(len(plays)):
+        last = (*table[lasts[i]], get_signature_size(lasts[i]))
+        assert result[i] == PlayTable.beats(*table[plays[i]], get_signature_size(plays[i]), last)
+
+    last = (*table[lasts[0]], get_signature_size(lasts[0]))
+    result = BatchTable.beats(play_types, play_powers, play_sizes, last[0].value, last[1], last[2])
+    assert list(result) == [PlayTable.beats(*table[signature], get_signature_size(signature), last) for signature in plays]
+
+    # 不合法的出牌压不过任何牌，王炸和炸弹可以互相压（与原来的比较规则一致）
+    assert not BatchTable.beats([0], [0], [3], CARD_ORDER_TYPE['一张'].value, 0, 1)[0]
+    assert not BatchTable.beats([3], [3], [1], CARD_ORDER_TYPE['一张'].value, 0, 1)[0]
+    bomb, rocket = CARD_ORDER_TYPE['炸弹'].value, CARD_ORDER_TYPE['王炸'].value
+    assert list(BatchTable.beats([bomb, rocket], [20, 100], [4, 2], [rocket, bomb], [100, 20], [2, 4])) == [True, True]
+
+
+if __name__ == '__main__':
+    test()
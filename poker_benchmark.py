@@ -0,0 +1,552 @@
+# 性能测试
+# 用法：python poker_benchmark.py <测试名称> [参数]
+#   broadcast   无网络地驱动房间进行多局游戏，统计每一步的消息序列化次数、发送次数、帧数和字节数（--protocol 选择通信格式）
+#   classify    对比原来逐条判断的规则和牌型表每秒判断的出牌数；--verify 验证牌型表与原来的规则一致
+#   moves       出牌生成：最坏情况的 20 张手牌和随机手牌，出任意牌以及压上次出牌时每次生成的耗时
+#   batch       批量判断牌型、比较大小：逐个判断与 numpy 向量化（需要安装 numpy）每秒判断的出牌数，并对照两者的结果
+#   deal        发牌：原来逐张生成、逐张移除的发牌与洗一副预先生成的牌再切片的发牌，每分钟的发牌次数
+#   decompose   手牌拆分：地主的 20 张随机手牌第一次拆分、再次拆分（缓存）和出一手牌后再拆分的耗时
+#   estimate    叫分胜率估计：随机的 17 张手牌每次估计的耗时、模拟的局数和每秒模拟的局数（需要安装 numpy）
+#   endgame     残局求解：每个玩家分别有 5~12 张随机手牌时，求解一个局面的耗时、搜索的局面数和超时的局面数
+
+import time
+import random
+import argparse
+
+import poker_protocol
+import poker_server
+from poker_server import Player, Room, Seat, CardBox, TimerWheel, PLAY_PHASE
+from poker_rules import Card, Deck, Hand, PlayTable, PlayDominance, HandDecomposer, get_signature_size, RANK_COUNT, RANK_LIMITS, SIGNATURE_BITS, PLAY_MAX_CARDS, CARD_ORDER_TYPE
+from poker_rules_legacy import LegacyCardOrder
+
+
+# 不进行网络传输的套接字，统计发送次数和字节数，并像客户端一样解码收到的消息（统计解码耗时）
+class NullSocket:
+
+    def __init__(self, codec):
+        self.__codec = codec
+        self.__reader = codec.create_reader()
+        self.__send_count = 0
+        self.__send_bytes = 0
+        self.__frame_count = 0
+        self.__decode_time = 0
+
+    def sendall(self, data):
+        self.__send_count += 1
+        self.__send_bytes += len(data)
+
+        start = time.perf_counter()
+        frames = self.__reader.feed(data)
+        for frame in frames:
+            self.__codec.decode_message(frame)
+        self.__decode_time += time.perf_counter() - start
+        self.__frame_count += len(frames)
+
+    # 写入不会阻塞，不需要超时
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+    def get_send_count(self):
+        return self.__send_count
+
+    def get_send_bytes(self):
+        return self.__send_bytes
+
+    def get_frame_count(self):
+        return self.__frame_count
+
+    def get_decode_time(self):
+        return self.__decode_time
+
+
+# 广播测试：叫分阶段第一个叫分的玩家叫 3 分，出牌阶段全部按超时处理（任意牌出最小的一张，否则不出）
+def bench_broadcast(games, codec):
+    room = Room("benchmark", TimerWheel())
+    sockets = [NullSocket(codec) for i in range(3)]
+    players = [Player(f"玩家{i}", sockets[i], ("benchmark", i), room, codec=codec) for i in range(3)]
+    for player in players:
+        room.add_player(player)
+
+    room.start_play()
+
+    steps = 0
+    serialize_count = poker_protocol.get_serialize_count()
+    send_count = sum(sock.get_send_count() for sock in sockets)
+    send_bytes = sum(sock.get_send_bytes() for sock in sockets)
+    frame_count = sum(sock.get_frame_count() for sock in sockets)
+    decode_time = sum(sock.get_decode_time() for sock in sockets)
+    start = time.perf_counter()
+
+    for game in range(games):
+        play = room.get_play()
+        while room.get_play() is play:
+            if play.get_phase() == PLAY_PHASE.MARKING:
+                room.on_command(players[play.get_playing_index()], "3")
+            else:
+                room.on_timeout(play, play.get_step())
+            steps += 1
+
+    elapsed = time.perf_counter() - start
+    serialize_count = poker_protocol.get_serialize_count() - serialize_count
+    send_count = sum(sock.get_send_count() for sock in sockets) - send_count
+    send_bytes = sum(sock.get_send_bytes() for sock in sockets) - send_bytes
+    frame_count = sum(sock.get_frame_count() for sock in sockets) - frame_count
+    decode_time = sum(sock.get_decode_time() for sock in sockets) - decode_time
+
+    print(f"通信格式: {codec.get_name()}  局数: {games}  步数: {steps}")
+    print(f"服务端耗时: {elapsed - decode_time:.3f}s  每步: {(elapsed - decode_time) / steps * 1e6:.1f}us")
+    print(f"客户端解码耗时: {decode_time:.3f}s  每步: {decode_time / steps * 1e6:.1f}us")
+    print(f"消息序列化: {serialize_count}  每步: {serialize_count / steps:.2f}")
+    print(f"发送次数: {send_count}  每步: {send_count / steps:.2f}")
+    print(f"发送帧数: {frame_count}  每步: {frame_count / steps:.2f}")
+    print(f"发送字节: {send_bytes}  每步: {send_bytes / steps:.1f}")
+
+
+# 根据牌型签名生成一组牌（每个点数取前几个花色）
+def make_signature_cards(signature):
+    cards = []
+    for rank_index in range(RANK_COUNT):
+        count = signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1)
+        for suit_index in range(count):
+            cards.append(Card.from_id(rank_index * 4 + suit_index if rank_index < 13 else rank_index + 39))
+    return cards
+
+
+# 所有不超过 max_cards 张牌的牌型签名（每个点数的牌数不超过这个点数的牌数）
+def all_signatures(max_cards, rank_index=0):
+    if rank_index == RANK_COUNT:
+        yield 0
+        return
+    for count in range(min(RANK_LIMITS[rank_index], max_cards) + 1):
+        for signature in all_signatures(max_cards - count, rank_index + 1):
+            yield signature + (count << rank_index * SIGNATURE_BITS)
+
+
+# 牌型表中每个签名多一张或者少一张牌的签名（检查每种牌型边界附近的组合）
+def neighbour_signatures(signature_list):
+    result = set()
+    for signature in signature_list:
+        for rank_index in range(RANK_COUNT):
+            count = signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1)
+            if count < RANK_LIMITS[rank_index]:
+                result.add(signature + (1 << rank_index * SIGNATURE_BITS))
+            if count > 0:
+                result.add(signature - (1 << rank_index * SIGNATURE_BITS))
+    result.discard(0)
+    return result
+
+
+# 只有三张（2~6 个任意点数）再加最多一张牌的签名（原来的特别飞机不要求连续，单独穷举）
+def triple_signatures():
+    result = set()
+    for mask in range(1 << 13):
+        rank_list = [rank_index for rank_index in range(13) if mask >> rank_index & 1]
+        if not 2 <= len(rank_list) <= 6:
+            continue
+        signature = sum(3 << rank_index * SIGNATURE_BITS for rank_index in rank_list)
+        result.add(signature)
+        for rank_index in range(RANK_COUNT):
+            if rank_index not in rank_list:
+                result.add(signature + (1 << rank_index * SIGNATURE_BITS))
+    return result
+
+
+# 用原来的规则判断一个签名：返回 (服务器端接受的 {出牌类型: 权值}, 服务器端找不到有效权值的出牌类型, 客户端判断的出牌类型)
+def legacy_classify(signature):
+    cards = make_signature_cards(signature)
+    accepted = {}
+    failed = set()
+    for card_type in CARD_ORDER_TYPE:
+        try:
+            result, power = LegacyCardOrder.check_card_type(list(cards), card_type)
+        except ValueError as ex:
+            failed.add(card_type)
+            continue
+        except (KeyError, IndexError) as ex:
+            # 原来的规则在缺少某种数量的牌时直接取值出错，按不符合规则处理
+            continue
+        if result:
+            accepted[card_type] = power
+    return accepted, failed, LegacyCardOrder.get_cards_type([str(card) for card in cards])
+
+
+# 验证牌型表与原来的规则一致：所有不超过 max_cards 张牌的签名、牌型表中的所有签名和它们多一张或者少一张牌的签名、
+# 只有三张再加最多一张牌的签名
+# 唯一允许的差别：原来的客户端把找不到有效权值的特别飞机判断为飞机，但服务器端会出错，牌型表不接受这种出牌
+def verify_classifier(max_cards):
+    start = time.perf_counter()
+    table = PlayTable.get_all()
+    signature_set = set(all_signatures(max_cards))
+    signature_set.update(table.keys())
+    signature_set.update(triple_signatures())
+    signature_set.update(signature for signature in neighbour_signatures(table.keys())
+                         if len(make_signature_cards(signature)) <= PLAY_MAX_CARDS)
+
+    mismatch = 0
+    client_only = 0
+    for signature in signature_set:
+        play = table.get(signature)
+        accepted, failed, client_type = legacy_classify(signature)
+
+        expected = {} if play is None else {play[0]: play[1]}
+        if accepted != expected:
+            mismatch += 1
+            print(f"服务器端不一致: {make_signature_cards(signature)} 原来: {accepted} 牌型表: {play}")
+
+        new_type = -1 if play is None else play[0].value
+        if client_type != new_type:
+            if play is None and client_type == CARD_ORDER_TYPE['飞机'].value and CARD_ORDER_TYPE['飞机'] in failed:
+                client_only += 1
+            else:
+                mismatch += 1
+                print(f"客户端不一致: {make_signature_cards(signature)} 原来: {client_type} 牌型表: {new_type}")
+
+    print(f"验证签名: {len(signature_set)}（不超过 {max_cards} 张牌的全部签名 + 牌型表 {len(table)} 个签名及其相邻签名 + 只有三张的签名）"
+          f"  耗时: {time.perf_counter() - start:.1f}s")
+    print(f"不一致: {mismatch}  原来客户端接受但服务器端出错的特别飞机: {client_only}")
+    return mismatch == 0
+
+
+# 牌型判断测试：一半是牌型表中的合法出牌（随机花色），一半是随机抽取的 1~10 张牌
+def bench_classify(plays, verify, max_cards, seed=1):
+    import poker_client
+
+    rng = random.Random(seed)
+    signature_list = list(PlayTable.get_all().keys())
+    deck = list(Card.get_all())
+
+    card_lists = []
+    for i in range(plays):
+        if i % 2 == 0:
+            cards = []
+            signature = rng.choice(signature_list)
+            for rank_index in range(RANK_COUNT):
+                count = signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1)
+                if rank_index < 13:
+                    cards.extend(Card.from_id(rank_index * 4 + suit_index) for suit_index in rng.sample(range(4), count))
+                elif count:
+                    cards.append(Card.from_id(rank_index + 39))
+        else:
+            cards = rng.sample(deck, rng.randint(1, 10))
+        rng.shuffle(cards)
+        card_lists.append(cards)
+    name_lists = [[str(card) for card in cards] for cards in card_lists]
+    type_list = [PlayTable.classify_cards(cards) for cards in card_lists]
+    type_list = [CARD_ORDER_TYPE['一张'] if play is None else play[0] for play in type_list]
+
+    def run(name, func, args_list):
+        start = time.perf_counter()
+        for args in args_list:
+            try:
+                func(*args)
+            except Exception as ex:
+                pass
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(args_list) / elapsed:,.0f} 次/秒  每次: {elapsed / len(args_list) * 1e6:.2f}us")
+
+    print(f"出牌数: {plays}  牌型表签名: {len(signature_list)}")
+    run("客户端 原来逐条判断", LegacyCardOrder.get_cards_type, [(names,) for names in name_lists])
+    run("客户端 牌型表", poker_client.CardOrder.get_cards_type, [(names,) for names in name_lists])
+    run("服务器端 原来逐条判断", LegacyCardOrder.check_card_type,
+        [(list(cards), card_type) for cards, card_type in zip(card_lists, type_list)])
+    run("服务器端 牌型表", poker_server.CardOrder.check_card_type,
+        [(list(cards), card_type) for cards, card_type in zip(card_lists, type_list)])
+
+    if verify and not verify_classifier(max_cards):
+        raise SystemExit(1)
+
+
+# 出牌生成测试用的 20 张手牌（点数, 张数），三张、炸弹多的手牌带牌组合最多
+WORST_HANDS = {
+    "5个连续三张+5张单牌": [('3', 3), ('4', 3), ('5', 3), ('6', 3), ('7', 3), ('9', 1), ('10', 1), ('J', 1), ('Q', 1), ('K', 1)],
+    "6个连续三张+王炸": [('3', 3), ('4', 3), ('5', 3), ('6', 3), ('7', 3), ('8', 3), ('小王', 1), ('大王', 1)],
+    "5个炸弹": [('3', 4), ('4', 4), ('5', 4), ('6', 4), ('7', 4)],
+    "4个连续三张+4个对子": [('3', 3), ('4', 3), ('5', 3), ('6', 3), ('8', 2), ('9', 2), ('10', 2), ('J', 2)],
+    "10个连对": [(rank, 2) for rank in ['3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q']],
+}
+
+
+# 根据 (点数, 张数) 列表生成手牌（每个点数取前几个花色）
+def make_hand(rank_counts):
+    cards = []
+    for rank, count in rank_counts:
+        if rank in ('小王', '大王'):
+            cards.append(Card(rank))
+        else:
+            cards.extend(Card(rank, suit) for suit in Card.SUITS[:count])
+    return Hand(cards)
+
+
+# 出牌生成测试：每手牌分别计算出任意牌和压上次出牌时生成全部出牌的耗时
+# 上次出牌随机取这手牌能出的一种牌型和牌数，权值取 PlayDominance 中这种牌型和牌数的最小权值
+# （除了同样最小的牌，同牌型同牌数的牌都能压过，是压牌时最坏的情况）
+def bench_moves(hands, seed=1):
+    rng = random.Random(seed)
+    min_powers = {}
+    for class_id in range(PlayDominance.get_size()):
+        card_type, power, size = PlayDominance.get_play(class_id)
+        min_powers[(card_type, size)] = min(power, min_powers.get((card_type, size), power))
+
+    def make_last(signature, card_type):
+        size = get_signature_size(signature)
+        return card_type, min_powers[(card_type, size)], size
+
+    def measure(hand, last, repeat):
+        start = time.perf_counter()
+        for i in range(repeat):
+            count = sum(1 for move in PlayTable.generate_moves(hand, last))
+        return count, (time.perf_counter() - start) / repeat
+
+    print("手牌                      出任意牌: 出牌数  耗时      压牌: 出牌数  耗时")
+    for name, rank_counts in WORST_HANDS.items():
+        hand = make_hand(rank_counts)
+        signature, card_type, power = rng.choice(list(PlayTable.generate_moves(hand)))
+        free_count, free_time = measure(hand, None, 20)
+        follow_count, follow_time = measure(hand, make_last(signature, card_type), 20)
+        print(f"{name:<20}\t{free_count:>6}  {free_time * 1000:.2f}ms\t{follow_count:>6}  {follow_time * 1000:.2f}ms")
+
+    deck = list(Card.get_all())
+    free_times = []
+    follow_times = []
+    for i in range(hands):
+        hand = Hand(rng.sample(deck, 20))
+        signature, card_type, power = rng.choice(list(PlayTable.generate_moves(hand)))
+        free_times.append(measure(hand, None, 1)[1])
+        follow_times.append(measure(hand, make_last(signature, card_type), 1)[1])
+    print(f"随机 {hands} 手 20 张牌: 出任意牌 平均 {sum(free_times) / hands * 1000:.2f}ms 最大 {max(free_times) * 1000:.2f}ms"
+          f"  压牌 平均 {sum(follow_times) / hands * 1000:.3f}ms 最大 {max(follow_times) * 1000:.2f}ms")
+
+
+# 原来的发牌：每次生成 54 张牌，逐张从列表头部移除并逐张发给玩家
+def legacy_deal(players, rng):
+    cards = []
+    for suit in Card.SUITS:
+        for rank in Card.RANKS:
+            cards.append(Card(rank, suit))
+    cards.append(Card('小王', ''))
+    cards.append(Card('大王', ''))
+    rng.shuffle(cards)
+    for rounds in range(17):
+        for player in players:
+            top_card = cards[0]
+            cards.remove(top_card)
+            player.add_card(top_card)
+    return cards
+
+
+# 发牌测试：每次发牌前清空座位（与每局开始时相同）
+def bench_deal(deals, seed=1):
+    rng = random.Random(seed)
+    seats = [Seat("甲"), Seat("乙"), Seat("丙")]
+
+    def measure(name, deal):
+        start = time.perf_counter()
+        for i in range(deals):
+            deal()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24}	{elapsed / deals * 1e6:.2f}us	每分钟 {deals / elapsed * 60 / 10000:.0f} 万次")
+
+    def deal_seats(deal):
+        for seat in seats:
+            seat.clear()
+        deal()
+
+    card_box = CardBox(rng)
+    deck = Deck(rng)
+    measure("原来的发牌（座位）", lambda: deal_seats(lambda: legacy_deal(seats, rng)))
+    measure("CardBox 发牌（座位）", lambda: deal_seats(lambda: card_box.deal(seats)))
+    measure("Deck 发牌（手牌）", deck.deal_hands)
+    measure("Deck 发牌（牌列表）", deck.deal)
+
+
+# 批量判断测试：一半是牌型表中的合法出牌，一半是随机抽取的 1~10 张牌；每手牌再与一个随机的上次出牌比较大小
+def bench_batch(plays, seed=1):
+    import numpy as np
+    from poker_batch import BatchTable
+
+    rng = random.Random(seed)
+    table = PlayTable.get_all()
+    signature_list = list(table.keys())
+    deck = list(Card.get_all())
+
+    hands = []
+    for i in range(plays):
+        if i % 2 == 0:
+            hand = Hand()
+            signature = rng.choice(signature_list)
+            for rank_index in range(RANK_COUNT):
+                count = signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1)
+                if rank_index < 13:
+                    hand.add_cards([Card.from_id(rank_index * 4 + suit_index) for suit_index in rng.sample(range(4), count)])
+                elif count:
+                    hand.add_card(Card.from_id(rank_index + 39))
+        else:
+            hand = Hand(rng.sample(deck, rng.randint(1, 10)))
+        hands.append(hand)
+    lasts = [rng.choice(signature_list) for i in range(plays)]
+    lasts = [(*table[signature], get_signature_size(signature)) for signature in lasts]
+
+    start = time.perf_counter()
+    scalar_types = [PlayTable.classify_cards(hand.get_cards()) for hand in hands]
+    scalar_beats = [play is not None and PlayTable.beats(*play, len(hand), last)
+                    for hand, play, last in zip(hands, scalar_types, lasts)]
+    scalar_time = time.perf_counter() - start
+
+    masks = np.array([hand.get_mask() for hand in hands], dtype=np.uint64)
+    last_types = np.array([last[0].value for last in lasts], dtype=np.int8)
+    last_powers = np.array([last[1] for last in lasts], dtype=np.int16)
+    last_sizes = np.array([last[2] for last in lasts], dtype=np.int16)
+    start = time.perf_counter()
+    types, powers, sizes = BatchTable.classify_masks(masks)
+    beats = BatchTable.beats(types, powers, sizes, last_types, last_powers, last_sizes)
+    batch_time = time.perf_counter() - start
+
+    mismatch = 0
+    for i in range(plays):
+        play = None if types[i] == 0 else (CARD_ORDER_TYPE(int(types[i])), int(powers[i]))
+        if play != scalar_types[i] or bool(beats[i]) != scalar_beats[i]:
+            mismatch += 1
+
+    print(f"出牌数: {plays}  合法出牌: {int((types != 0).sum())}  能压过上次出牌: {int(beats.sum())}")
+    print(f"逐个判断: {plays / scalar_time:,.0f} 次/秒  每次: {scalar_time / plays * 1e6:.2f}us")
+    print(f"批量判断: {plays / batch_time:,.0f} 次/秒  每次: {batch_time / plays * 1e6:.3f}us")
+    print(f"不一致: {mismatch}")
+    if mismatch:
+        raise SystemExit(1)
+
+
+# 手牌拆分测试：地主的 20 张手牌（17 张加 3 张底牌），出牌后的手牌出这手牌拆分结果中的第一个出牌
+def bench_decompose(hands, seed=1):
+    rng = random.Random(seed)
+    deck = Deck(rng)
+    signature_list = []
+    for i in range(hands):
+        hand_list, bottom = deck.deal_hands()
+        hand_list[0].add_cards(bottom)
+        signature_list.append(hand_list[0].get_signature())
+
+    def measure(name, signatures):
+        start = time.perf_counter()
+        counts = [len(HandDecomposer.decompose(signature)) for signature in signatures]
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16}	每次: {elapsed / len(signatures) * 1e6:.1f}us	平均出牌次数: {sum(counts) / len(counts):.2f}")
+
+    measure("第一次拆分", signature_list)
+    measure("再次拆分", signature_list)
+    measure("出牌后再拆分", [signature - HandDecomposer.decompose(signature)[0] for signature in signature_list])
+    print(f"缓存大小: {HandDecomposer.get_cache_size()}  改用完整搜索: {HandDecomposer.get_fallbacks()}")
+
+
+# 叫分胜率估计测试：每手牌按默认的置信区间宽度和局数上限估计一次
+def bench_estimate(hands, budget=None, seed=1):
+    from poker_estimate import WinEstimator
+
+    rng = random.Random(seed)
+    deck = Deck(rng)
+    estimator = WinEstimator(seed)
+    times = []
+    games = 0
+    rates = []
+    for i in range(hands):
+        counts = deck.deal_hands()[0][0].get_counts()
+        start = time.perf_counter()
+        rates.append(estimator.estimate(counts, None if budget is None else start + budget)[0])
+        times.append(time.perf_counter() - start)
+        games += estimator.get_games()
+
+    times.sort()
+    print(f"手牌数: {hands}  平均模拟局数: {games / hands:.0f}  每秒模拟: {games / sum(times):,.0f} 局")
+    print(f"每次估计: 平均 {sum(times) / hands * 1000:.1f}ms  中位数 {times[hands // 2] * 1000:.1f}ms  最大 {times[-1] * 1000:.1f}ms")
+    print(f"地主胜率: 平均 {sum(rates) / hands:.3f}  最低 {min(rates):.3f}  最高 {max(rates):.3f}")
+    if budget is not None:
+        print(f"截止时间 {budget * 1000:.0f}ms: 最多超出 {max(0.0, times[-1] - budget) * 1000:.1f}ms")
+
+
+# 残局求解测试：每个局面随机给三个玩家各发 cards 张牌，地主先出任意牌，每个局面使用新的求解器（不共用置换表）
+def bench_endgame(min_cards, max_cards, positions, timeout, seed=1):
+    from poker_ai import EndgameSolver, SolverTimeout
+
+    rng = random.Random(seed)
+    deck = Deck(rng)
+    for cards in range(min_cards, max_cards + 1):
+        times = []
+        nodes = []
+        timeouts = 0
+        landlord_wins = 0
+        for i in range(positions):
+            hands = [Hand(hand[:cards]).get_signature() for hand in deck.deal()[0]]
+            solver = EndgameSolver()
+            start = time.perf_counter()
+            try:
+                landlord_wins += solver.solve(hands, 0, 0, deadline=start + timeout)[0]
+            except SolverTimeout:
+                timeouts += 1
+                continue
+            times.append(time.perf_counter() - start)
+            nodes.append(solver.get_nodes())
+
+        times.sort()
+        nodes.sort()
+        if times:
+            print(f"每人 {cards:>2} 张	求解: {len(times)}/{positions}  地主获胜: {landlord_wins}  "
+                  f"耗时中位数: {times[len(times) // 2] * 1000:.1f}ms  最大: {times[-1] * 1000:.1f}ms  "
+                  f"局面数中位数: {nodes[len(nodes) // 2]}  超时: {timeouts}")
+        else:
+            print(f"每人 {cards:>2} 张	求解: 0/{positions}  超时: {timeouts}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="斗地主性能测试")
+    subparsers = parser.add_subparsers(dest="name", required=True)
+
+    parser_broadcast = subparsers.add_parser("broadcast", help="消息广播")
+    parser_broadcast.add_argument("--games", type=int, default=200, help="对局数")
+    parser_broadcast.add_argument("--protocol", choices=["json", "binary"], default="json", help="通信格式")
+
+    parser_classify = subparsers.add_parser("classify", help="牌型判断")
+    parser_classify.add_argument("--plays", type=int, default=100000, help="出牌数")
+    parser_classify.add_argument("--verify", action="store_true", help="验证牌型表与原来的规则一致")
+    parser_classify.add_argument("--max-cards", type=int, default=7, help="验证时穷举不超过多少张牌的全部签名")
+
+    parser_moves = subparsers.add_parser("moves", help="出牌生成")
+    parser_moves.add_argument("--hands", type=int, default=1000, help="随机手牌数")
+
+    parser_batch = subparsers.add_parser("batch", help="批量判断牌型、比较大小")
+    parser_batch.add_argument("--plays", type=int, default=1000000, help="出牌数")
+
+    parser_deal = subparsers.add_parser("deal", help="发牌")
+    parser_deal.add_argument("--deals", type=int, default=100000, help="发牌次数")
+
+    parser_decompose = subparsers.add_parser("decompose", help="手牌拆分")
+    parser_decompose.add_argument("--hands", type=int, default=10000, help="手牌数")
+
+    parser_estimate = subparsers.add_parser("estimate", help="叫分胜率估计")
+    parser_estimate.add_argument("--hands", type=int, default=100, help="手牌数")
+    parser_estimate.add_argument("--budget", type=float, default=None, help="每次估计的截止秒数（默认不限）")
+
+    parser_endgame = subparsers.add_parser("endgame", help="残局求解")
+    parser_endgame.add_argument("--min-cards", type=int, default=5, help="每个玩家最少的手牌数")
+    parser_endgame.add_argument("--max-cards", type=int, default=12, help="每个玩家最多的手牌数")
+    parser_endgame.add_argument("--positions", type=int, default=10, help="每种手牌数的局面数")
+    parser_endgame.add_argument("--timeout", type=float, default=5, help="每个局面的求解秒数")
+
+    args = parser.parse_args()
+    if args.name == "broadcast":
+        bench_broadcast(args.games, poker_protocol.BINARY_CODEC if args.protocol == "binary" else poker_protocol.JSON_CODEC)
+    elif args.name == "classify":
+        bench_classify(args.plays, args.verify, args.max_cards)
+    elif args.name == "moves":
+        bench_moves(args.hands)
+    elif args.name == "batch":
+        bench_batch(args.plays)
+    elif args.name == "deal":
+        bench_deal(args.deals)
+    elif args.name == "decompose":
+        bench_decompose(args.hands)
+    elif args.name == "estimate":
+        bench_estimate(args.hands, args.budget)
+    elif args.name == "endgame":
+        bench_endgame(args.min_cards, args.max_cards, args.positions, args.timeout)
@@ -0,0 +1,259 @@
+# 无界面的机器人客户端和压力测试
+# 机器人使用真实的网络协议连接服务器，自动叫分、从出牌生成器生成的牌中选择要出的牌，出牌类型由客户端的 CardOrder.get_cards_type 判断
+# 用法：python poker_bot.py --rooms 20 --duration 30 [--host 127.0.0.1] [--port 9999] [--protocol json|binary] [--processes 1]
+# 每个房间 3 个机器人；统计服务器吞吐量（每分钟局数、每秒出牌步数）和出牌往返延迟的分位数
+# 服务器每局结束后默认等待 5 秒，压力测试时可以用 poker_server.py --end-delay 0 启动服务器
+
+import time
+import asyncio
+import argparse
+import multiprocessing
+
+from poker_client import CardOrder, PLAY_STATE
+from poker_rules import Hand, PlayTable, PlayDominance, CARD_ORDER_TYPE, get_signature_size
+from poker_protocol import JSON_CODEC, BINARY_CODEC, encode_handshake
+
+
+# 选择要出的牌，返回出牌指令（与客户端相同的格式），没有能出的牌时返回 "pass"
+# 从所有能出的牌中选择：尽量不用炸弹，权值最小，出任意牌时相同权值出牌数最多的
+def choose_commend(card_name_list, free_deal, last_card_type=None, last_card_list=None):
+    hand = Hand(CardOrder.make_card_list(card_name_list))
+    last = None
+    if not free_deal:
+        last_cards = CardOrder.make_card_list(last_card_list)
+        last = (CARD_ORDER_TYPE[last_card_type], PlayTable.classify_cards(last_cards)[1], len(last_cards))
+
+    best = None
+    best_key = None
+    for signature, card_type, power in PlayTable.generate_moves(hand, last):
+        key = (card_type in PlayDominance.BOMB_TYPES, power, -get_signature_size(signature) if free_deal else 0)
+        if best_key is None or key < best_key:
+            best = signature
+            best_key = key
+
+    if best is None:
+        return "pass"
+    return make_commend([str(card) for card in hand.pick_cards(best)])
+
+
+# 生成出牌指令
+def make_commend(card_name_list):
+    card_type = CardOrder.get_cards_type(card_name_list)
+    if card_type == -1:
+        return "pass"
+    return " ".join(card_name_list) + f'{card_type:02}'
+
+
+# 压力测试统计（一个进程一个）
+class BotStats:
+
+    def __init__(self):
+        self.__latency_list = []  # 出牌往返延迟秒数
+        self.__games = 0  # 完成的局数
+        self.__turns = 0  # 发送的指令数
+        self.__errors = 0  # 连接异常的机器人数
+
+    def add_latency(self, latency):
+        self.__latency_list.append(latency)
+
+    def add_game(self):
+        self.__games += 1
+
+    def add_turn(self):
+        self.__turns += 1
+
+    def add_error(self):
+        self.__errors += 1
+
+    def get_latency_list(self):
+        return self.__latency_list
+
+    def get_games(self):
+        return self.__games
+
+    def get_turns(self):
+        return self.__turns
+
+    def get_errors(self):
+        return self.__errors
+
+    # 合并其他进程的统计
+    def merge(self, other):
+        self.__latency_list.extend(other.get_latency_list())
+        self.__games += other.get_games()
+        self.__turns += other.get_turns()
+        self.__errors += other.get_errors()
+
+
+# 机器人类（协程）
+class Bot:
+
+    def __init__(self, room_name, player_name, codec, stats):
+        self.__room_name = room_name
+        self.__player_name = player_name
+        self.__codec = codec
+        self.__stats = stats
+
+        self.__my_index = 0
+        self.__card_list = []
+        self.__state = PLAY_STATE.WAIT
+        self.__prompted = False  # 收到了叫分或者出牌提示，还没有回应
+        self.__last_card_type = ''
+        self.__last_card_list = []
+        self.__send_time = None  # 上一次发送指令的时间（等待服务器回应）
+
+    # 连接服务器并一直游戏到 deadline（time.monotonic() 的时间）
+    async def run(self, host, port, deadline):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode_handshake(self.__room_name, self.__player_name, self.__codec))
+        frame_reader = self.__codec.create_reader()
+
+        try:
+            while True:
+                remain = deadline - time.monotonic()
+                if remain <= 0:
+                    break
+
+                try:
+                    data = await asyncio.wait_for(reader.read(4096), remain)
+                except asyncio.TimeoutError as ex:
+                    break
+                if len(data) == 0:
+                    raise ConnectionError("服务器关闭了连接")
+
+                now = time.monotonic()
+                frames = frame_reader.feed(data)
+                if frames and self.__send_time is not None:
+                    self.__stats.add_latency(now - self.__send_time)
+                    self.__send_time = None
+
+                for frame in frames:
+                    self.__on_message(self.__codec.decode_message(frame))
+
+                commend = self.__act()
+                if commend is not None:
+                    writer.write(self.__codec.encode_command(commend))
+                    self.__send_time = time.monotonic()
+                    self.__stats.add_turn()
+        finally:
+            writer.close()
+
+    # 处理服务器发来的一个消息（与客户端相同，只更新消息中带有的字段）
+    def __on_message(self, data):
+        if data['code'] == -1:
+            if self.__my_index == 0:
+                self.__stats.add_game()
+            self.__card_list = []
+            self.__state = PLAY_STATE.WAIT
+            self.__prompted = False
+            return
+
+        if data['code'] != 0:
+            raise ConnectionError(str(data['data']))
+
+        obj = data['data']
+        if 'my_index' in obj:
+            self.__my_index = obj['my_index']
+        if 'my_card_list' in obj:
+            self.__card_list = obj['my_card_list']
+        if 'last_card_type' in obj:
+            self.__last_card_type = obj['last_card_type']
+        if 'last_card_list' in obj:
+            self.__last_card_list = obj['last_card_list']
+        if 'state' in obj:
+            self.__state = PLAY_STATE(obj['state'])
+            self.__prompted = self.__state != PLAY_STATE.WAIT
+
+    # 根据当前状态选择要发送的指令（不需要操作时返回 None）
+    def __act(self):
+        if not self.__prompted:
+            return None
+        self.__prompted = False
+
+        if self.__state == PLAY_STATE.MARKING:
+            return "3"
+        elif self.__state == PLAY_STATE.FREE:
+            return choose_commend(self.__card_list, True)
+        elif self.__state == PLAY_STATE.PLAYING:
+            return choose_commend(self.__card_list, False, self.__last_card_type, self.__last_card_list)
+        return None
+
+
+# 在一个进程中运行多个房间的机器人
+async def run_rooms(host, port, room_names, duration, codec):
+    stats = BotStats()
+    deadline = time.monotonic() + duration
+
+    async def run_bot(bot):
+        try:
+            await bot.run(host, port, deadline)
+        except Exception as ex:
+            stats.add_error()
+
+    bots = []
+    for room_name in room_names:
+        for i in range(3):
+            bots.append(Bot(room_name, f"{room_name}-{i}", codec, stats))
+    await asyncio.gather(*[run_bot(bot) for bot in bots])
+    return stats
+
+
+# 进程入口（多进程压力测试时每个进程运行一部分房间）
+def run_process(host, port, room_names, duration, protocol):
+    codec = BINARY_CODEC if protocol == "binary" else JSON_CODEC
+    return asyncio.run(run_rooms(host, port, room_names, duration, codec))
+
+
+# 计算分位数（percent 为 0~100）
+def percentile(sorted_list, percent):
+    if len(sorted_list) == 0:
+        return 0.0
+    return sorted_list[min(len(sorted_list) - 1, int(len(sorted_list) * percent / 100))]
+
+
+# 测试
+def test():
+    assert choose_commend(["大王", "♠2", "♥3", "◆3"], True) == "◆3 ♥3" + f"{CardOrder.CARD_ORDER_TYPE['一对'].value:02}"
+    assert choose_commend(["♠2", "♥5", "♠5", "◆5", "♣5"], False, "一张", ["♥A"]) == "♠2" + f"{CardOrder.CARD_ORDER_TYPE['一张'].value:02}"
+    assert choose_commend(["♥5", "♠5", "◆5", "♣5"], False, "一对", ["♥2", "♠2"]) == \
+           "◆5 ♠5 ♣5 ♥5" + f"{CardOrder.CARD_ORDER_TYPE['炸弹'].value:02}"
+    assert choose_commend(["♥5", "♠6"], False, "顺子", ["♥3", "♠4", "♠5", "♠6", "♠7"]) == "pass"
+    assert choose_commend(["♥4", "♥5", "♠6", "♠7", "♠8", "♠9"], False, "顺子", ["♥3", "♠4", "♠5", "♠6", "♠7"]) == \
+           "♥4 ♥5 ♠6 ♠7 ♠8" + f"{CardOrder.CARD_ORDER_TYPE['顺子'].value:02}"
+    assert choose_commend(["♥4", "♥5", "♠6", "♠7", "♠8", "♠9"], True) == \
+           "♥4 ♥5 ♠6 ♠7 ♠8 ♠9" + f"{CardOrder.CARD_ORDER_TYPE['顺子'].value:02}"
+    assert choose_commend(["小王", "大王"], False, "炸弹", ["♥2", "♠2", "◆2", "♣2"]) == \
+           "小王 大王" + f"{CardOrder.CARD_ORDER_TYPE['王炸'].value:02}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="斗地主压力测试")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--rooms", type=int, default=10, help="房间数（每个房间3个机器人）")
+    parser.add_argument("--duration", type=float, default=30, help="测试秒数")
+    parser.add_argument("--protocol", choices=["json", "binary"], default="json", help="通信格式")
+    parser.add_argument("--processes", type=int, default=1, help="运行机器人的进程数")
+    args = parser.parse_args()
+
+    test()
+
+    # 房间平均分配到每个进程
+    room_names = [f"bot{i}" for i in range(args.rooms)]
+    process_count = max(1, min(args.processes, args.rooms))
+    with multiprocessing.Pool(process_count) as pool:
+        results = pool.starmap(run_process, [(args.host, args.port, room_names[i::process_count], args.duration, args.protocol)
+                                             for i in range(process_count)])
+
+    stats = BotStats()
+    for result in results:
+        stats.merge(result)
+
+    latency_list = sorted(stats.get_latency_list())
+    print(f"房间: {args.rooms}  机器人: {args.rooms * 3}  进程: {process_count}  通信格式: {args.protocol}  测试: {args.duration}s")
+    print(f"局数: {stats.get_games()}  每分钟: {stats.get_games() / args.duration * 60:.1f}")
+    print(f"出牌步数: {stats.get_turns()}  每秒: {stats.get_turns() / args.duration:.1f}")
+    print(f"往返延迟: P50 {percentile(latency_list, 50) * 1000:.2f}ms  P95 {percentile(latency_list, 95) * 1000:.2f}ms"
+          f"  P99 {percentile(latency_list, 99) * 1000:.2f}ms")
+    if stats.get_errors() > 0:
+        print(f"连接异常的机器人: {stats.get_errors()}")
@@ -7,10 +7,17 @@ import traceback
 from tkinter import *
 from tkinter import messagebox
 
-import pygame
+try:
+    import pygame
+except ImportError:
+    pygame = None  # 没有安装 pygame 时只能使用出牌逻辑（例如无界面的机器人客户端 poker_bot.py）
+
+from poker_protocol import JSON_CODEC, BINARY_CODEC, encode_handshake
+from poker_rules import Card, PlayTable, CARD_IDS, CARD_ORDER_TYPE
 
 host = "127.0.0.1"
 port = 9999
+protocol = "json"  # 通信格式：json 或 binary
 
 
 class PLAY_STATE(enum.Enum):
@@ -20,46 +27,6 @@ class PLAY_STATE(enum.Enum):
     FREE = 3
 
 
-class Card:
-    RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    SUITS = ['♥', '◆', '♣', '♠']
-    POWERS = {'3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14,
-              '2': 20, '小王': 99, '大王': 100}
-
-    def __init__(self, rank, suit):
-
-        if rank not in self.POWERS.keys():
-            raise Exception("无效牌【" + rank + "】")
-
-        self.__rank = rank
-        self.__suit = suit
-        self.__name = suit + rank
-        self.__power = self.POWERS[rank]
-
-    # 重载字符串表示方法
-    def __str__(self):
-        return self.__name
-
-    # 重载运算符实现排序
-    def __lt__(self, other):
-        if self.__power == other.__power:
-            return self.__suit < other.__suit
-
-        return self.__power < other.__power
-
-    def __eq__(self, other):
-        return self.__name == other.__name
-
-    def __hash__(self):
-        return hash(self.__name)
-
-    def get_rank(self):
-        return self.__rank
-
-    def get_power(self):
-        return self.__power
-
-
 # 出牌逻辑类
 # 用来获取出牌类型
 # 在客户端就做一些出牌逻辑判断
@@ -67,27 +34,22 @@ class Card:
 # 不仅为了减轻服务器端压力 ‘
 # 也考虑到以后可以加一个功能：有多种出牌类型后用户可以手动选择一种
 class CardOrder:
-    CARD_ORDER_TYPE = enum.Enum('CARD_ORDER_TYPE', ('一张', '一对', '三张', '双三张',
-                                                    '三带一', '三带二', '四带一', '四带二', '四带两对',
-                                                    '顺子', '连对', '飞机', '飞机带对子', '炸弹', '王炸'))
+    CARD_ORDER_TYPE = CARD_ORDER_TYPE
 
     @staticmethod
     def make_card_list(card_str_list):
-        # 根据输入生成牌列表   判断每张牌是否有花色，分割花色生成牌列表
+        # 根据输入查表获取牌列表（牌名称或者牌编号）
         card_list = []
         for card_str in card_str_list:
-            if len(card_str) == 0:
-                continue
-
-            if card_str[0] in Card.SUITS:
-                card_list.append(Card(card_str[1:], card_str[0]))
-            else:
-                card_list.append(Card(card_str, ""))
+            if isinstance(card_str, int):
+                card_list.append(Card.from_id(card_str))
+            elif len(card_str) != 0:
+                card_list.append(Card.parse(card_str))
 
         return card_list
 
     @staticmethod
-    # 获取出牌类型
+    # 获取出牌类型（查牌型表）
     # 返回值为 出牌类型
     # 如果返回值为-1 则出牌不符合规则
     def get_cards_type(card_str_list):
@@ -95,223 +57,10 @@ class CardOrder:
         # 通过卡片字符串列表 生成 卡片对象列表
         cards = CardOrder.make_card_list(card_str_list)
 
-        cards.sort()
-
-        # 判断是否为一张
-        if len(cards) == 1:
-            return CardOrder.CARD_ORDER_TYPE['一张'].value
-
-        # 统计数量
-        card_count_map = {}
-        power_list = []
-        for item in cards:
-            power = item.get_power()
-            if power not in card_count_map.keys():
-                card_count_map[power] = 0
-            card_count_map[power] += 1
-        power_list = tuple(card_count_map.keys())
-
-        # 数量列表
-        count_list = []
-        # 每个数量对应牌的列表
-        count_card_map = {}
-        for power in card_count_map.keys():
-            count = card_count_map[power]
-            if count not in count_card_map.keys():
-                count_card_map[count] = []
-            count_card_map[count].append(power)
-        count_list = tuple(count_card_map.keys())
-
-        # 判断是否为一对
-        # 1. 计数只有1种
-        # 2. 有数量为2个的牌
-        # 3. 数量为2个的牌有1种
-        if len(count_card_map) == 1 \
-                and 2 in count_list \
-                and len(count_card_map[2]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['一对'].value
-
-        # 判断是否为三张
-        # 1. 计数只有1种
-        # 2. 有数量为3个的牌
-        # 3. 数量为3个的牌有1种
-        if len(count_card_map) == 1 \
-                and 3 in count_list \
-                and len(count_card_map[3]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['三张'].value
-
-        # 判断是否为双三张
-        # 1. 计数只有1种
-        # 2. 有数量为3个的牌
-        # 3. 数量为3个的牌有2种
-        if len(count_card_map) == 1 \
-                and 3 in count_list \
-                and len(count_card_map[3]) == 2:
-            return CardOrder.CARD_ORDER_TYPE['双三张'].value
-
-        # 判断是否为三带一
-        # 1. 计数只有2种
-        # 2. 有数量为3个的牌
-        # 3. 有数量为1个的牌
-        # 4. 数量为3个的牌有1种
-        # 5. 数量为1个的牌有1种
-        if len(count_card_map) == 2 \
-                and 3 in count_list \
-                and 1 in count_list \
-                and len(count_card_map[3]) == 1 \
-                and len(count_card_map[1]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['三带一'].value
-
-        # 判断是否为三带二
-        # 1. 计数只有2种
-        # 2. 有数量为3个的牌
-        # 3. 有数量为2个的牌
-        # 4. 数量为3个的牌有1种
-        # 5. 数量为2个的牌有1种
-        if len(count_card_map) == 2 \
-                and 3 in count_list \
-                and 2 in count_list \
-                and len(count_card_map[3]) == 1 \
-                and len(count_card_map[2]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['三带二'].value
-
-        # 判断是否为四带一
-        # 1. 计数只有2种
-        # 2. 有数量为4个的牌
-        # 3. 有数量为1个的牌
-        # 4. 数量为4个的牌有1种
-        # 5. 数量为1个的牌有1种
-        if len(count_card_map) == 2 \
-                and 4 in count_list \
-                and 1 in count_list \
-                and len(count_card_map[4]) == 1 \
-                and len(count_card_map[1]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['四带一'].value
-
-        # 判断是否为四带二
-        # 1. 有数量为4个的牌
-        # 2. 数量为4个的牌有1种
-        # 3. 其他牌数量为2
-        if 4 in count_list \
-                and len(count_card_map[4]) == 1 \
-                and len(cards) - 4 == 2:
-            return CardOrder.CARD_ORDER_TYPE['四带二'].value
-
-        # 判断是否为四带两对
-        # 1. 计数只有2种
-        # 2. 有数量为4个的牌
-        # 3. 有数量为2个的牌
-        # 4. 数量为4个的牌有1种
-        # 5. 数量为2个的牌有2种
-        if len(count_card_map) == 2 \
-                and 4 in count_list \
-                and 2 in count_list \
-                and len(count_card_map[4]) == 1 \
-                and len(count_card_map[2]) == 2:
-            return CardOrder.CARD_ORDER_TYPE['四带两对'].value
-
-        # 判断是否为顺子
-        # 1. 计数只有1种
-        # 2. 有数量为1个的牌
-        # 5. 数量为1个的牌大于等于5种
-        if len(count_card_map) == 1 \
-                and 1 in count_list \
-                and len(count_card_map[1]) >= 5 \
-                and CardOrder.__is_continuous(count_card_map[1]):
-            return CardOrder.CARD_ORDER_TYPE['顺子'].value
-
-        # 判断是否为连对
-        # 1. 计数只有1种
-        # 2. 有数量为2个的牌
-        # 3. 数量为2个的牌大于等于3种
-        # 4. 数量为2个的牌连续
-        if len(count_card_map) == 1 \
-                and 2 in count_list \
-                and len(count_card_map[2]) >= 3 \
-                and CardOrder.__is_continuous(count_card_map[2]):
-            return CardOrder.CARD_ORDER_TYPE['连对'].value
-
-        # 判断是否为飞机
-        # 1. 有数量为3个的牌
-        # 2. 数量为3个的牌大于等于2
-        # 3. 牌数为3的牌种类数量 等于 其他牌数量
-        # 4. 数量为3个的牌连续
-        if 3 in count_list \
-                and len(count_card_map[3]) >= 2 \
-                and len(count_card_map[3]) == len(cards) - len(count_card_map[3]) * 3 \
-                and CardOrder.__is_continuous(count_card_map[3]):
-            return CardOrder.CARD_ORDER_TYPE['飞机'].value
-
-        # 特判特别的飞机（比如三个飞机带三个相同的牌）
-        # 1. 有数量为3个的牌
-        # 2. 数量为3个的牌大于等于3
-        # 3. 牌数为3的牌种类数量-1 等于 其他牌数量+3
-        # 4. 数量为3个的牌连续 有【牌数为3的牌种类数量-1】个连续的
-        if 3 in count_list \
-                and len(count_card_map[3]) >= 3 \
-                and len(count_card_map[3]) - 1 == len(cards) - len(count_card_map[3]) * 3 + 3:
-            return CardOrder.CARD_ORDER_TYPE['飞机'].value
-
-        # 判断是否为飞机带对子
-        # 1. 计数只有2种
-        # 2. 有数量为3个的牌
-        # 3. 有数量为2个的牌
-        # 4. 数量为3个的牌大于等于2
-        # 5. 牌数为2的牌种类数量 等于 牌数为3的牌种类数量
-        # 6. 数量为3个的牌连续
-        if len(count_card_map) == 2 \
-                and 3 in count_list \
-                and 2 in count_list \
-                and len(count_card_map[3]) >= 2 \
-                and len(count_card_map[2]) == len(count_card_map[3]) \
-                and CardOrder.__is_continuous(count_card_map[3]):
-            return CardOrder.CARD_ORDER_TYPE['飞机带对子'].value
-
-        #  特判特别的飞机带对子（比如两个飞机带四个相同的牌）
-        # 1. 有数量为3个的牌
-        # 2. 只能有牌为3张、2张、4张的（所以只判断没有数量为1的牌）
-        # 3. 数量为3个的牌大于等于2
-        # 4. 除【数量为3个的牌】其他牌数量/2 等于 牌数为3的牌种类数量
-        # 5. 数量为3个的牌连续
-        if 3 in count_list \
-                and 1 not in count_list \
-                and len(count_card_map[3]) >= 2 \
-                and (len(cards) - len(count_card_map[3]) * 3) / 2 == len(count_card_map[3]) \
-                and CardOrder.__is_continuous(count_card_map[3]):
-            return CardOrder.CARD_ORDER_TYPE['飞机带对子'].value
-
-        # 判断是否为炸弹
-        # 1. 计数只有1种
-        # 2. 有数量为4个的牌
-        # 3. 数量为4个的牌有1种
-        if len(count_card_map) == 1 \
-                and 4 in count_list \
-                and len(count_card_map[4]) == 1:
-            return CardOrder.CARD_ORDER_TYPE['炸弹'].value
-
-        # 判断为王炸
-        # 1. 计数只有1种
-        # 2. 有数量为1个的牌
-        # 3. 数量为1个的牌有2种
-        # 4. 大王在其中
-        # 5. 小王在其中
-        if len(count_card_map) == 1 \
-                and 1 in count_list \
-                and len(count_card_map[1]) == 2 \
-                and Card('大王', '').get_power() in count_card_map[1] \
-                and Card('小王', '').get_power() in count_card_map[1]:
-            return CardOrder.CARD_ORDER_TYPE['王炸'].value
-
-        return -1
-
-    # 判断数组是否连续
-    @staticmethod
-    def __is_continuous(arr):
-        arr.sort()
-        for i in range(1, len(arr)):
-            if arr[i] != arr[i - 1] + 1:
-                return False
-        return True
+        play = PlayTable.classify_cards(cards)
+        if play is None:
+            return -1
+        return play[0].value
 
 
 class MyGame:
@@ -319,8 +68,10 @@ class MyGame:
     def __init__(self, player_name, room_name):
         global host
         global port
+        global protocol
         self.__player_name = player_name
         self.__room_name = room_name
+        self.__codec = BINARY_CODEC if protocol == "binary" else JSON_CODEC
 
         self.screen_size = (1000, 750)
 
@@ -354,8 +105,9 @@ class MyGame:
         # 创建 socket 对象
         self.__clientsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.__clientsocket.connect((host, port))
-        self.__clientsocket.send((self.__room_name + "\n" + self.__player_name).encode("utf-8"))
+        self.__clientsocket.sendall(encode_handshake(self.__room_name, self.__player_name, self.__codec))
         self.__clientsocket.setblocking(False)
+        self.__frame_reader = self.__codec.create_reader()
 
     def play(self):
 
@@ -389,29 +141,19 @@ class MyGame:
 
             my_card_choose_map = {}  # 牌的选中状态
 
-            last_data = ''  # 当消息接受一半的时候先保存起来
             while True:
 
                 time.sleep(0.02)
 
                 # 接收Socket消息
-                datas = ''
+                frames = []
                 try:
-                    datas = str(self.__clientsocket.recv(1024).decode("utf-8")).split("\n")
+                    frames = self.__frame_reader.read_from(self.__clientsocket)
                 except BlockingIOError as e:
                     pass  # 如果没有数据了
 
-                for data in datas:
-                    if data == '':
-                        continue
-
-                    if data[-1] != '}':
-                        last_data += data
-                        continue
-                    data = last_data + data
-                    last_data = ''
-
-                    data = json.loads(data)
+                for frame in frames:
+                    data = self.__codec.decode_message(frame)
                     print(str(data))
                     if data['code'] == 0:
 
@@ -450,6 +192,12 @@ class MyGame:
                         if 'state' in obj.keys():
                             state = PLAY_STATE(obj['state'])
 
+                        # 提示的牌：只选中这些牌
+                        if 'hint_card_list' in obj.keys():
+                            my_card_choose_map.clear()
+                            for card_name in obj['hint_card_list']:
+                                my_card_choose_map[card_name] = True
+
                     elif data['code'] == -1:
                         # 重置所有内容
                         my_card_list = []
@@ -633,7 +381,7 @@ class MyGame:
 
                                 # 【不出】按钮
                                 if (not free_deal) and 380 <= event.pos[0] <= 380 + 80:
-                                    self.__clientsocket.send("pass".encode("utf-8"))
+                                    self.__clientsocket.sendall(self.__codec.encode_command("pass"))
 
                                 # 【出牌】按钮
                                 elif 510 <= event.pos[0] <= 510 + 80:
@@ -649,26 +397,30 @@ class MyGame:
                                         top_message = "出牌不符合规则"
                                     else:
                                         s = " ".join(choose_card_name_list) + f'{card_type:02}'
-                                        self.__clientsocket.send(s.encode("utf-8"))
+                                        self.__clientsocket.sendall(self.__codec.encode_command(s))
+
+                                # 【提示】按钮
+                                elif 640 <= event.pos[0] <= 640 + 80:
+                                    self.__clientsocket.sendall(self.__codec.encode_command("hint"))
 
 
                             # 如果正在叫分，则判断叫分按钮
                             elif marking:
                                 # 【不叫】按钮
                                 if 250 <= event.pos[0] <= 250 + 80:
-                                    self.__clientsocket.send("0".encode("utf-8"))
+                                    self.__clientsocket.sendall(self.__codec.encode_command("0"))
 
                                 # 【1分】按钮
                                 elif 380 <= event.pos[0] <= 380 + 80:
-                                    self.__clientsocket.send("1".encode("utf-8"))
+                                    self.__clientsocket.sendall(self.__codec.encode_command("1"))
 
                                 # 【2分】按钮
                                 elif 510 <= event.pos[0] <= 510 + 80:
-                                    self.__clientsocket.send("2".encode("utf-8"))
+                                    self.__clientsocket.sendall(self.__codec.encode_command("2"))
 
                                 # 【3分】按钮
                                 elif 640 <= event.pos[0] <= 640 + 80:
-                                    self.__clientsocket.send("3".encode("utf-8"))
+                                    self.__clientsocket.sendall(self.__codec.encode_command("3"))
 
                 # 画背景
                 screen.fill('lightblue')
@@ -758,6 +510,9 @@ class MyGame:
                     pygame.draw.rect(screen, (255, 128, 0), (510, 460, 80, 35), 0, border_radius=8)
                     screen.blit(font_button.render("出牌", True, (0, 0, 0)), (530, 467))
 
+                    pygame.draw.rect(screen, (255, 128, 0), (640, 460, 80, 35), 0, border_radius=8)
+                    screen.blit(font_button.render("提示", True, (0, 0, 0)), (660, 467))
+
                 pygame.display.flip()  # 更新屏幕内容
         finally:
             pygame.quit()
@@ -859,6 +614,10 @@ def test():
 
         assert len(set([Card("3", "♥"), Card("3", "♠"), Card("3", "♣"), Card("3", "◆")])) == 4
 
+        # 牌编号
+        assert [str(card) for card in CardOrder.make_card_list([0, 51, 52, 53])] == ["◆3", "♥2", "小王", "大王"]
+        assert Card("10", "♠").get_id() == CARD_IDS["♠10"] and Card.from_id(Card("10", "♠").get_id()) == Card("10", "♠")
+
     except Exception as ex:
         print("没有通过测试")
         print(ex.__str__())
@@ -868,6 +627,8 @@ def test():
 if __name__ == '__main__':
     if len(sys.argv) >= 2:
         host = sys.argv[1]
+    if len(sys.argv) >= 3:
+        protocol = sys.argv[2]
 
     test()
     root = Tk()
@@ -0,0 +1,326 @@
+# 叫分时估计地主的胜率（numpy 向量化的蒙特卡洛模拟，需要安装 numpy）
+# 叫分的玩家只知道自己的 17 张牌：把其余 37 张牌随机分成 3 张底牌和两个农民各 17 张，假设叫分的玩家当地主（拿到底牌、先出牌），
+# 成批地同时模拟几百局：每一步所有还没结束的对局同时由当前的玩家按同一个快速的规则策略出牌
+# 规则策略只出单张、对子、三张（带一张或者一对）、顺子、炸弹和王炸：
+#   出任意牌时从最小的点数出（能连成顺子时出最长的顺子，三张带最小的单张或者对子），不拆炸弹和王炸，只剩炸弹时才出炸弹
+#   跟牌时出能压过上次出牌的最小的同类型的牌（不拆炸弹），不压同伴的牌；压不过时只有对手剩下的牌不多才用炸弹
+# 每模拟一批计算一次胜率的 Wilson 置信区间，区间足够窄、模拟局数达到上限或者超过截止时间时结束
+# 有截止时间时每批开始前按测量的耗时（每批的固定耗时加上每局的耗时）把这一批缩小到剩余时间内，剩余时间不够模拟一小批时结束
+# 手牌用 (局数, 15) 的点数牌数矩阵表示（与 Hand.get_counts() 相同）
+
+import time
+import math
+
+import numpy as np
+
+from poker_rules import RANK_COUNT, RANK_LIMITS
+
+# 规则策略的出牌类型
+NONE, SINGLE, PAIR, TRIPLE, TRIPLE_SINGLE, TRIPLE_PAIR, STRAIGHT, BOMB, ROCKET = range(9)
+# 出牌类型 -> 主牌每个点数的牌数
+TYPE_COUNTS = np.array([0, 1, 2, 3, 3, 3, 1, 4, 0], dtype=np.int8)
+
+RANKS = np.arange(RANK_COUNT)
+
+
+# 地主胜率估计
+class WinEstimator:
+    BATCH = 512  # 每批同时模拟的局数
+    MAX_GAMES = 4096  # 最多模拟的局数
+    TARGET = 0.03  # 置信区间的半宽不超过这个值时结束
+    Z = 1.96  # 95% 置信区间
+    BOMB_CARDS = 4  # 跟牌时对手剩下的牌不超过这个数才用炸弹
+    MIN_BATCH = 16  # 有截止时间时一批最少模拟的局数（剩余时间不够时结束）
+    BATCH_COST = 0.015  # 每批模拟的固定秒数（模拟的步数与局数无关，每一步都有固定的开销）
+    GAME_COST = 0.00007  # 每局模拟的秒数
+    __speed = 1.0  # 实际耗时与上面两项估计的耗时之比（每批模拟后更新，所有估计共用）
+
+    # seed 为 numpy 随机数生成器的种子（或者 np.random.Generator），为 None 时随机
+    def __init__(self, seed=None):
+        self.__rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.__games = 0  # 最近一次估计模拟的局数
+
+    def get_games(self):
+        return self.__games
+
+    # counts 为叫分的玩家的 17 张牌每个点数的牌数，deadline 为 time.perf_counter() 的截止时间
+    # 返回 (地主胜率, 置信区间下限, 置信区间上限)；截止时间之前来不及模拟时返回 (0.5, 0.0, 1.0)，get_games() 为 0
+    def estimate(self, counts, deadline=None, max_games=None, target=None):
+        max_games = max_games if max_games is not None else WinEstimator.MAX_GAMES
+        target = target if target is not None else WinEstimator.TARGET
+        counts = np.asarray(counts, dtype=np.int8)
+        hidden = np.repeat(RANKS, np.array(RANK_LIMITS) - counts)
+        if len(hidden) != 37:
+            raise ValueError("叫分的手牌必须是 17 张不重复的牌")
+
+        wins = 0
+        games = 0
+        low, high = 0.0, 1.0
+        while games < max_games:
+            batch = min(WinEstimator.BATCH, max_games - games)
+            start = time.perf_counter()
+            if deadline is not None:
+                batch = min(batch, WinEstimator.fit_batch(deadline - start))
+                if batch < WinEstimator.MIN_BATCH:
+                    break
+            wins += int((WinEstimator.rollout(self.deal(counts, hidden, batch)) == 0).sum())
+            games += batch
+            WinEstimator.__measure(batch, time.perf_counter() - start)
+            low, high = WinEstimator.wilson(wins, games)
+            if (high - low) / 2 <= target:
+                break
+
+        self.__games = games
+        if games == 0:
+            return 0.5, 0.0, 1.0
+        return wins / games, low, high
+
+    # seconds 秒内能模拟的局数（按测量的耗时估计）
+    @staticmethod
+    def fit_batch(seconds):
+        return int((seconds / WinEstimator.__speed - WinEstimator.BATCH_COST) / WinEstimator.GAME_COST)
+
+    # 模拟一批后更新实际耗时与估计耗时之比（指数平均，偏慢的测量立即生效）
+    @staticmethod
+    def __measure(batch, seconds):
+        ratio = seconds / (WinEstimator.BATCH_COST + WinEstimator.GAME_COST * batch)
+        WinEstimator.__speed = max(ratio, WinEstimator.__speed * 0.8 + ratio * 0.2)
+
+    # 随机分配其余的牌：返回 (局数, 3, 15) 的手牌，座位 0 为地主（叫分的玩家加上底牌），座位 1、2 为地主之后出牌的两个农民
+    def deal(self, counts, hidden, games):
+        cards = self.__rng.permuted(np.broadcast_to(hidden, (games, len(hidden))), axis=1)
+        seats = np.repeat([0, 1, 2], [3, 17, 17])  # 前 3 张为底牌，之后每个农民 17 张
+        index = (np.arange(games)[:, None] * 3 + seats) * RANK_COUNT + cards
+        hands = np.bincount(index.ravel(), minlength=games * 3 * RANK_COUNT).astype(np.int8).reshape(games, 3, RANK_COUNT)
+        hands[:, 0] += counts
+        return hands
+
+    # Wilson 置信区间
+    @staticmethod
+    def wilson(wins, games):
+        z = WinEstimator.Z
+        rate = wins / games
+        center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+        half = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+        return max(0.0, center - half), min(1.0, center + half)
+
+    # 按规则策略同时模拟 (局数, 3, 15) 的手牌（会被修改），座位 0 先出牌，返回每局的胜利者座位
+    # trace 不为 None 时每一步追加 (局的编号, 出牌的座位, 出牌的点数牌数（不出为全 0）, 出牌类型, 权值点数, 顺子长度)
+    @staticmethod
+    def rollout(hands, trace=None):
+        games = len(hands)
+        winners = np.full(games, -1, dtype=np.int8)
+        active = np.arange(games)
+        turn = np.zeros(games, dtype=np.int64)
+        last_type = np.zeros(games, dtype=np.int8)
+        last_rank = np.zeros(games, dtype=np.int64)
+        last_length = np.zeros(games, dtype=np.int64)
+        last_seat = np.zeros(games, dtype=np.int64)
+
+        while len(active):
+            seat = turn[active]
+            hand = hands[active, seat]
+            lead = (last_type[active] == NONE) | (last_seat[active] == seat)
+            sizes = hands[active].sum(axis=2, dtype=np.int64)
+            play, play_type, play_rank, play_length = WinEstimator.__choose(
+                hand, lead, last_type[active], last_rank[active], last_length[active],
+                (seat != 0) & (last_seat[active] != 0) & ~lead, sizes[np.arange(len(active)), last_seat[active]])
+
+            played = play_type != NONE
+            hands[active, seat] = hand - play
+            if trace is not None:
+                trace.append((active.copy(), seat.copy(), play.copy(), play_type.copy(), play_rank.copy(), play_length.copy()))
+            rows = active[played]
+            last_type[rows] = play_type[played]
+            last_rank[rows] = play_rank[played]
+            last_length[rows] = play_length[played]
+            last_seat[rows] = seat[played]
+            turn[active] = (seat + 1) % 3
+
+            finished = played & (hand.sum(axis=1, dtype=np.int64) == play.sum(axis=1, dtype=np.int64))
+            winners[active[finished]] = seat[finished]
+            active = active[~finished]
+        return winners
+
+    # 每局当前玩家的出牌，返回 (出牌的点数牌数, 出牌类型, 权值点数, 顺子长度)
+    # hand 为当前玩家的手牌，lead 为是否出任意牌，partner 为上次出牌是否是同伴（农民）出的，last_size 为上次出牌的玩家剩下的牌数
+    @staticmethod
+    def __choose(hand, lead, last_type, last_rank, last_length, partner, last_size):
+        games = len(hand)
+        rows = np.arange(games)
+        hand = hand.astype(np.int64)
+        rocket = (hand[:, 13] == 1) & (hand[:, 14] == 1)
+        bombs = hand == 4
+        # 不拆炸弹和王炸时可以出的牌
+        spare = np.where(bombs, 0, hand)
+        spare[rocket, 13:] = 0
+        # 从每个点数开始连续有牌的点数个数（顺子，不含 2 和大小王）
+        runs = np.zeros((games, 13), dtype=np.int64)
+        for rank_index in range(11, -1, -1):
+            runs[:, rank_index] = np.where(spare[:, rank_index] > 0, runs[:, rank_index + 1] + 1, 0)
+        runs = np.minimum(runs[:, :12], 12)
+
+        play_type = np.zeros(games, dtype=np.int8)
+        play_rank = np.zeros(games, dtype=np.int64)
+        play_length = np.zeros(games, dtype=np.int64)
+
+        # 出任意牌：最小的点数
+        has_spare = spare.any(axis=1)
+        lowest = np.argmax(spare > 0, axis=1)
+        lowest_count = spare[rows, lowest]
+        lowest_run = runs[rows, np.minimum(lowest, 11)] * (lowest < 12)
+        choice = lead & has_spare
+        straight = choice & (lowest_run >= 5)
+        play_type[straight] = STRAIGHT
+        play_length[straight] = lowest_run[straight]
+        simple = choice & ~straight
+        play_type[simple] = np.array([NONE, SINGLE, PAIR, TRIPLE], dtype=np.int8)[lowest_count[simple]]
+        play_rank[choice] = lowest[choice]
+        # 只剩炸弹和王炸
+        only_bombs = lead & ~has_spare
+        bomb_rank = np.argmax(bombs, axis=1)
+        has_bomb = bombs.any(axis=1)
+        use_bomb = only_bombs & has_bomb
+        play_type[use_bomb] = BOMB
+        play_rank[use_bomb] = bomb_rank[use_bomb]
+        play_type[only_bombs & ~has_bomb] = ROCKET
+
+        # 跟牌：能压过上次出牌的最小的同类型的牌
+        follow = ~lead & ~partner
+        for card_type in (SINGLE, PAIR, TRIPLE, TRIPLE_SINGLE, TRIPLE_PAIR):
+            mask = follow & (last_type == card_type)
+            if not mask.any():
+                continue
+            need = TYPE_COUNTS[card_type]
+            limit = RANK_COUNT if card_type == SINGLE else 13
+            able = (spare >= need) & (RANKS > last_rank[:, None]) & (RANKS < limit)
+            found = mask & able.any(axis=1)
+            play_type[found] = card_type
+            play_rank[found] = np.argmax(able, axis=1)[found]
+        mask = follow & (last_type == STRAIGHT)
+        if mask.any():
+            able = (runs >= last_length[:, None]) & (RANKS[:12] > last_rank[:, None])
+            found = mask & able.any(axis=1)
+            play_type[found] = STRAIGHT
+            play_rank[found] = np.argmax(able, axis=1)[found]
+            play_length[found] = last_length[found]
+
+        # 三张带最小的单张（没有时带最小的对子）；跟牌时必须带同样的牌，带不了就不出
+        triples = play_type == TRIPLE
+        kickers = spare.copy()
+        kickers[rows, play_rank] = 0
+        single_kicker = (kickers == 1) & triples[:, None]
+        pair_kicker = (kickers == 2) & triples[:, None]
+        has_single = single_kicker.any(axis=1)
+        has_pair = pair_kicker.any(axis=1)
+        kicker_rank = np.where(has_single, np.argmax(single_kicker, axis=1), np.argmax(pair_kicker, axis=1))
+        lead_triples = triples & lead
+        play_type[lead_triples & has_single] = TRIPLE_SINGLE
+        play_type[lead_triples & ~has_single & has_pair] = TRIPLE_PAIR
+        follow_kicker = ~lead & (last_type == TRIPLE_SINGLE) | ~lead & (last_type == TRIPLE_PAIR)
+        need_single = follow_kicker & (last_type == TRIPLE_SINGLE)
+        single_any = ((kickers >= 1) & (RANKS[None, :] != play_rank[:, None])).astype(bool)
+        single_any_rank = np.argmax(single_any, axis=1)
+        pair_any = kickers >= 2
+        pair_any_rank = np.argmax(pair_any, axis=1)
+        kicker_rank = np.where(need_single, single_any_rank, np.where(follow_kicker, pair_any_rank, kicker_rank))
+        missing = follow_kicker & (play_type != NONE) & np.where(need_single, ~single_any.any(axis=1), ~pair_any.any(axis=1))
+        play_type[missing] = NONE
+
+        # 压不过时用炸弹压对手（对手剩下的牌不多）
+        urgent = follow & (play_type == NONE) & (last_size <= WinEstimator.BOMB_CARDS)
+        able = bombs & ((last_type != BOMB)[:, None] | (RANKS > last_rank[:, None])) & (last_type != ROCKET)[:, None]
+        found = urgent & able.any(axis=1)
+        play_type[found] = BOMB
+        play_rank[found] = np.argmax(able, axis=1)[found]
+        play_type[urgent & ~found & rocket & (last_type != ROCKET)] = ROCKET
+
+        # 生成出牌的点数牌数
+        play = np.zeros((games, RANK_COUNT), dtype=np.int8)
+        main = (play_type != NONE) & (play_type != ROCKET) & (play_type != STRAIGHT)
+        play[rows[main], play_rank[main]] = TYPE_COUNTS[play_type[main]]
+        straight = play_type == STRAIGHT
+        span = (RANKS >= play_rank[:, None]) & (RANKS < (play_rank + play_length)[:, None]) & straight[:, None]
+        play[span] = 1
+        play[play_type == ROCKET, 13:] = 1
+        with_single = play_type == TRIPLE_SINGLE
+        play[rows[with_single], kicker_rank[with_single]] = 1
+        with_pair = play_type == TRIPLE_PAIR
+        play[rows[with_pair], kicker_rank[with_pair]] = 2
+        return play, play_type, play_rank, play_length
+
+
+# 测试
+def test():
+    import random
+    from poker_rules import Deck, PlayTable, CARD_ORDER_TYPE, make_signature, get_signature_size
+
+    # 模拟的每一步都是合法的出牌：牌型正确、压得过上次出牌，每局都有胜利者
+    rng = random.Random(1)
+    deck = Deck(rng)
+    hands = np.zeros((300, 3, RANK_COUNT), dtype=np.int8)
+    for i in range(len(hands)):
+        hand_list, bottom = deck.deal_hands()
+        hand_list[0].add_cards(bottom)
+        hands[i] = [hand.get_counts() for hand in hand_list]
+    start = hands.copy()
+    trace = []
+    winners = WinEstimator.rollout(hands, trace)
+    assert (winners >= 0).all()
+    assert (hands[np.arange(len(hands)), winners].sum(axis=1) == 0).all()
+
+    type_names = {SINGLE: '一张', PAIR: '一对', TRIPLE: '三张', TRIPLE_SINGLE: '三带一', TRIPLE_PAIR: '三带二',
+                  STRAIGHT: '顺子', BOMB: '炸弹', ROCKET: '王炸'}
+    last = {}  # 局的编号 -> (出牌类型, 权值, 牌数, 座位)
+    remaining = start.astype(np.int64)
+    for games, seats, plays, play_types, play_ranks, play_lengths in trace:
+        for game, seat, play, play_type in zip(games, seats, plays, play_types):
+            game_last = last.get(game)
+            if game_last is not None and game_last[3] == seat:
+                game_last = None
+            if play_type == NONE:
+                assert game_last is not None, "出任意牌时不出"
+                continue
+            signature = make_signature({rank_index: int(count) for rank_index, count in enumerate(play) if count})
+            classified = PlayTable.classify(signature)
+            assert classified is not None and classified[0] == CARD_ORDER_TYPE[type_names[int(play_type)]]
+            if game_last is not None:
+                assert PlayTable.beats(*classified, get_signature_size(signature), game_last[:3])
+            remaining[game, seat] -= play
+            assert (remaining[game, seat] >= 0).all()
+            last[game] = (*classified, get_signature_size(signature), seat)
+
+    # 估计：大牌多的手牌胜率更高；同一个种子的结果相同；置信区间宽时提前结束
+    strong = [0] * RANK_COUNT
+    for rank_index, count in ((0, 1), (1, 1), (2, 1), (3, 1), (4, 1), (10, 4), (11, 2), (12, 4), (13, 1), (14, 1)):
+        strong[rank_index] = count
+    weak = [0] * RANK_COUNT
+    for rank_index, count in ((0, 2), (1, 1), (2, 2), (3, 1), (4, 2), (5, 1), (6, 2), (7, 1), (8, 2), (9, 1), (10, 2)):
+        weak[rank_index] = count
+    estimator = WinEstimator(1)
+    strong_rate, low, high = estimator.estimate(strong)
+    assert strong_rate > 0.8 and low <= strong_rate <= high and (high - low) / 2 <= WinEstimator.TARGET
+    weak_rate = estimator.estimate(weak)[0]
+    assert weak_rate < strong_rate - 0.3
+    assert WinEstimator(2).estimate(weak, max_games=1024) == WinEstimator(2).estimate(weak, max_games=1024)
+    estimator.estimate(weak, target=0.2)
+    assert estimator.get_games() == WinEstimator.BATCH
+    assert estimator.estimate(weak, deadline=0) == (0.5, 0.0, 1.0) and estimator.get_games() == 0
+
+    # 截止时间：每批开始前按剩余时间缩小，超出截止时间不多于一小段时间（不会多模拟一整批）
+    for budget in (0.001, 0.03, 0.1, 0.1, 0.1):
+        start = time.perf_counter()
+        estimator.estimate(weak, start + budget, target=0)
+        assert time.perf_counter() - start - budget < 0.025
+    assert estimator.get_games() > 0
+
+    try:
+        estimator.estimate(weak[:-1] + [2])
+    except ValueError:
+        pass
+    else:
+        assert False, "不合法的手牌"
+
+
+if __name__ == '__main__':
+    test()
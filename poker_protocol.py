@@ -0,0 +1,631 @@
+# 通信协议（客户端与服务端共用）
+# 握手：客户端依次发送房间名称、玩家名称两行 UTF-8 文本（以换行符结尾）；
+#      如果第一行为 BINARY_MAGIC，则后面两行为房间名称、玩家名称，握手之后双方都使用二进制格式
+#
+# JSON 格式（默认）：每一帧为一行 UTF-8 文本，以换行符结尾
+#   客户端 -> 服务端：每帧为一条指令（叫分、出牌、不出）
+#   服务端 -> 客户端：每帧为一个 JSON 消息 {"code": ..., "data": ..., "player": 接收者名称}
+#
+# 二进制格式：每一帧为 2 字节长度（大端）+ 记录，记录第一个字节为记录类型
+#   牌编码为 1 个字节（牌编号 0~53，见 poker_rules.CARD_NAMES），出牌类型编码为 1 个字节（CardOrder.CARD_ORDER_TYPE 的值）
+#   客户端 -> 服务端：叫分 [0, 分数]，不出 [1]，出牌 [2, 出牌类型, 牌...]
+#   服务端 -> 客户端：游戏消息 [0, (字段编号, 字段值)...]，提示信息 [1, UTF-8 文本]，结束本局 [2]
+#
+# 服务端发送的消息分为两部分编码：所有接收者共用的消息体（code 和 data）只序列化一次，
+# 每个接收者只在后面拼接自己的名称（连接建立时编码一次后缓存，二进制格式不发送接收者名称）
+
+import json
+
+from poker_rules import CARD_NAMES, CARD_IDS, CARD_ORDER_TYPE
+
+
+MAX_FRAME_SIZE = 64 * 1024  # 默认单帧最大字节数
+BINARY_MAGIC = "#binary/1"  # 握手时请求使用二进制格式
+MAX_NAME_SIZE = 0xFF  # 房间名称、玩家名称的最大字节数（UTF-8，二进制格式的玩家列表按一个字节的长度编码名称）
+
+# 出牌类型名称（下标 + 1 为 CARD_ORDER_TYPE 的值）
+CARD_TYPE_NAMES = tuple(card_type.name for card_type in CARD_ORDER_TYPE)
+CARD_TYPE_IDS = {name: index + 1 for index, name in enumerate(CARD_TYPE_NAMES)}
+
+
+# 拆分出牌指令，返回 (牌名称列表, 出牌类型数值)，没有出牌类型时出牌类型为 None（由服务器判断）
+# 出牌类型是两位数字，直接接在最后一张牌后面（例如 "♥3 ♠302"）；
+# 牌名称本身也可能以数字结尾（例如 "♥10"），所以只有最后一段不是牌名称时才把最后两位当做出牌类型
+def split_play_command(commend):
+    card_name_list = commend.split()
+    if len(card_name_list) == 0:
+        return card_name_list, None
+
+    last = card_name_list[-1]
+    if last in CARD_IDS or not last[-2:].isdigit():
+        return card_name_list, None
+    card_name_list[-1] = last[:-2]
+    if card_name_list[-1] == "":
+        card_name_list.pop()
+    return card_name_list, int(last[-2:])
+
+
+# 帧格式错误（超过最大长度）
+class FrameError(Exception):
+    pass
+
+
+# 生成一帧
+def encode_frame(text):
+    if "\n" in text:
+        raise FrameError("帧内容不能包含换行符")
+    return text.encode("utf-8") + b"\n"
+
+
+# 解码一帧
+def decode_frame(frame):
+    return frame.decode("utf-8", errors="replace").strip()
+
+
+# 消息体的序列化次数（性能测试用来统计每一步的序列化开销）
+serialize_count = 0
+
+
+# 编码所有接收者共用的消息体（不含接收者名称和结尾）
+def encode_message(code, data):
+    global serialize_count
+    serialize_count += 1
+    return ('{"code": ' + json.dumps(code) + ', "data": ' + json.dumps(data) + ', "player": ').encode("utf-8")
+
+
+# 编码游戏消息（code 为 0）的每个字段，返回 字段名 -> 编码后的字段 的字典
+# 同一个消息发给多个玩家、或者与其他消息合并时，字段只需要序列化一次
+# 字段名都是固定的英文标识符，不需要转义
+def encode_fields(data):
+    global serialize_count
+    serialize_count += 1
+    dumps = json.dumps
+    return {key: ('"' + key + '": ' + dumps(value)).encode("utf-8") for key, value in data.items()}
+
+
+# 用编码后的字段拼接游戏消息体（不含接收者名称和结尾）
+def join_fields(fields):
+    return b'{"code": 0, "data": {' + b", ".join(fields) + b'}, "player": '
+
+
+# 编码接收者名称部分（与消息体拼接后为完整的一帧）
+def encode_recipient(name):
+    return (json.dumps(name) + "}\n").encode("utf-8")
+
+
+# 获取消息体的序列化次数
+def get_serialize_count():
+    return serialize_count
+
+
+# 帧读取类（每个连接一个）
+# 接收缓冲区在连接的整个生命周期内复用，每次读取返回 0 个或多个完整的帧，
+# 不完整的帧留在缓冲区中等待后续数据；超过最大长度的帧会清空缓冲区并抛出 FrameError
+class FrameReader:
+
+    def __init__(self, max_size=MAX_FRAME_SIZE, chunk_size=4096):
+        self.__max_size = max_size
+        self.__buffer = bytearray()
+        self.__chunk = bytearray(chunk_size)
+        self.__view = memoryview(self.__chunk)
+
+    # 输入收到的字节，返回完整的帧列表（不含换行符，忽略空行）
+    # max_frames 为最多取出的帧数，剩下的数据留在缓冲区中
+    def feed(self, data, max_frames=-1):
+        self.__buffer += data
+
+        frames = []
+        start = 0
+        while len(frames) != max_frames:
+            end = self.__buffer.find(b"\n", start)
+            if end < 0:
+                break
+
+            if end - start > self.__max_size:
+                self.__buffer.clear()
+                raise FrameError(f"帧长度超过{self.__max_size}字节")
+
+            frame = bytes(self.__buffer[start:end]).rstrip(b"\r")
+            if len(frame) > 0:
+                frames.append(frame)
+            start = end + 1
+
+        del self.__buffer[:start]
+        if len(self.__buffer) > self.__max_size:
+            self.__buffer.clear()
+            raise FrameError(f"帧长度超过{self.__max_size}字节")
+
+        return frames
+
+    # 从套接字读取一次，返回完整的帧列表
+    # 对端关闭连接时抛出 ConnectionError；非阻塞套接字没有数据时抛出 BlockingIOError
+    def read_from(self, sock):
+        size = sock.recv_into(self.__chunk)
+        if size == 0:
+            raise ConnectionError("连接已经关闭")
+        return self.feed(self.__view[:size])
+
+    # 缓冲区中还没有成帧的字节数
+    def get_pending_size(self):
+        return len(self.__buffer)
+
+    # 取出缓冲区中还没有成帧的字节
+    def take_pending(self):
+        data = bytes(self.__buffer)
+        self.__buffer.clear()
+        return data
+
+
+# 二进制帧读取类（每个连接一个）
+# 与 FrameReader 相同，每一帧为 2 字节长度（大端）+ 记录
+class RecordReader:
+
+    def __init__(self, max_size=MAX_FRAME_SIZE, chunk_size=4096):
+        self.__max_size = max_size
+        self.__buffer = bytearray()
+        self.__chunk = bytearray(chunk_size)
+        self.__view = memoryview(self.__chunk)
+
+    # 输入收到的字节，返回完整的记录列表（忽略空记录）
+    def feed(self, data, max_frames=-1):
+        self.__buffer += data
+
+        frames = []
+        start = 0
+        while len(frames) != max_frames and len(self.__buffer) - start >= 2:
+            size = (self.__buffer[start] << 8) | self.__buffer[start + 1]
+            if size > self.__max_size:
+                self.__buffer.clear()
+                raise FrameError(f"帧长度超过{self.__max_size}字节")
+
+            end = start + 2 + size
+            if end > len(self.__buffer):
+                break
+
+            if size > 0:
+                frames.append(bytes(self.__buffer[start + 2:end]))
+            start = end
+
+        del self.__buffer[:start]
+        return frames
+
+    def read_from(self, sock):
+        size = sock.recv_into(self.__chunk)
+        if size == 0:
+            raise ConnectionError("连接已经关闭")
+        return self.feed(self.__view[:size])
+
+    def get_pending_size(self):
+        return len(self.__buffer)
+
+    def take_pending(self):
+        data = bytes(self.__buffer)
+        self.__buffer.clear()
+        return data
+
+
+# 生成一个二进制帧
+def encode_record(record):
+    if len(record) > 0xFFFF:
+        raise FrameError("帧长度超过65535字节")
+    return len(record).to_bytes(2, "big") + record
+
+
+# 编码一个不超过 255 字节的 UTF-8 字符串（1 字节长度 + 内容）
+def encode_short_str(text):
+    data = text.encode("utf-8")
+    if len(data) > 0xFF:
+        raise FrameError("字符串长度超过255字节")
+    return bytes((len(data),)) + data
+
+
+# 编码一个牌名称列表
+def encode_card_list(card_name_list):
+    try:
+        return bytes((len(card_name_list),)) + bytes(CARD_IDS[name] for name in card_name_list)
+    except KeyError as ex:
+        raise FrameError(f"无效牌【{ex.args[0]}】")
+
+
+# 解码一个牌编号列表，返回 (牌名称列表, 结束位置)
+def decode_card_list(record, offset):
+    count = record[offset]
+    end = offset + 1 + count
+    if end > len(record):
+        raise FrameError("记录长度错误")
+    try:
+        return [CARD_NAMES[card_id] for card_id in record[offset + 1:end]], end
+    except IndexError as ex:
+        raise FrameError("无效牌编号")
+
+
+# 二进制游戏消息的字段：字段名 -> (字段编号, 字段值类型)
+BINARY_FIELDS = {
+    'my_index': (0, 'u8'),
+    'name_list': (1, 'str_list'),
+    'my_card_list': (2, 'cards'),
+    'top_message': (3, 'str'),
+    'card_count_list': (4, 'u8_list'),
+    'last_card_player_index': (5, 'u8'),
+    'last_card_type': (6, 'card_type'),
+    'last_card_list': (7, 'cards'),
+    'remain_card_list': (8, 'cards'),
+    'state': (9, 'u8'),
+    'hint_card_list': (10, 'cards'),
+}
+BINARY_FIELD_NAMES = {field_id: (name, value_type) for name, (field_id, value_type) in BINARY_FIELDS.items()}
+
+
+# 编码一个二进制字段的值
+def encode_binary_value(value_type, value):
+    if value_type == 'u8':
+        return bytes((value,))
+    elif value_type == 'u8_list':
+        return bytes((len(value),)) + bytes(value)
+    elif value_type == 'cards':
+        return encode_card_list(value)
+    elif value_type == 'card_type':
+        return bytes((CARD_TYPE_IDS[value],))
+    elif value_type == 'str':
+        data = value.encode("utf-8")
+        return len(data).to_bytes(2, "big") + data
+    elif value_type == 'str_list':
+        return bytes((len(value),)) + b"".join(encode_short_str(text) for text in value)
+    raise FrameError(f"未知的字段类型【{value_type}】")
+
+
+# 解码一个二进制字段的值，返回 (值, 结束位置)
+def decode_binary_value(value_type, record, offset):
+    if value_type == 'u8':
+        return record[offset], offset + 1
+    elif value_type == 'u8_list':
+        end = offset + 1 + record[offset]
+        return list(record[offset + 1:end]), end
+    elif value_type == 'cards':
+        return decode_card_list(record, offset)
+    elif value_type == 'card_type':
+        return CARD_TYPE_NAMES[record[offset] - 1], offset + 1
+    elif value_type == 'str':
+        end = offset + 2 + int.from_bytes(record[offset:offset + 2], "big")
+        return record[offset + 2:end].decode("utf-8", errors="replace"), end
+    elif value_type == 'str_list':
+        value = []
+        count = record[offset]
+        offset += 1
+        for i in range(count):
+            end = offset + 1 + record[offset]
+            value.append(record[offset + 1:end].decode("utf-8", errors="replace"))
+            offset = end
+        return value, offset
+    raise FrameError(f"未知的字段类型【{value_type}】")
+
+
+# JSON 格式编解码
+class JsonCodec:
+
+    def __init__(self):
+        self.__heartbeat_body = encode_message(0, {})
+        self.__stop_body = encode_message(-1, None)
+
+    def get_name(self):
+        return "json"
+
+    # 创建接收数据的帧读取对象
+    def create_reader(self, max_size=MAX_FRAME_SIZE):
+        return FrameReader(max_size)
+
+    # 编码一条指令（客户端）
+    def encode_command(self, commend):
+        return encode_frame(commend)
+
+    # 解码一条指令（服务端）
+    def decode_command(self, frame):
+        return decode_frame(frame)
+
+    def encode_message(self, code, data):
+        return encode_message(code, data)
+
+    def encode_fields(self, data):
+        return encode_fields(data)
+
+    def join_fields(self, fields):
+        return join_fields(fields)
+
+    def encode_recipient(self, name):
+        return encode_recipient(name)
+
+    # 解码一个消息（客户端），返回 {'code': ..., 'data': ...}
+    def decode_message(self, frame):
+        return json.loads(decode_frame(frame))
+
+    # 心跳消息体
+    def get_heartbeat_body(self):
+        return self.__heartbeat_body
+
+    # 结束本局消息体
+    def get_stop_body(self):
+        return self.__stop_body
+
+
+# 二进制格式编解码
+class BinaryCodec:
+    MESSAGE = 0  # 游戏消息（code 0）
+    INFO = 1  # 提示信息（code 1）
+    STOP = 2  # 结束本局（code -1）
+
+    BID = 0  # 叫分
+    PASS = 1  # 不出
+    PLAY = 2  # 出牌
+    NO_TYPE = 0  # 出牌指令中没有出牌类型（由服务器判断）
+
+    def __init__(self):
+        self.__heartbeat_body = self.encode_message(0, {})
+        self.__stop_body = self.encode_message(-1, None)
+
+    def get_name(self):
+        return "binary"
+
+    def create_reader(self, max_size=MAX_FRAME_SIZE):
+        return RecordReader(max_size)
+
+    # 把指令文本（与 JSON 格式相同）编码为二进制指令
+    def encode_command(self, commend):
+        commend = commend.strip()
+        if commend == "不出" or commend.lower() == "pass":
+            return encode_record(bytes((BinaryCodec.PASS,)))
+
+        if commend.isdigit():
+            return encode_record(bytes((BinaryCodec.BID, min(int(commend), 0xFF))))
+
+        card_name_list, cards_type = split_play_command(commend)
+        if cards_type is None:
+            cards_type = BinaryCodec.NO_TYPE
+        return encode_record(bytes((BinaryCodec.PLAY, cards_type)) + encode_card_list(card_name_list)[1:])
+
+    # 把二进制指令解码为指令文本
+    def decode_command(self, frame):
+        kind = frame[0]
+        if kind == BinaryCodec.PASS:
+            return "pass"
+        elif kind == BinaryCodec.BID and len(frame) == 2:
+            return str(frame[1])
+        elif kind == BinaryCodec.PLAY and len(frame) >= 2:
+            try:
+                card_name_list = [CARD_NAMES[card_id] for card_id in frame[2:]]
+            except IndexError as ex:
+                raise FrameError("无效牌编号")
+            if frame[1] == BinaryCodec.NO_TYPE:
+                return " ".join(card_name_list)
+            return " ".join(card_name_list) + f"{frame[1]:02}"
+        raise FrameError("无效的指令")
+
+    def encode_message(self, code, data):
+        if code == 0:
+            return self.join_fields(self.encode_fields(data).values())
+
+        global serialize_count
+        serialize_count += 1
+        if code == 1:
+            return encode_record(bytes((BinaryCodec.INFO,)) + data.encode("utf-8"))
+        return encode_record(bytes((BinaryCodec.STOP,)))
+
+    def encode_fields(self, data):
+        global serialize_count
+        serialize_count += 1
+        fields = {}
+        for key, value in data.items():
+            field_id, value_type = BINARY_FIELDS[key]
+            fields[key] = bytes((field_id,)) + encode_binary_value(value_type, value)
+        return fields
+
+    def join_fields(self, fields):
+        return encode_record(bytes((BinaryCodec.MESSAGE,)) + b"".join(fields))
+
+    # 二进制格式不发送接收者名称
+    def encode_recipient(self, name):
+        return b""
+
+    def decode_message(self, frame):
+        kind = frame[0]
+        if kind == BinaryCodec.INFO:
+            return {'code': 1, 'data': frame[1:].decode("utf-8", errors="replace")}
+        elif kind == BinaryCodec.STOP:
+            return {'code': -1, 'data': None}
+        elif kind != BinaryCodec.MESSAGE:
+            raise FrameError("无效的消息")
+
+        data = {}
+        offset = 1
+        try:
+            while offset < len(frame):
+                name, value_type = BINARY_FIELD_NAMES[frame[offset]]
+                data[name], offset = decode_binary_value(value_type, frame, offset + 1)
+        except (KeyError, IndexError) as ex:
+            raise FrameError("无效的消息")
+        return {'code': 0, 'data': data}
+
+    def get_heartbeat_body(self):
+        return self.__heartbeat_body
+
+    def get_stop_body(self):
+        return self.__stop_body
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {codec.get_name(): codec for codec in (JSON_CODEC, BINARY_CODEC)}  # 名称 -> 编解码格式
+
+
+# 生成握手数据（客户端）
+def encode_handshake(room_name, player_name, codec=JSON_CODEC):
+    data = encode_frame(room_name) + encode_frame(player_name)
+    if codec is BINARY_CODEC:
+        data = encode_frame(BINARY_MAGIC) + data
+    return data
+
+
+# 握手类（服务端，每个连接一个）
+# 依次取出握手的帧（只取握手的帧，之后的数据可能是二进制格式），完成后按协商的格式读取后续数据
+class Handshake:
+
+    def __init__(self, max_size):
+        self.__max_size = max_size
+        self.__frame_reader = FrameReader(max_size)
+        self.__codec = JSON_CODEC
+        self.__names = []  # 房间名称、玩家名称
+        self.__commands = []  # 握手之后已经收到的指令（已经解码）
+        self.__reader = None
+
+    # 输入收到的字节，握手完成时返回 True，名称超长或者握手之后的指令无效时抛出 FrameError
+    def feed(self, data):
+        frames = self.__frame_reader.feed(data, 1)
+        while frames and self.__reader is None:
+            frame = decode_frame(frames[0])
+            if frame == BINARY_MAGIC and len(self.__names) == 0 and self.__codec is JSON_CODEC:
+                self.__codec = BINARY_CODEC
+            else:
+                # 名称超长时握手失败（否则同一桌中使用二进制格式的玩家收不到玩家列表）
+                if len(frame.encode("utf-8")) > MAX_NAME_SIZE:
+                    raise FrameError("名称长度超过255字节")
+                self.__names.append(frame)
+
+            if len(self.__names) == 2:
+                reader = self.__codec.create_reader(self.__max_size)
+                frames = reader.feed(self.__frame_reader.take_pending())
+                self.__commands = [self.__codec.decode_command(frame) for frame in frames]
+                self.__reader = reader
+            else:
+                frames = self.__frame_reader.feed(b"", 1)
+
+        return self.__reader is not None
+
+    # 从套接字读取一次，握手完成时返回 True
+    def read_from(self, sock):
+        data = sock.recv(4096)
+        if len(data) == 0:
+            raise ConnectionError("握手未完成连接已经关闭")
+        return self.feed(data)
+
+    def is_done(self):
+        return self.__reader is not None
+
+    def get_room_name(self):
+        return self.__names[0]
+
+    def get_player_name(self):
+        return self.__names[1]
+
+    # 协商的编解码格式
+    def get_codec(self):
+        return self.__codec
+
+    # 握手之后使用的帧读取对象
+    def get_reader(self):
+        return self.__reader
+
+    # 握手之后已经收到的指令（已经解码）
+    def get_commands(self):
+        return self.__commands
+
+
+# 测试
+def test():
+    reader = FrameReader(max_size=16)
+
+    # 一次收到多帧、半帧
+    assert reader.feed(b"room\nplay") == [b"room"]
+    assert reader.get_pending_size() == 4
+    assert reader.feed(b"er\n\n3\r\n") == [b"player", b"3"]
+    assert reader.get_pending_size() == 0
+
+    # 多字节字符被拆开也能正确成帧
+    data = encode_frame("♥3 ♥409")
+    assert reader.feed(data[:2]) == []
+    assert [decode_frame(frame) for frame in reader.feed(data[2:])] == ["♥3 ♥409"]
+
+    # 超长的帧
+    try:
+        reader.feed(b"x" * 20)
+    except FrameError as ex:
+        pass
+    else:
+        assert False, "超长帧未通过"
+    assert reader.get_pending_size() == 0
+    assert reader.feed(b"pass\n") == [b"pass"]
+
+    # 共用的消息体与接收者名称拼接后为完整的 JSON 帧
+    reader = FrameReader()
+    count = get_serialize_count()
+    body = encode_message(0, {'top_message': "轮到【张三】出牌了", 'card_count_list': [17, 17, 20]})
+    assert get_serialize_count() == count + 1
+    for name in ["张三", "李四"]:
+        frames = reader.feed(body + encode_recipient(name))
+        assert json.loads(decode_frame(frames[0])) == \
+               {'code': 0, 'data': {'top_message': "轮到【张三】出牌了", 'card_count_list': [17, 17, 20]}, 'player': name}
+
+    # 按字段合并的消息体
+    fields = encode_fields({'top_message': "轮到【张三】出牌了", 'state': 0})
+    fields.update(encode_fields({'state': 2}))
+    frames = reader.feed(join_fields(fields.values()) + encode_recipient("张三"))
+    assert json.loads(decode_frame(frames[0])) == {'code': 0, 'data': {'top_message': "轮到【张三】出牌了", 'state': 2}, 'player': "张三"}
+
+    # 牌编号与牌的大小顺序一致
+    assert len(CARD_NAMES) == 54 and CARD_IDS['◆3'] == 0 and CARD_IDS['♥2'] == 51 and CARD_IDS['大王'] == 53
+
+    # 出牌类型可以省略，以数字结尾的牌名称不会被当做出牌类型
+    assert split_play_command("♥3 ◆3 ♠3 大王05") == (["♥3", "◆3", "♠3", "大王"], 5)
+    assert split_play_command("♥10 ♠10") == (["♥10", "♠10"], None)
+    assert split_play_command("♥1001") == (["♥10"], 1) and split_play_command("♥3 01") == (["♥3"], 1)
+
+    # 二进制格式：指令与消息编码后再解码与原来相同
+    codec = BINARY_CODEC
+    for commend in ["pass", "3", "♥3 ◆3 ♠3 大王05", "小王 大王15", "♥10 ♠10", "♥1001"]:
+        record = RecordReader().feed(codec.encode_command(commend))[0]
+        assert codec.decode_command(record) == commend
+    data = {'my_index': 1, 'name_list': ["张三:地主", "李四:农民", "王五:农民"], 'my_card_list': ['大王', '♥2', '◆3'],
+            'top_message': "轮到【张三:地主】出牌了", 'card_count_list': [20, 17, 17], 'last_card_player_index': 2,
+            'last_card_type': '飞机带对子', 'last_card_list': ['♠10'], 'remain_card_list': ['小王', '♣J', '♠A'],
+            'state': 3, 'hint_card_list': ['♥2']}
+    record_reader = RecordReader()
+    body = codec.encode_message(0, data)
+    frames = record_reader.feed(body[:5])
+    frames += record_reader.feed(body[5:] + codec.encode_message(1, "玩家已经满了") + codec.get_stop_body())
+    assert [codec.decode_message(frame) for frame in frames] == \
+           [{'code': 0, 'data': data}, {'code': 1, 'data': "玩家已经满了"}, {'code': -1, 'data': None}]
+    assert len(body) * 4 < len(JSON_CODEC.encode_message(0, data))
+
+    # 握手：二进制格式的指令紧跟在握手之后（其中可能包含换行符）
+    handshake = Handshake(1024)
+    data = encode_handshake("房间", "张三", BINARY_CODEC) + codec.encode_command("3") + codec.encode_command("♥3 ◆3 ♠3 ◆501")
+    assert not handshake.feed(data[:12])
+    assert handshake.feed(data[12:])
+    assert handshake.get_room_name() == "房间" and handshake.get_player_name() == "张三"
+    assert handshake.get_codec() is BINARY_CODEC and handshake.get_commands() == ["3", "♥3 ◆3 ♠3 ◆501"]
+
+    handshake = Handshake(1024)
+    assert handshake.feed(encode_handshake("房间", "李四") + encode_frame("pass"))
+    assert handshake.get_codec() is JSON_CODEC and handshake.get_commands() == ["pass"]
+
+    # 名称最多 255 字节（二进制格式的玩家列表能编码的长度）
+    for codec in (JSON_CODEC, BINARY_CODEC):
+        assert Handshake(1024).feed(encode_handshake("房间", "名" * 85, codec))
+        for room_name, player_name in (("房间", "名" * 86), ("房" * 86, "张三")):
+            try:
+                Handshake(1024).feed(encode_handshake(room_name, player_name, codec))
+            except FrameError as ex:
+                pass
+            else:
+                assert False, "超长的名称通过了握手"
+
+    # 握手之后紧跟的无效指令（二进制格式的指令编号不存在）使握手失败
+    handshake = Handshake(1024)
+    try:
+        handshake.feed(encode_handshake("房间", "张三", BINARY_CODEC) + b"\x00\x01\x05")
+    except FrameError as ex:
+        assert not handshake.is_done()
+    else:
+        assert False, "无效的指令通过了握手"
+
+
+if __name__ == '__main__':
+    test()
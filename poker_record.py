@@ -0,0 +1,551 @@
+# 对局记录（紧凑的二进制格式）与重放
+# 每局游戏结束时把整局记录一次性追加到段文件末尾，同时在索引文件中追加这条记录的位置，可以按序号随机读取
+# 段文件：[记录长度 u32][记录][CRC32 u32]...，索引文件：[记录在段文件中的位置 u64]...（都是大端字节序）
+# 记录：版本 u8 | 时间 u32 | 3 个玩家名称 (u8 长度 + UTF-8) | 3 手牌和底牌的掩码 (各 7 字节) |
+#       叫分数 u8 + 每次叫分 u8 | 地主下标 u8 | 胜利者下标 u8 | 出牌数 u16 + 每次出牌 (玩家下标 << 4 | 出牌类型 u8, 掩码 7 字节)
+#   只记录最后一次发牌（全部不叫重新发牌之前的牌不记录）；叫分按玩家顺序从 0 号玩家开始；不出的出牌类型和掩码为 0
+# 重放只使用出牌规则（Hand 的掩码、牌型表、PlayTable.beats），不需要服务器和网络连接
+# 用法：python poker_record.py replay <段文件或目录>...   重放检查全部记录，输出每秒重放的出牌数
+#       python poker_record.py show <段文件> <序号>       显示一条记录
+#       python poker_record.py analyze <段文件或目录>... [--cards 6]   残局分析：输的一方本来能不能赢
+
+import os
+import sys
+import time
+import zlib
+import argparse
+import threading
+
+from poker_rules import PlayTable, PlayDominance, CARD_ORDER_TYPE, CARD_NAMES, get_mask_signature, get_signature_size
+from poker_ai import EndgameSolver, SolverTimeout
+
+RECORD_VERSION = 1
+NONE_INDEX = 255  # 没有地主、没有胜利者（例如有玩家中途退出）
+MASK_BYTES = 7
+ALL_MASK = (1 << 54) - 1
+
+
+# 一局的记录
+class GameRecord:
+
+    def __init__(self, names=("", "", ""), timestamp=None):
+        self.__names = list(names)
+        self.__time = int(time.time()) if timestamp is None else timestamp
+        self.__hand_masks = [0, 0, 0]  # 发牌后（摸底牌之前）每个玩家的手牌掩码
+        self.__bottom_mask = 0  # 底牌掩码
+        self.__bids = []  # 按顺序的叫分
+        self.__landlord_index = NONE_INDEX
+        self.__winner_index = NONE_INDEX
+        self.__turns = []  # (玩家下标, 出牌掩码, 出牌类型编号)，不出时掩码和出牌类型为 0
+
+    # 记录一次发牌（重新发牌时清空之前的叫分和出牌）
+    def set_deal(self, hand_masks, bottom_mask):
+        self.__hand_masks = list(hand_masks)
+        self.__bottom_mask = bottom_mask
+        self.__bids = []
+        self.__landlord_index = NONE_INDEX
+        self.__winner_index = NONE_INDEX
+        self.__turns = []
+
+    def add_bid(self, mark):
+        self.__bids.append(mark)
+
+    def set_landlord_index(self, landlord_index):
+        self.__landlord_index = landlord_index
+
+    def add_turn(self, player_index, mask, type_value):
+        self.__turns.append((player_index, mask, type_value))
+
+    def set_winner_index(self, winner_index):
+        self.__winner_index = winner_index
+
+    def get_names(self):
+        return self.__names.copy()
+
+    def get_time(self):
+        return self.__time
+
+    def get_hand_masks(self):
+        return self.__hand_masks.copy()
+
+    def get_bottom_mask(self):
+        return self.__bottom_mask
+
+    def get_bids(self):
+        return self.__bids.copy()
+
+    def get_landlord_index(self):
+        return self.__landlord_index
+
+    def get_winner_index(self):
+        return self.__winner_index
+
+    def get_turns(self):
+        return self.__turns.copy()
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and self.encode() == other.encode()
+
+    # 编码为字节串
+    def encode(self):
+        data = bytearray((RECORD_VERSION,))
+        data += self.__time.to_bytes(4, "big")
+        for name in self.__names:
+            name = name.encode("utf-8")[:255]
+            data.append(len(name))
+            data += name
+        for mask in self.__hand_masks + [self.__bottom_mask]:
+            data += mask.to_bytes(MASK_BYTES, "big")
+        data.append(len(self.__bids))
+        data += bytes(self.__bids)
+        data.append(self.__landlord_index)
+        data.append(self.__winner_index)
+        data += len(self.__turns).to_bytes(2, "big")
+        for player_index, mask, type_value in self.__turns:
+            data.append(player_index << 4 | type_value)
+            data += mask.to_bytes(MASK_BYTES, "big")
+        return bytes(data)
+
+    # 从字节串解码，格式错误时抛出 ValueError
+    @staticmethod
+    def decode(data):
+        try:
+            if data[0] != RECORD_VERSION:
+                raise ValueError(f"不支持的记录版本【{data[0]}】")
+            record = GameRecord(timestamp=int.from_bytes(data[1:5], "big"))
+            position = 5
+            names = []
+            for i in range(3):
+                length = data[position]
+                names.append(data[position + 1:position + 1 + length].decode("utf-8"))
+                position += 1 + length
+            masks = []
+            for i in range(4):
+                masks.append(int.from_bytes(data[position:position + MASK_BYTES], "big"))
+                position += MASK_BYTES
+            record.__names = names
+            record.set_deal(masks[:3], masks[3])
+
+            bid_count = data[position]
+            record.__bids = list(data[position + 1:position + 1 + bid_count])
+            position += 1 + bid_count
+            record.__landlord_index = data[position]
+            record.__winner_index = data[position + 1]
+            turn_count = int.from_bytes(data[position + 2:position + 4], "big")
+            position += 4
+
+            turns = record.__turns
+            for i in range(turn_count):
+                head = data[position]
+                turns.append((head >> 4, int.from_bytes(data[position + 1:position + 1 + MASK_BYTES], "big"), head & 15))
+                position += 1 + MASK_BYTES
+        except (IndexError, UnicodeDecodeError) as ex:
+            raise ValueError("记录格式错误")
+        if position != len(data):
+            raise ValueError("记录格式错误")
+        return record
+
+
+# 掩码 -> 牌的名称（从大到小）
+def mask_names(mask):
+    return [CARD_NAMES[card_id] for card_id in range(53, -1, -1) if mask >> card_id & 1]
+
+
+# 按出牌规则重放一局，规则不符时抛出 ValueError，返回胜利者下标（没有结束的对局返回 NONE_INDEX）
+# 与服务器的 Play 相同：叫分从 0 号玩家开始，叫 3 分或者 3 个人都叫过后结束，分数最高（相同时先叫的）为地主；
+# 地主先出，上次出牌的人再次轮到时出任意牌（不能不出），否则必须压过上次出牌
+def replay(record):
+    hands = record.get_hand_masks()
+    bottom = record.get_bottom_mask()
+    if [bin(mask).count("1") for mask in hands + [bottom]] != [17, 17, 17, 3] or \
+            hands[0] | hands[1] | hands[2] | bottom != ALL_MASK:
+        raise ValueError("发牌错误")
+
+    bids = record.get_bids()
+    turns = record.get_turns()
+    landlord_index = record.get_landlord_index()
+    winner_index = record.get_winner_index()
+    if any(mark > 3 for mark in bids) or len(bids) > 3 or (3 in bids[:-1]):
+        raise ValueError(f"叫分错误 {bids}")
+    if landlord_index == NONE_INDEX:
+        if turns or winner_index != NONE_INDEX or (bids and (bids[-1] == 3 or len(bids) == 3)):
+            raise ValueError("叫分没有结束但有地主或者出牌")
+        return NONE_INDEX
+    if (len(bids) != 3 and bids[-1:] != [3]) or max(bids) == 0 or landlord_index != bids.index(max(bids)):
+        raise ValueError(f"地主错误 {bids} {landlord_index}")
+    hands[landlord_index] |= bottom
+
+    classify = PlayTable.classify
+    beats = PlayTable.beats
+    current = landlord_index
+    last = None
+    last_index = landlord_index
+    for turn_index, (player_index, mask, type_value) in enumerate(turns):
+        if hands[last_index] == 0:
+            raise ValueError(f"第 {turn_index} 次出牌：已经有玩家胜利")
+        if player_index != current:
+            raise ValueError(f"第 {turn_index} 次出牌：应该由 {current} 号玩家出牌")
+        if last_index == current:
+            last = None
+
+        if mask == 0:
+            if last is None:
+                raise ValueError(f"第 {turn_index} 次出牌：本次为任意牌，必须出牌")
+            if type_value != 0:
+                raise ValueError(f"第 {turn_index} 次出牌：出牌类型错误")
+        else:
+            if mask & ~hands[player_index]:
+                raise ValueError(f"第 {turn_index} 次出牌：没有这些牌 {mask_names(mask & ~hands[player_index])}")
+            signature = get_mask_signature(mask)
+            play = classify(signature)
+            if play is None or play[0].value != type_value:
+                raise ValueError(f"第 {turn_index} 次出牌：出牌类型错误 {mask_names(mask)}")
+            size = get_signature_size(signature)
+            if last is not None and not beats(play[0], play[1], size, last):
+                raise ValueError(f"第 {turn_index} 次出牌：压不过上次出牌 {mask_names(mask)}")
+            hands[player_index] ^= mask
+            last = (play[0], play[1], size)
+            last_index = player_index
+        current = (current + 1) % 3
+
+    finished = [index for index in range(3) if hands[index] == 0]
+    if winner_index == NONE_INDEX:
+        if finished:
+            raise ValueError("已经有玩家胜利，但没有记录胜利者")
+    elif finished != [winner_index] or turns[-1][0] != winner_index:
+        raise ValueError(f"胜利者错误 {winner_index}")
+    return winner_index
+
+
+# 残局分析：找到第一个三个玩家的手牌都不超过 max_cards 张的局面，用残局求解器求出双方都按最优出牌时的胜负
+# 返回 (出牌序号, 最优出牌时地主是否获胜, 实际地主是否获胜)；没有这样的局面、没有胜利者或者求解超时时返回 None
+# 记录不符合规则时抛出 ValueError
+def analyze(record, max_cards=6, solver=None, deadline=None):
+    winner_index = replay(record)
+    landlord_index = record.get_landlord_index()
+    if winner_index == NONE_INDEX:
+        return None
+    if solver is None:
+        solver = EndgameSolver()
+
+    hands = record.get_hand_masks()
+    hands[landlord_index] |= record.get_bottom_mask()
+    last = None
+    last_index = landlord_index
+    for turn_index, (player_index, mask, type_value) in enumerate(record.get_turns()):
+        if last_index == player_index:
+            last = None
+        if all(bin(hand).count("1") <= max_cards for hand in hands):
+            try:
+                landlord_wins = solver.solve([get_mask_signature(hand) for hand in hands], landlord_index, player_index,
+                                             last, last_index, deadline)[0]
+            except SolverTimeout:
+                return None
+            return turn_index, landlord_wins, winner_index == landlord_index
+        if mask != 0:
+            signature = get_mask_signature(mask)
+            card_type, power = PlayTable.classify(signature)
+            hands[player_index] ^= mask
+            last = (card_type, power, get_signature_size(signature))
+            last_index = player_index
+    return None
+
+
+# 残局分析全部记录，输出有多少局输的一方在残局时本来能赢
+def analyze_segments(paths, max_cards=6, timeout=10):
+    positions = 0
+    upsets = 0
+    skipped = 0
+    elapsed = 0
+    for path in find_segments(paths):
+        reader = SegmentReader(path)
+        for index in range(len(reader)):
+            start = time.perf_counter()
+            try:
+                result = analyze(reader.get(index), max_cards, deadline=start + timeout)
+            except ValueError as ex:
+                print(f"{path} #{index}: {ex}")
+                skipped += 1
+                continue
+            elapsed += time.perf_counter() - start
+            if result is None:
+                skipped += 1
+                continue
+            positions += 1
+            turn_index, landlord_wins, landlord_won = result
+            if landlord_wins != landlord_won:
+                upsets += 1
+                print(f"{path} #{index}: 第 {turn_index} 次出牌时{'地主' if landlord_wins else '农民'}本来能赢")
+        reader.close()
+
+    print(f"分析局数: {positions}  输的一方本来能赢: {upsets}  跳过: {skipped}  求解耗时: {elapsed:.2f}s")
+    return upsets
+
+
+# 段文件写入（追加）：每条记录一次写入段文件，再在索引文件中追加它的位置；多个线程可以同时写入
+class RecordWriter:
+
+    def __init__(self, path):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__file = open(path, "ab")
+        self.__index_file = open(path + ".idx", "ab")
+
+    def get_path(self):
+        return self.__path
+
+    # 追加一局记录，返回这条记录在段文件中的位置
+    def append(self, record):
+        body = record.encode()
+        frame = len(body).to_bytes(4, "big") + body + zlib.crc32(body).to_bytes(4, "big")
+        with self.__lock:
+            self.__file.seek(0, os.SEEK_END)
+            offset = self.__file.tell()
+            self.__file.write(frame)
+            self.__file.flush()
+            self.__index_file.write(offset.to_bytes(8, "big"))
+            self.__index_file.flush()
+        return offset
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+            self.__index_file.close()
+
+
+# 段文件读取：按索引随机读取一条记录，或者按顺序读取全部记录
+# 索引文件缺失或者比段文件少（写完段文件后没来得及写索引）时，从最后一个索引的位置往后扫描补全
+class SegmentReader:
+
+    def __init__(self, path):
+        self.__path = path
+        self.__file = open(path, "rb")
+        self.__offsets = []
+
+        try:
+            with open(path + ".idx", "rb") as index_file:
+                data = index_file.read()
+            self.__offsets = [int.from_bytes(data[i:i + 8], "big") for i in range(0, len(data) - len(data) % 8, 8)]
+        except FileNotFoundError as ex:
+            pass
+
+        # 补全索引
+        end = os.path.getsize(path)
+        offset = 0
+        if self.__offsets:
+            offset = self.__offsets[-1] + self.__read_length(self.__offsets[-1]) + 8
+        while offset + 4 <= end:
+            length = self.__read_length(offset)
+            if offset + length + 8 > end:
+                break  # 最后一条记录没有写完
+            self.__offsets.append(offset)
+            offset += length + 8
+
+    def __read_length(self, offset):
+        self.__file.seek(offset)
+        return int.from_bytes(self.__file.read(4), "big")
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    # 读取第 index 条记录（校验失败时抛出 ValueError）
+    def get(self, index):
+        offset = self.__offsets[index]
+        self.__file.seek(offset)
+        length = int.from_bytes(self.__file.read(4), "big")
+        data = self.__file.read(length + 4)
+        body = data[:length]
+        if len(data) != length + 4 or zlib.crc32(body) != int.from_bytes(data[length:], "big"):
+            raise ValueError(f"记录 {index} 校验错误")
+        return GameRecord.decode(body)
+
+    def __iter__(self):
+        for index in range(len(self.__offsets)):
+            yield self.get(index)
+
+    def close(self):
+        self.__file.close()
+
+
+# 目录中的全部段文件
+def find_segments(paths):
+    segment_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            segment_paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".seg"))
+        else:
+            segment_paths.append(path)
+    return segment_paths
+
+
+# 重放全部段文件，输出每秒重放的出牌数；返回不符合规则的记录数
+def replay_segments(paths):
+    games = 0
+    turns = 0
+    errors = 0
+    elapsed = 0
+    for path in find_segments(paths):
+        reader = SegmentReader(path)
+        for index in range(len(reader)):
+            try:
+                record = reader.get(index)
+                start = time.perf_counter()
+                replay(record)
+                elapsed += time.perf_counter() - start
+            except ValueError as ex:
+                print(f"{path} #{index}: {ex}")
+                errors += 1
+                continue
+            games += 1
+            turns += len(record.get_turns())
+        reader.close()
+
+    rate = turns / elapsed if elapsed > 0 else 0
+    print(f"局数: {games}  出牌数: {turns}  不符合规则: {errors}  重放耗时: {elapsed:.2f}s  每秒出牌数: {rate:,.0f}")
+    return errors
+
+
+# 显示一条记录
+def show_record(record):
+    print(f"时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.get_time()))}")
+    for index, (name, mask) in enumerate(zip(record.get_names(), record.get_hand_masks())):
+        print(f"{index} {name}: {' '.join(mask_names(mask))}")
+    print(f"底牌: {' '.join(mask_names(record.get_bottom_mask()))}  叫分: {record.get_bids()}  "
+          f"地主: {record.get_landlord_index()}  胜利者: {record.get_winner_index()}")
+    for player_index, mask, type_value in record.get_turns():
+        if mask == 0:
+            print(f"{player_index}: 不出")
+        else:
+            print(f"{player_index}: {' '.join(mask_names(mask))} 【{CARD_ORDER_TYPE(type_value).name}】")
+
+
+# 测试
+def test():
+    import random
+    import tempfile
+    from poker_rules import Deck, Hand
+
+    # 模拟一局：每次出最小的牌，跟牌时没有相同牌型则不出
+    def make_record(seed):
+        rng = random.Random(seed)
+        hand_cards, bottom = Deck(rng).deal()
+        hands = [Hand(cards) for cards in hand_cards]
+        record = GameRecord(["甲", "乙", "丙"], 0)
+        record.set_deal([hand.get_mask() for hand in hands], Hand(bottom).get_mask())
+        record.add_bid(1)
+        record.add_bid(3)
+        record.set_landlord_index(1)
+        hands[1].add_cards(bottom)
+
+        current = 1
+        last = None
+        last_index = 1
+        while True:
+            if last_index == current:
+                last = None
+            moves = [move for move in PlayTable.generate_moves(hands[current], last)
+                     if move[1] not in PlayDominance.BOMB_TYPES or last is None]
+            if moves:
+                signature, card_type, power = min(moves, key=lambda move: (move[2], -get_signature_size(move[0])))
+                cards = hands[current].pick_cards(signature)
+                hands[current].remove_cards(cards)
+                record.add_turn(current, Hand(cards).get_mask(), card_type.value)
+                last = (card_type, power, len(cards))
+                last_index = current
+                if len(hands[current]) == 0:
+                    record.set_winner_index(current)
+                    return record
+            else:
+                record.add_turn(current, 0, 0)
+            current = (current + 1) % 3
+
+    records = [make_record(seed) for seed in range(20)]
+    for record in records:
+        assert GameRecord.decode(record.encode()) == record
+        assert replay(record) == record.get_winner_index() != NONE_INDEX
+
+    # 残局分析：最优出牌时的胜负与实际的胜负都有记录；从只剩一张牌的局面开始时实际的胜利者就是最优出牌的胜利者
+    # 有的局在另外两家还有很多牌时就结束了，这时没有可以分析的局面
+    solver = EndgameSolver()
+    results = [analyze(record, 5, solver) for record in records]
+    assert any(results)
+    for record, result in zip(records, results):
+        if result is not None:
+            turn_index, landlord_wins, landlord_won = result
+            assert 0 < turn_index < len(record.get_turns()) and landlord_won == (record.get_winner_index() == 1)
+        last_turn = analyze(record, 1, solver)
+        assert last_turn is None or last_turn[1] == last_turn[2]
+
+    # 篡改记录后重放失败
+    record = records[0]
+    turns = record.get_turns()
+    bad_records = []
+    for change in range(4):
+        bad = GameRecord(record.get_names(), record.get_time())
+        bad.set_deal(record.get_hand_masks(), record.get_bottom_mask())
+        for mark in record.get_bids():
+            bad.add_bid(mark)
+        bad.set_landlord_index(record.get_landlord_index())
+        bad.set_winner_index(record.get_winner_index())
+        for index, (player_index, mask, type_value) in enumerate(turns):
+            if index == 0 and change == 0:
+                mask = mask << 4 if mask < 1 << 48 else mask >> 4  # 换成别的点数的牌
+            elif index == 0 and change == 1:
+                type_value = type_value % 15 + 1  # 错误的出牌类型
+            elif index == 1 and change == 2:
+                player_index = (player_index + 1) % 3  # 错误的出牌顺序
+            bad.add_turn(player_index, mask, type_value)
+        if change == 3:
+            bad.set_winner_index((record.get_winner_index() + 1) % 3)
+        bad_records.append(bad)
+    for bad in bad_records:
+        try:
+            replay(bad)
+        except ValueError as ex:
+            pass
+        else:
+            assert False, "不符合规则的记录通过了重放"
+
+    # 段文件：追加、随机读取、索引缺失时扫描补全、截断的最后一条记录被忽略
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.seg")
+        writer = RecordWriter(path)
+        for record in records:
+            writer.append(record)
+        writer.close()
+
+        reader = SegmentReader(path)
+        assert len(reader) == len(records) and reader.get(7) == records[7] and list(reader) == records
+        reader.close()
+
+        os.remove(path + ".idx")
+        with open(path, "ab") as file:
+            file.write(records[0].encode()[:10])
+        reader = SegmentReader(path)
+        assert len(reader) == len(records) and reader.get(19) == records[19]
+        reader.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="斗地主对局记录")
+    subparsers = parser.add_subparsers(dest="name", required=True)
+    parser_replay = subparsers.add_parser("replay", help="重放检查全部记录")
+    parser_replay.add_argument("paths", nargs="+", help="段文件或者包含段文件的目录")
+    parser_show = subparsers.add_parser("show", help="显示一条记录")
+    parser_show.add_argument("path", help="段文件")
+    parser_show.add_argument("index", type=int, help="记录序号")
+    parser_analyze = subparsers.add_parser("analyze", help="残局分析（输的一方本来能不能赢）")
+    parser_analyze.add_argument("paths", nargs="+", help="段文件或者包含段文件的目录")
+    parser_analyze.add_argument("--cards", type=int, default=6, help="从每个玩家都不超过几张牌的局面开始求解")
+    parser_analyze.add_argument("--timeout", type=float, default=10, help="每局的求解秒数")
+    args = parser.parse_args()
+
+    test()
+
+    if args.name == "replay":
+        sys.exit(1 if replay_segments(args.paths) else 0)
+    elif args.name == "show":
+        reader = SegmentReader(args.path)
+        show_record(reader.get(args.index))
+    elif args.name == "analyze":
+        analyze_segments(args.paths, args.cards, args.timeout)
@@ -0,0 +1,1444 @@
+# 出牌规则（客户端与服务端共用）
+# 牌：54 张牌在导入时全部生成，之后不再创建新的牌对象
+#   Card("3", "♥")、Card.parse("♥3")、Card.from_id(47) 都只是查表返回同一个不可变的单例，
+#   所以比较、哈希都按对象本身进行，排序按预先计算的编号进行
+# 手牌：Hand 用一个 54 位的掩码（第 i 位表示编号为 i 的牌）和 15 个点数的计数保存一手牌，
+#   服务器的座位、规则判断和机器人都可以直接使用
+# 牌型：一手牌的牌型只与每个点数的牌数有关，把 15 个点数的牌数按每个点数 5 位拼成一个整数（牌型签名），
+#   所有合法出牌的签名在导入时一次性生成到表里，判断牌型只需要查一次表
+# 压制：PlayDominance 把合法出牌按 (出牌类型, 权值, 牌数) 归类，导入时生成类别之间的压制表，比较大小只需要查一次表
+# 提示：MoveIndex 在发牌后生成一手牌能出的所有牌，出牌后增量更新，提示和超时自动出牌都从中查找
+# 拆分：HandDecomposer 把一手牌拆成最少的合法出牌（估计一手牌几次能出完）
+
+import enum
+import bisect
+import random
+import collections
+
+# 点数（从小到大）
+CARD_RANKS = ['3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A', '2']
+# 花色（按字符大小排序，相同点数的牌按花色字符比较大小）
+CARD_SUITS = ['◆', '♠', '♣', '♥']
+# 点数 -> 权值
+CARD_POWERS = {'3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14,
+               '2': 20, '小王': 99, '大王': 100}
+
+# 牌的编号：点数下标 * 4 + 花色下标，小王为 52，大王为 53
+# 编号的大小顺序与牌的大小顺序一致，二进制协议中每张牌编码为它的编号
+CARD_NAMES = [suit + rank for rank in CARD_RANKS for suit in CARD_SUITS] + ['小王', '大王']
+CARD_IDS = {name: card_id for card_id, name in enumerate(CARD_NAMES)}
+
+# 点数编号：3~2 为 0~12，小王为 13，大王为 14（编号的大小顺序与点数的大小顺序一致）
+RANK_COUNT = 15
+CARD_RANK_INDEXES = [card_id // 4 for card_id in range(52)] + [13, 14]
+# 点数编号 -> 权值
+RANK_POWERS = [CARD_POWERS[rank] for rank in CARD_RANKS] + [CARD_POWERS['小王'], CARD_POWERS['大王']]
+# 点数编号 -> 这个点数的牌数
+RANK_LIMITS = [4] * 13 + [1, 1]
+
+# 出牌类型（数值与客户端发送的出牌类型编号一致）
+CARD_ORDER_TYPE = enum.Enum('CARD_ORDER_TYPE', ('一张', '一对', '三张', '双三张',
+                                                '三带一', '三带二', '四带一', '四带二', '四带两对',
+                                                '顺子', '连对', '飞机', '飞机带对子', '炸弹', '王炸'))
+
+# 一次最多出的牌数（地主的全部手牌）
+PLAY_MAX_CARDS = 20
+# 牌型签名中每个点数占的位数（出牌中有重复的牌时一个点数最多 20 张，也不会进位到下一个点数）
+SIGNATURE_BITS = 5
+
+
+# 牌类（不可变的单例）
+class Card:
+    __slots__ = ('__id', '__name', '__rank', '__suit', '__power', '__rank_index')
+
+    RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    SUITS = ['♥', '◆', '♣', '♠']
+    POWERS = CARD_POWERS
+
+    __cards = []  # 编号 -> 牌
+    __card_map = {}  # 名称 -> 牌
+
+    # 根据点数和花色获取牌（大小王的花色为空字符串）
+    def __new__(cls, rank, suit=''):
+        card = Card.__card_map.get(suit + rank)
+        if card is None:
+            raise ValueError("无效牌【" + suit + rank + "】")
+        return card
+
+    # 生成一张牌（只在导入时调用）
+    @staticmethod
+    def __create(card_id, name):
+        card = object.__new__(Card)
+        if name in CARD_POWERS:
+            rank, suit = name, ''
+        else:
+            rank, suit = name[1:], name[0]
+        object.__setattr__(card, '_Card__id', card_id)
+        object.__setattr__(card, '_Card__name', name)
+        object.__setattr__(card, '_Card__rank', rank)
+        object.__setattr__(card, '_Card__suit', suit)
+        object.__setattr__(card, '_Card__power', CARD_POWERS[rank])
+        object.__setattr__(card, '_Card__rank_index', CARD_RANK_INDEXES[card_id])
+        return card
+
+    # 生成全部 54 张牌
+    @staticmethod
+    def init():
+        if Card.__cards:
+            return
+        for card_id, name in enumerate(CARD_NAMES):
+            card = Card.__create(card_id, name)
+            Card.__cards.append(card)
+            Card.__card_map[name] = card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("牌不可修改")
+
+    # 重载字符串表示方法
+    def __str__(self):
+        return self.__name
+
+    def __repr__(self):
+        return self.__name
+
+    # 重载运算符实现排序
+    def __lt__(self, other):
+        return self.__id < other.__id
+
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return self.__id
+
+    # 序列化时只保存编号，反序列化后还是同一个单例（多进程之间传递）
+    def __reduce__(self):
+        return Card.from_id, (self.__id,)
+
+    def get_rank(self):
+        return self.__rank
+
+    def get_suit(self):
+        return self.__suit
+
+    def get_power(self):
+        return self.__power
+
+    # 点数编号（0~14）
+    def get_rank_index(self):
+        return self.__rank_index
+
+    # 牌编号（0~53）
+    def get_id(self):
+        return self.__id
+
+    # 排序键（与编号相同）
+    def get_sort_key(self):
+        return self.__id
+
+    # 根据牌编号获取牌
+    @staticmethod
+    def from_id(card_id):
+        if not 0 <= card_id < len(Card.__cards):
+            raise ValueError(f"无效牌编号【{card_id}】")
+        return Card.__cards[card_id]
+
+    # 根据牌名称获取牌（例如 "♥10"、"大王"）
+    @staticmethod
+    def parse(name):
+        card = Card.__card_map.get(name)
+        if card is None:
+            raise ValueError("无效牌【" + name + "】")
+        return card
+
+    # 获取全部 54 张牌（按编号排列）
+    @staticmethod
+    def get_all():
+        return tuple(Card.__cards)
+
+
+Card.init()
+
+
+# 手牌类
+# 掩码用于判断是否有某张牌、一次移除多张牌；点数计数用于判断牌型和机器人选牌
+# 遍历时按编号从大到小（与原来的 sort(reverse=True) 顺序相同），所以手牌始终是整理好的
+class Hand:
+    __slots__ = ('__mask', '__counts', '__size', '__signature')
+
+    # 构造方法
+    def __init__(self, cards=()):
+        self.__mask = 0
+        self.__counts = [0] * RANK_COUNT
+        self.__size = 0
+        self.__signature = 0
+        self.add_cards(cards)
+
+    # 重载字符串表示方法
+    def __str__(self):
+        return " ".join(self.get_names())
+
+    def __len__(self):
+        return self.__size
+
+    def __contains__(self, card):
+        return self.__mask >> card.get_id() & 1 == 1
+
+    def __iter__(self):
+        return iter(self.get_cards())
+
+    # 添加一张牌（已经有这张牌时抛出 ValueError）
+    def add_card(self, card):
+        bit = 1 << card.get_id()
+        if self.__mask & bit:
+            raise ValueError(f"重复的牌【{card}】")
+        self.__mask |= bit
+        self.__counts[card.get_rank_index()] += 1
+        self.__size += 1
+        self.__signature += 1 << card.get_rank_index() * SIGNATURE_BITS
+
+    # 添加多张牌（cards 为列表或元组；先检查全部牌，有重复的牌时不添加任何牌）
+    def add_cards(self, cards):
+        mask = self.__mask
+        for card in cards:
+            bit = 1 << card.get_id()
+            if mask & bit:
+                raise ValueError(f"重复的牌【{card}】")
+            mask |= bit
+
+        counts = self.__counts
+        signature = self.__signature
+        for card in cards:
+            rank_index = card.get_rank_index()
+            counts[rank_index] += 1
+            signature += 1 << rank_index * SIGNATURE_BITS
+        self.__mask = mask
+        self.__size += len(cards)
+        self.__signature = signature
+
+    # 是否有全部这些牌（同一张牌出现多次时按没有处理）
+    def has_cards(self, cards):
+        mask = 0
+        for card in cards:
+            bit = 1 << card.get_id()
+            if mask & bit:
+                return False
+            mask |= bit
+        return self.__mask & mask == mask
+
+    # 移除多张牌，任意一张没有时抛出 ValueError，手牌不变
+    def remove_cards(self, cards):
+        mask = 0
+        for card in cards:
+            bit = 1 << card.get_id()
+            if self.__mask & bit == 0 or mask & bit:
+                raise ValueError(f"你没有足够的【{card}】")
+            mask |= bit
+
+        self.__mask ^= mask
+        for card in cards:
+            self.__counts[card.get_rank_index()] -= 1
+            self.__signature -= 1 << card.get_rank_index() * SIGNATURE_BITS
+        self.__size -= len(cards)
+
+    def clear(self):
+        self.__mask = 0
+        for i in range(RANK_COUNT):
+            self.__counts[i] = 0
+        self.__size = 0
+        self.__signature = 0
+
+    # 牌掩码（第 i 位为 1 表示有编号为 i 的牌）
+    def get_mask(self):
+        return self.__mask
+
+    # 牌型签名（见 make_signature）
+    def get_signature(self):
+        return self.__signature
+
+    # 某个点数的牌数
+    def get_count(self, rank_index):
+        return self.__counts[rank_index]
+
+    # 每个点数的牌数（按点数编号，不要修改返回的列表）
+    def get_counts(self):
+        return self.__counts
+
+    # 某个点数的全部牌（按编号从大到小）
+    def get_rank_cards(self, rank_index):
+        cards = []
+        if rank_index >= 13:
+            card_id = rank_index + 39
+            if self.__mask >> card_id & 1:
+                cards.append(Card.from_id(card_id))
+            return cards
+
+        bits = self.__mask >> (rank_index * 4) & 0xF
+        for suit_index in range(3, -1, -1):
+            if bits >> suit_index & 1:
+                cards.append(Card.from_id(rank_index * 4 + suit_index))
+        return cards
+
+    # 最小的一张牌（没有牌时返回 None）
+    def get_smallest(self):
+        if self.__mask == 0:
+            return None
+        return Card.from_id((self.__mask & -self.__mask).bit_length() - 1)
+
+    # 按牌型签名从手牌中取出要出的牌（每个点数取花色最小的几张，不会从手牌中移除）
+    def pick_cards(self, signature):
+        cards = []
+        rank_index = 0
+        while signature:
+            count = signature & ((1 << SIGNATURE_BITS) - 1)
+            if count:
+                rank_cards = self.get_rank_cards(rank_index)
+                if len(rank_cards) < count:
+                    raise ValueError(f"你没有足够的【{CARD_RANKS[rank_index] if rank_index < 13 else CARD_NAMES[rank_index + 39]}】")
+                cards.extend(reversed(rank_cards[-count:]))
+            signature >>= SIGNATURE_BITS
+            rank_index += 1
+        return cards
+
+    # 全部牌（按编号从大到小）
+    def get_cards(self):
+        cards = []
+        mask = self.__mask
+        while mask:
+            card_id = mask.bit_length() - 1
+            cards.append(Card.from_id(card_id))
+            mask ^= 1 << card_id
+        return cards
+
+    # 全部牌的名称（按编号从大到小）
+    def get_names(self):
+        names = []
+        mask = self.__mask
+        while mask:
+            card_id = mask.bit_length() - 1
+            names.append(CARD_NAMES[card_id])
+            mask ^= 1 << card_id
+        return names
+
+
+# 一副牌（洗牌、发牌）
+# 54 张牌的单例预先放在一个列表里，洗牌只是原地打乱这个列表，发牌直接切出每个人的牌和底牌，
+# 不创建新的牌对象，也不逐张移除；同一副牌可以一直重复使用（重新发牌只需要再洗一次）
+# rng 为 random.Random 之类带 shuffle 方法的随机数生成器，传入带种子的生成器可以复现发牌（模拟、测试）
+class Deck:
+
+    def __init__(self, rng=None):
+        self.__cards = list(Card.get_all())
+        self.__rng = rng if rng is not None else random.Random()
+
+    # 洗牌并发牌，返回 (每个人的牌的列表, 底牌)
+    def deal(self, player_count=3, per_cards=17):
+        cards = self.__cards
+        self.__rng.shuffle(cards)
+        hands = [cards[i * per_cards:(i + 1) * per_cards] for i in range(player_count)]
+        return hands, cards[player_count * per_cards:]
+
+    # 洗牌并发牌，返回 (每个人的手牌 Hand 的列表, 底牌)
+    def deal_hands(self, player_count=3, per_cards=17):
+        hands, remain = self.deal(player_count, per_cards)
+        return [Hand(cards) for cards in hands], remain
+
+
+# 根据每个点数的牌数（点数编号 -> 牌数）生成牌型签名
+def make_signature(count_map):
+    signature = 0
+    for rank_index, count in count_map.items():
+        signature += count << rank_index * SIGNATURE_BITS
+    return signature
+
+
+# 掩码（第 i 位表示编号为 i 的牌，与 Hand.get_mask() 相同）的每个字节 -> 这 8 张牌的牌型签名
+MASK_BYTE_SIGNATURES = [[sum(1 << CARD_RANK_INDEXES[byte_index * 8 + bit] * SIGNATURE_BITS
+                             for bit in range(8) if value >> bit & 1 and byte_index * 8 + bit < 54)
+                         for value in range(256)] for byte_index in range(7)]
+
+
+# 掩码表示的一组牌的牌型签名（按字节查表）
+def get_mask_signature(mask):
+    signature = 0
+    for table in MASK_BYTE_SIGNATURES:
+        signature += table[mask & 255]
+        mask >>= 8
+    return signature
+
+
+# 牌型签名中的牌数
+def get_signature_size(signature):
+    size = 0
+    while signature:
+        size += signature & ((1 << SIGNATURE_BITS) - 1)
+        signature >>= SIGNATURE_BITS
+    return size
+
+
+# 出牌压制表：合法出牌按 (出牌类型, 权值, 牌数) 归成出牌类别（同一类别的出牌能压过的牌完全相同），生成牌型表时一起生成
+# 每个类别保存能压过它的类别（位掩码、按提示顺序排好的列表和按 (出牌类型, 牌数) 分组的最小权值），
+# "A 能否压过 B" 和 "能压过 B 的所有类别" 都只需要查一次表；服务器的出牌检查、出牌生成、出牌索引和批量比较都用这张表
+# 规则（与原来 Play.compare_last 逐条判断的规则相同）：王炸能压过所有出牌；炸弹能压过不是炸弹的出牌（包括王炸），
+#   炸弹之间比较权值；其他出牌必须类型相同、权值更大，顺子、连对、飞机、飞机带对子的牌数还必须相同
+class PlayDominance:
+    RUN_TYPES = frozenset(CARD_ORDER_TYPE[name] for name in ('顺子', '连对', '飞机', '飞机带对子'))  # 与上次出牌的牌数必须相同
+    BOMB_TYPES = frozenset((CARD_ORDER_TYPE['炸弹'], CARD_ORDER_TYPE['王炸']))  # 炸弹和王炸（出牌策略尽量不用）
+
+    __plays = []  # 类别编号 -> (出牌类型, 权值, 牌数)
+    __class_ids = {}  # (出牌类型, 权值, 牌数) -> 类别编号
+    __beater_masks = []  # 类别编号 -> 能压过这个类别的类别编号位掩码
+    __beaters = []  # 类别编号 -> 能压过这个类别的类别编号（同类型的按权值从小到大，然后是炸弹，最后是王炸）
+    __beater_types = []  # 类别编号 -> 能压过这个类别的出牌类型名称集合
+    __beater_groups = []  # 类别编号 -> 能压过这个类别的 (出牌类型, 牌数, 最小权值)，顺序与 __beaters 相同
+
+    # 根据所有合法出牌的 (出牌类型, 权值, 牌数) 生成压制表（由 PlayTable.init 调用）
+    @staticmethod
+    def init(plays):
+        if PlayDominance.__plays:
+            return
+
+        rocket = CARD_ORDER_TYPE['王炸']
+        bomb = CARD_ORDER_TYPE['炸弹']
+        # 类别编号的顺序：炸弹和王炸在最后，其他类别按出牌类型、牌数、权值从小到大（同一类型的类别编号按提示顺序排列）
+        plays = sorted(set(plays), key=lambda play: (play[0] == rocket, play[0] == bomb, play[0].value, play[2], play[1]))
+        PlayDominance.__plays = plays
+        PlayDominance.__class_ids = {play: class_id for class_id, play in enumerate(plays)}
+
+        type_classes = {}  # 出牌类型 -> 类别编号（按牌数、权值从小到大）
+        for class_id, (card_type, power, size) in enumerate(plays):
+            type_classes.setdefault(card_type, []).append(class_id)
+
+        for last_type, last_power, last_size in plays:
+            # 同类型权值更大的（连续的牌型牌数还要相同）；不是炸弹时任何炸弹都能压过；王炸能压过所有出牌
+            run = last_type in PlayDominance.RUN_TYPES
+            beaters = [class_id for class_id in type_classes[last_type]
+                       if plays[class_id][1] > last_power and (not run or plays[class_id][2] == last_size)]
+            if last_type != bomb:
+                beaters += type_classes.get(bomb, [])
+            beaters += type_classes.get(rocket, [])
+
+            groups = []
+            for class_id in beaters:
+                card_type, power, size = plays[class_id]
+                if not groups or groups[-1][:2] != (card_type, size):
+                    groups.append((card_type, size, power))
+            PlayDominance.__beater_masks.append(sum(1 << class_id for class_id in beaters))
+            PlayDominance.__beaters.append(tuple(beaters))
+            PlayDominance.__beater_types.append(frozenset(plays[class_id][0].name for class_id in beaters))
+            PlayDominance.__beater_groups.append(tuple(groups))
+
+    # 出牌类别编号，不是合法的出牌时返回 None
+    @staticmethod
+    def get_class(card_type, power, size):
+        return PlayDominance.__class_ids.get((card_type, power, size))
+
+    # 出牌类别编号 -> (出牌类型, 权值, 牌数)
+    @staticmethod
+    def get_play(class_id):
+        return PlayDominance.__plays[class_id]
+
+    # 出牌类别的数量
+    @staticmethod
+    def get_size():
+        return len(PlayDominance.__plays)
+
+    # 类别 class_id 的出牌能否压过类别 last_id 的上次出牌（不是合法的出牌时为 None，压不过也不能被压过）
+    @staticmethod
+    def beats(class_id, last_id):
+        if class_id is None or last_id is None:
+            return False
+        return PlayDominance.__beater_masks[last_id] >> class_id & 1 == 1
+
+    # 能压过类别 last_id 的所有类别编号（同类型的按权值从小到大，然后是炸弹，最后是王炸）
+    # 上次出牌是王炸时所有炸弹和王炸都能压过（与原来的规则相同，一副牌只有一个王炸，实际只能出炸弹）
+    @staticmethod
+    def get_beaters(last_id):
+        return PlayDominance.__beaters[last_id]
+
+    # 能压过类别 last_id 的出牌类型名称集合
+    @staticmethod
+    def get_beater_types(last_id):
+        return PlayDominance.__beater_types[last_id]
+
+    # 能压过类别 last_id 的 (出牌类型, 牌数, 最小权值)，顺序与 get_beaters 相同
+    @staticmethod
+    def get_beater_groups(last_id):
+        return PlayDominance.__beater_groups[last_id]
+
+
+# 牌型表（牌型签名 -> (出牌类型, 权值)），导入时生成
+# 每种牌型按规则直接构造出所有合法的点数组合，同一个签名只会属于一种牌型
+class PlayTable:
+    __table = {}
+    __class_ids = {}  # 牌型签名 -> 出牌类别编号（PlayDominance）
+
+    # 查表获取牌型，返回 (出牌类型, 权值)，不是合法的出牌时返回 None
+    @staticmethod
+    def classify(signature):
+        return PlayTable.__table.get(signature)
+
+    # 获取一组牌的牌型（重复的牌按多张相同点数的牌计算，由移除手牌时检查）
+    @staticmethod
+    def classify_cards(cards):
+        if len(cards) > PLAY_MAX_CARDS:
+            return None
+        signature = 0
+        for card in cards:
+            signature += 1 << card.get_rank_index() * SIGNATURE_BITS
+        return PlayTable.__table.get(signature)
+
+    # 合法出牌的签名数量
+    @staticmethod
+    def get_size():
+        return len(PlayTable.__table)
+
+    # 全部合法出牌（签名 -> (出牌类型, 权值)）
+    @staticmethod
+    def get_all():
+        return dict(PlayTable.__table)
+
+    # 生成一手牌可以出的所有牌，返回 (牌型签名, 出牌类型, 权值) 的生成器
+    # 每个牌型签名只生成一次（生成牌型表时已经检查过同一个签名不会重复生成），相同点数不同花色的出牌只算一种
+    # last 为上次出牌 (出牌类型, 权值, 牌数)，为 None 时可以出任意牌；能否压过上次出牌查 PlayDominance 的压制表
+    @staticmethod
+    def generate_moves(hand, last=None):
+        return PlayTable.generate_count_moves(hand.get_counts(), last)
+
+    # 与 generate_moves 相同，但直接输入每个点数的牌数（点数编号 -> 牌数，搜索时不需要创建 Hand）
+    @staticmethod
+    def generate_count_moves(counts, last=None):
+        table = PlayTable.__table
+        if last is None:
+            for signature, type_name, power_rank in PlayTable.__generate(counts):
+                yield (signature,) + table[signature]
+            return
+
+        # 只生成能压过上次出牌的出牌类型，再按出牌类别查压制表
+        last_id = PlayDominance.get_class(*last)
+        if last_id is None:
+            return
+        type_names = PlayDominance.get_beater_types(last_id)
+        if not type_names:
+            return
+        class_ids = PlayTable.__class_ids
+        for signature, type_name, power_rank in PlayTable.__generate(counts, type_names):
+            if PlayDominance.beats(class_ids[signature], last_id):
+                yield (signature,) + table[signature]
+
+    # 一手牌能否压过上次出牌 last (出牌类型, 权值, 牌数)（查压制表）
+    @staticmethod
+    def beats(card_type, power, size, last):
+        return PlayDominance.beats(PlayDominance.get_class(card_type, power, size), PlayDominance.get_class(*last))
+
+    # 查表获取出牌类别编号（PlayDominance），不是合法的出牌时返回 None
+    @staticmethod
+    def get_class(signature):
+        return PlayTable.__class_ids.get(signature)
+
+    # 权值是否连续（2 和大小王不能与 A 连起来）
+    @staticmethod
+    def __is_continuous(rank_list):
+        for i in range(1, len(rank_list)):
+            if RANK_POWERS[rank_list[i]] != RANK_POWERS[rank_list[i - 1]] + 1:
+                return False
+        return True
+
+    # 所有长度不少于 min_length、每个点数至少有 count 张牌的连续点数（不含 2 和大小王）
+    @staticmethod
+    def __runs(limits, count, min_length):
+        for start in range(12):
+            end = start
+            while end < 12 and limits[end] >= count:
+                end += 1
+                if end - start >= min_length:
+                    yield list(range(start, end))
+
+    # 从 rank_list[start:] 中选出 size 张带牌，每个点数的牌数只能是 allowed 中的数量（并且不超过 limits），返回带牌的签名
+    @staticmethod
+    def __kickers(size, rank_list, allowed, limits, start=0):
+        if size == 0:
+            yield 0
+            return
+
+        for i in range(start, len(rank_list)):
+            rank_index = rank_list[i]
+            for count in allowed:
+                if count <= size and count <= limits[rank_index]:
+                    base = count << rank_index * SIGNATURE_BITS
+                    for rest in PlayTable.__kickers(size - count, rank_list, allowed, limits, i + 1):
+                        yield base + rest
+
+    # 从 rank_list 中选出 k 个点数的所有组合
+    @staticmethod
+    def __combinations(rank_list, k, start=0):
+        if k == 0:
+            yield []
+            return
+        for i in range(start, len(rank_list)):
+            for rest in PlayTable.__combinations(rank_list, k - 1, i + 1):
+                yield [rank_list[i]] + rest
+
+    # 生成每个点数的牌数不超过 limits 时可以出的所有牌，返回 (牌型签名, 出牌类型名称, 决定权值的点数编号) 的生成器
+    # type_names 不为 None 时只生成其中的牌型
+    @staticmethod
+    def __generate(limits, type_names=None):
+        def want(type_name):
+            return type_names is None or type_name in type_names
+
+        # 可以做带牌的点数（排除主牌的点数）
+        def others(exclude):
+            return [rank_index for rank_index in range(RANK_COUNT) if limits[rank_index] > 0 and rank_index not in exclude]
+
+        kickers = PlayTable.__kickers
+        for rank_index in range(RANK_COUNT):
+            count = limits[rank_index]
+            shift = rank_index * SIGNATURE_BITS
+            if count >= 1 and want('一张'):
+                yield 1 << shift, '一张', rank_index
+            if count >= 2 and want('一对'):
+                yield 2 << shift, '一对', rank_index
+            if count >= 3:
+                if want('三张'):
+                    yield 3 << shift, '三张', rank_index
+                # 三带
+                if want('三带一'):
+                    for kicker in kickers(1, others((rank_index,)), (1,), limits):
+                        yield kicker + (3 << shift), '三带一', rank_index
+                if want('三带二'):
+                    for kicker in kickers(2, others((rank_index,)), (2,), limits):
+                        yield kicker + (3 << shift), '三带二', rank_index
+            if count >= 4:
+                if want('炸弹'):
+                    yield 4 << shift, '炸弹', rank_index
+                # 四带
+                if want('四带一'):
+                    for kicker in kickers(1, others((rank_index,)), (1,), limits):
+                        yield kicker + (4 << shift), '四带一', rank_index
+                if want('四带二'):
+                    for kicker in kickers(2, others((rank_index,)), (1, 2), limits):
+                        yield kicker + (4 << shift), '四带二', rank_index
+                if want('四带两对'):
+                    for kicker in kickers(4, others((rank_index,)), (2,), limits):
+                        yield kicker + (4 << shift), '四带两对', rank_index
+
+        # 双三张（两个三张不要求连续）
+        triple_ranks = [rank_index for rank_index in range(13) if limits[rank_index] >= 3]
+        if want('双三张'):
+            for rank_list in PlayTable.__combinations(triple_ranks, 2):
+                yield make_signature({rank_list[0]: 3, rank_list[1]: 3}), '双三张', rank_list[0]
+
+        # 顺子、连对
+        if want('顺子'):
+            for rank_list in PlayTable.__runs(limits, 1, 5):
+                yield make_signature({rank_index: 1 for rank_index in rank_list}), '顺子', rank_list[0]
+        if want('连对'):
+            for rank_list in PlayTable.__runs(limits, 2, 3):
+                yield make_signature({rank_index: 2 for rank_index in rank_list}), '连对', rank_list[0]
+
+        # 飞机：k 个连续的三张带 k 张牌；飞机带对子：k 个连续的三张带 k 个对子（可以是相同点数的两个对子）
+        for rank_list in PlayTable.__runs(limits, 3, 2):
+            k = len(rank_list)
+            triples = make_signature({rank_index: 3 for rank_index in rank_list})
+            if want('飞机') and k * 4 <= PLAY_MAX_CARDS:
+                for kicker in kickers(k, others(rank_list), (1, 2, 4), limits):
+                    yield kicker + triples, '飞机', rank_list[0]
+            if want('飞机带对子') and k * 5 <= PLAY_MAX_CARDS:
+                for kicker in kickers(k * 2, others(rank_list), (2, 4), limits):
+                    yield kicker + triples, '飞机带对子', rank_list[0]
+
+        # 特别的飞机：k（至少 4）个三张带 k - 4 张牌，其中一个三张当做带的牌，
+        # 其余 k - 1 个三张必须连续（优先把最小的三张当做带的牌）
+        if want('飞机'):
+            for k in range(4, (PLAY_MAX_CARDS + 4) // 4 + 1):
+                for rank_list in PlayTable.__combinations(triple_ranks, k):
+                    if PlayTable.__is_continuous(rank_list[1:]):
+                        power_rank = rank_list[1]
+                    elif PlayTable.__is_continuous(rank_list[:-1]):
+                        power_rank = rank_list[0]
+                    else:
+                        continue
+                    triples = make_signature({rank_index: 3 for rank_index in rank_list})
+                    for kicker in kickers(k - 4, others(rank_list), (1, 2, 4), limits):
+                        yield kicker + triples, '飞机', power_rank
+
+        if limits[13] >= 1 and limits[14] >= 1 and want('王炸'):
+            yield make_signature({13: 1, 14: 1}), '王炸', 14
+
+    # 生成牌型表
+    @staticmethod
+    def init():
+        if PlayTable.__table:
+            return
+
+        plays = {}  # (出牌类型名称, 决定权值的点数编号, 牌数) -> (出牌类型, 权值, 牌数)
+        play_keys = {}  # 牌型签名 -> plays 的键
+        for signature, type_name, power_rank in PlayTable.__generate(RANK_LIMITS):
+            size = get_signature_size(signature)
+            if size > PLAY_MAX_CARDS:
+                continue
+            if signature in PlayTable.__table:
+                raise RuntimeError(f"牌型冲突【{type_name}】【{PlayTable.__table[signature][0].name}】")
+            PlayTable.__table[signature] = (CARD_ORDER_TYPE[type_name], RANK_POWERS[power_rank])
+            key = (type_name, power_rank, size)
+            if key not in plays:
+                plays[key] = PlayTable.__table[signature] + (size,)
+            play_keys[signature] = key
+
+        PlayDominance.init(plays.values())
+        class_ids = {key: PlayDominance.get_class(*play) for key, play in plays.items()}
+        PlayTable.__class_ids = {signature: class_ids[key] for signature, key in play_keys.items()}
+
+
+PlayTable.init()
+
+
+# 出牌索引：一手牌能出的所有牌（提示、超时自动出牌使用）
+# 发牌后生成一次，按 (出牌类型, 牌数) 分组、组内按权值从小到大排序；之后手牌每减少一次，
+# 只检查用到了这些点数的出牌，牌数不够的标记为失效（手牌只会减少，失效的出牌不会再恢复），不需要重新生成
+# 提示从能压过上次出牌的最小的牌开始，每提示一次换下一个更大的牌，全部提示过后从头开始
+class MoveIndex:
+    __shapes = {}  # 牌型签名 -> (分组, 出任意牌时的排序, 用到的点数编号)（所有出牌索引共用的缓存）
+
+    def __init__(self, hand):
+        self.__hand = hand
+        self.__moves = []  # 出牌编号 -> (牌型签名, 出牌类型, 权值, 分组)
+        self.__alive = []  # 出牌编号 -> 是否还能出
+        self.__alive_count = 0
+        self.__rank_moves = [[] for i in range(RANK_COUNT)]  # 点数编号 -> 用到这个点数的出牌编号
+        self.__groups = {}  # 分组 -> 出牌编号列表（None 为出任意牌时的提示顺序）
+        self.__powers = {}  # 分组 -> 与出牌编号列表对应的权值列表（二分查找用）
+        self.__dead = {}  # 分组 -> 列表中已经失效的出牌数（超过一半时压缩列表）
+        self.__hint = None  # 当前提示的 (上次出牌, 提示轮次, 提示生成器)
+
+        shapes = MoveIndex.__shapes
+        moves = self.__moves
+        groups = self.__groups
+        rank_moves = self.__rank_moves
+        free = []
+        for move in PlayTable.generate_moves(hand):
+            shape = shapes.get(move[0])
+            if shape is None:
+                shape = MoveIndex.__make_shape(*move)
+                shapes[move[0]] = shape
+            key, order, rank_list = shape
+
+            move_id = len(moves)
+            moves.append(move + (key,))
+            if key in groups:
+                groups[key].append(move_id)
+            else:
+                groups[key] = [move_id]
+            free.append((order, move_id))
+            for rank_index in rank_list:
+                rank_moves[rank_index].append(move_id)
+
+        self.__alive = [True] * len(moves)
+        self.__alive_count = len(moves)
+        free.sort()
+        groups[None] = [move_id for order, move_id in free]
+        for key, move_ids in groups.items():
+            if key is not None:
+                move_ids.sort(key=lambda move_id: (moves[move_id][2], moves[move_id][0]))
+                self.__powers[key] = [moves[move_id][2] for move_id in move_ids]
+            self.__dead[key] = 0
+
+    # 分组编号：(出牌类型, 牌数)
+    @staticmethod
+    def __group_key(card_type, size):
+        return card_type.value << SIGNATURE_BITS | size
+
+    # 一种出牌在索引中的固定信息（只与牌型签名有关）
+    # 出任意牌时：尽量不用炸弹，权值小的在前，相同权值出牌数多的在前
+    @staticmethod
+    def __make_shape(signature, card_type, power):
+        size = get_signature_size(signature)
+        rank_list = [rank_index for rank_index in range(RANK_COUNT)
+                     if signature >> rank_index * SIGNATURE_BITS & ((1 << SIGNATURE_BITS) - 1)]
+        order = (card_type in PlayDominance.BOMB_TYPES, power, -size, signature)
+        return MoveIndex.__group_key(card_type, size), order, tuple(rank_list)
+
+    def __len__(self):
+        return self.__alive_count
+
+    def get_hand(self):
+        return self.__hand
+
+    # 去掉分组中失效的出牌
+    def __compact(self, key):
+        alive = self.__alive
+        move_ids = [move_id for move_id in self.__groups[key] if alive[move_id]]
+        self.__groups[key] = move_ids
+        if key is not None:
+            self.__powers[key] = [self.__moves[move_id][2] for move_id in move_ids]
+        self.__dead[key] = 0
+
+    # 手牌移除 cards 之后更新索引（cards 已经从手牌中移除）
+    def remove_cards(self, cards):
+        moves = self.__moves
+        alive = self.__alive
+        groups = self.__groups
+        dead = self.__dead
+        compact = set()
+        for rank_index in {card.get_rank_index() for card in cards}:
+            count = self.__hand.get_count(rank_index)
+            shift = rank_index * SIGNATURE_BITS
+            move_ids = []
+            for move_id in self.__rank_moves[rank_index]:
+                if not alive[move_id]:
+                    continue
+                move = moves[move_id]
+                if move[0] >> shift & ((1 << SIGNATURE_BITS) - 1) <= count:
+                    move_ids.append(move_id)
+                    continue
+
+                alive[move_id] = False
+                self.__alive_count -= 1
+                dead[move[3]] += 1
+                if dead[move[3]] * 2 > len(groups[move[3]]):
+                    compact.add(move[3])
+            self.__rank_moves[rank_index] = move_ids
+
+        dead[None] = len(groups[None]) - self.__alive_count
+        if dead[None] * 2 > len(groups[None]):
+            compact.add(None)
+        for key in compact:
+            self.__compact(key)
+
+    # 能压过上次出牌 last (出牌类型, 权值, 牌数) 的所有出牌，返回 (牌型签名, 出牌类型, 权值) 的生成器
+    # 同牌型的牌按权值从小到大在前，然后是炸弹，最后是王炸；last 为 None 时按出任意牌的提示顺序生成所有出牌
+    def get_moves(self, last=None):
+        moves = self.__moves
+        for move_id in self.__iter_moves(last):
+            yield moves[move_id][:3]
+
+    # 能压过上次出牌的分组和最小权值从压制表中查出（顺序与 PlayDominance.get_beaters 相同）
+    def __iter_moves(self, last):
+        if last is None:
+            ranges = [(None, 0)]
+        else:
+            last_id = PlayDominance.get_class(*last)
+            groups = () if last_id is None else PlayDominance.get_beater_groups(last_id)
+            ranges = [(MoveIndex.__group_key(card_type, size), power) for card_type, size, power in groups]
+
+        alive = self.__alive
+        for key, power in ranges:
+            move_ids = self.__groups.get(key)
+            if not move_ids:
+                continue
+            start = 0 if key is None else bisect.bisect_left(self.__powers[key], power)
+            for i in range(start, len(move_ids)):
+                if alive[move_ids[i]]:
+                    yield move_ids[i]
+
+    # 提示：返回下一个能压过上次出牌的 (牌型签名, 出牌类型, 权值)，没有能出的牌时返回 None
+    # turn 用来区分不同的出牌轮次（上次出牌或者轮次变化时从最小的牌重新开始提示）
+    def next_hint(self, last=None, turn=None):
+        if self.__hint is None or self.__hint[0] != last or self.__hint[1] != turn:
+            self.__hint = (last, turn, self.__iter_moves(last))
+
+        move_id = next(self.__hint[2], None)
+        if move_id is None:
+            # 全部提示过了，从头开始
+            self.__hint = (last, turn, self.__iter_moves(last))
+            move_id = next(self.__hint[2], None)
+            if move_id is None:
+                return None
+        return self.__moves[move_id][:3]
+
+
+# 手牌拆分：把一手牌拆成最少的合法出牌（叫分、出牌策略估计一手牌最少几次能出完）
+# 先选出顺子、连对和连续的三张（飞机的主体），剩下的点数按牌数分成单张、对子、三张和四张，再决定飞机、四张和三张各带哪些牌
+# 带牌的拆法只与每种牌数的点数个数有关，与具体是哪些点数无关，按个数记忆化，所有手牌共用（个数的组合很少）
+# 整手牌的拆分结果保存在 LRU 缓存中，同一手牌、出牌后剩下的手牌再次拆分时直接查表
+# 按个数计算时没有区分同一个点数拆出来的几份牌，极少数情况下按拆法分配的出牌不合法，这时改用逐个出牌的完整搜索
+class HandDecomposer:
+    MAX_CACHE_SIZE = 100000  # 整手牌拆分结果的缓存大小（超过时删除最久没有用到的）
+    # 可以连起来的牌：(每个点数的牌数, 最短长度, 最长长度)，依次为顺子、连对、飞机的主体（带牌后不超过 20 张）
+    RUN_SHAPES = ((1, 5, 12), (2, 3, 10), (3, 2, 5))
+    __cache = collections.OrderedDict()  # 手牌签名 -> 出牌签名的元组
+    __groups = []  # 3 个点数的签名（15 位）-> 其中牌数为 1、2、3、4 的点数个数（每个个数占 5 位）
+    __runs = {}  # (每个点数的牌数, 起点, 长度) -> 连续点数的签名
+    __leaves = {}  # (飞机主体, 四张, 三张, 对子, 单张, 大小王) 的个数 -> (出牌次数, 拆法)
+    __matches = {}  # (飞机主体, 四张, 三张, 对子, 拆成两个对子的四张, 单张) 的个数 -> (出牌次数, 第一个飞机主体或四张的带牌)
+    __high_bits = sum(16 << rank_index * SIGNATURE_BITS for rank_index in range(RANK_COUNT))  # 判断签名是否包含另一个签名
+    __fallbacks = 0  # 改用完整搜索的次数
+
+    # 生成查找表（导入时调用）
+    @staticmethod
+    def init():
+        if HandDecomposer.__groups:
+            return
+
+        values = [1 << (count - 1) * 5 if 1 <= count <= 4 else 0 for count in range(1 << SIGNATURE_BITS)]
+        HandDecomposer.__groups = [values[a] + values[b] + values[c] for c in range(32) for b in range(32) for a in range(32)]
+        for count, min_length, max_length in HandDecomposer.RUN_SHAPES:
+            for start in range(12):
+                for length in range(min_length, min(max_length, 12 - start) + 1):
+                    HandDecomposer.__runs[count, start, length] = make_signature({rank_index: count for rank_index in
+                                                                                   range(start, start + length)})
+
+    # 一手牌最少几次能出完
+    @staticmethod
+    def count(signature):
+        return len(HandDecomposer.decompose(signature))
+
+    # 拆分一手牌（牌型签名），返回出牌次数最少的一种拆法（出牌签名的元组，按出牌中最小的点数排列）
+    @staticmethod
+    def decompose(signature):
+        cache = HandDecomposer.__cache
+        plays = cache.get(signature)
+        if plays is not None:
+            cache.move_to_end(signature)
+            return plays
+
+        # 这手牌中所有的顺子、连对和连续的三张
+        runs = []
+        for count, min_length, max_length in HandDecomposer.RUN_SHAPES:
+            start = 0
+            while start < 12:
+                end = start
+                while end < 12 and signature >> end * SIGNATURE_BITS & 31 >= count:
+                    end += 1
+                for run_start in range(start, end - min_length + 1):
+                    for length in range(min_length, min(max_length, end - run_start) + 1):
+                        runs.append((HandDecomposer.__runs[count, run_start, length], count, run_start, length))
+                start = end + 1
+
+        used = HandDecomposer.__search(signature, runs, 0, ())[1]
+        rest = signature
+        planes = []
+        plays = []
+        for run_signature, count, start, length in used:
+            rest -= run_signature
+            if count == 3:
+                planes.append((start, length))
+            else:
+                plays.append(run_signature)
+        plays += HandDecomposer.__build(rest, planes)
+        if any(PlayTable.classify(play) is None for play in plays):
+            HandDecomposer.__fallbacks += 1
+            plays = HandDecomposer.__exhaustive(signature, {})
+        plays = tuple(sorted(plays, key=HandDecomposer.__lowest))
+
+        cache[signature] = plays
+        while len(cache) > HandDecomposer.MAX_CACHE_SIZE:
+            cache.popitem(last=False)
+        return plays
+
+    # 改用完整搜索的次数
+    @staticmethod
+    def get_fallbacks():
+        return HandDecomposer.__fallbacks
+
+    @staticmethod
+    def get_cache_size():
+        return len(HandDecomposer.__cache)
+
+    @staticmethod
+    def is_cached(signature):
+        return signature in HandDecomposer.__cache
+
+    # 出牌中最小的点数
+    @staticmethod
+    def __lowest(signature):
+        rank_index = 0
+        while not signature >> rank_index * SIGNATURE_BITS & 31:
+            rank_index += 1
+        return rank_index
+
+    # 从 runs[start:] 中选出若干个连起来的牌（可以重复选同一个），返回 (最少的出牌次数, 选出的连起来的牌)
+    # planes 为已经选出的飞机主体 (起点, 长度)，飞机主体与带牌一起算一次出牌，在剩下的牌中计算
+    @staticmethod
+    def __search(signature, runs, start, planes):
+        best = (HandDecomposer.__leaf(signature, planes)[0], ())
+        high_bits = HandDecomposer.__high_bits
+        for i in range(start, len(runs)):
+            run = runs[i]
+            if (signature | high_bits) - run[0] & high_bits != high_bits:
+                continue
+            if run[1] == 3:
+                count, used = HandDecomposer.__search(signature - run[0], runs, i, planes + ((run[2], run[3]),))
+            else:
+                count, used = HandDecomposer.__search(signature - run[0], runs, i, planes)
+                count += 1
+            if count < best[0]:
+                best = (count, used + (run,))
+        return best
+
+    # 没有其他连起来的牌时最少的出牌次数，返回 (出牌次数, 拆法, 飞机主体的个数键)
+    # 拆法为 (拆成两个对子的四张数, 拆成三张和单张的四张数, 拆成对子和单张的三张数, 拆成两个单张的对子数, 大小王是否作为王炸)
+    # 飞机主体的个数键为 (长度, 主体的点数中剩下一张牌的点数个数) 的元组（这些单张不能作为这个飞机的带牌）
+    @staticmethod
+    def __leaf(signature, planes):
+        groups = HandDecomposer.__groups
+        counts = groups[signature & 32767] + groups[signature >> 15 & 32767] + groups[signature >> 30 & 32767] + \
+            groups[signature >> 45 & 32767] + groups[signature >> 60 & 31]
+        singles = counts & 31
+        pairs = counts >> 5 & 31
+        triples = counts >> 10 & 31
+        quads = counts >> 15
+        jokers = (signature >> 13 * SIGNATURE_BITS & 1) + (signature >> 14 * SIGNATURE_BITS & 1)
+
+        plane_keys = []
+        for start, length in planes:
+            own = 0
+            for rank_index in range(start, start + length):
+                if signature >> rank_index * SIGNATURE_BITS & 31 == 1:
+                    own += 1
+            plane_keys.append((length, own))
+            singles -= own
+        plane_keys = tuple(sorted(plane_keys))
+
+        key = (plane_keys, quads, triples, pairs, singles, jokers)
+        result = HandDecomposer.__leaves.get(key)
+        if result is None:
+            match = HandDecomposer.__match
+            result = (PLAY_MAX_CARDS + 1, None)
+            for x in range(quads + 1):
+                for w in range(quads - x + 1):
+                    for y in range(triples + w + 1):
+                        for z in range(pairs + y + 1):
+                            rest = (plane_keys, quads - x - w, triples + w - y, pairs + y - z, x, singles + w + y + 2 * z)
+                            count = match(*rest[:-1], rest[-1] + jokers)[0]
+                            if count < result[0]:
+                                result = (count, (x, w, y, z, False))
+                            if jokers == 2:
+                                count = match(*rest)[0] + 1
+                                if count < result[0]:
+                                    result = (count, (x, w, y, z, True))
+            HandDecomposer.__leaves[key] = result
+        return result + (plane_keys,)
+
+    # 从 pairs 个对子和 splits 个拆成两个对子的四张中选出 count 个点数不同的对子，
+    # 返回 (选用的对子数, 选用的四张数, 剩下的对子数, 剩下的四张数) 的生成器（用了一半的四张剩下一个对子）
+    @staticmethod
+    def __take_pairs(count, pairs, splits):
+        for from_splits in range(min(count, splits) + 1):
+            from_pairs = count - from_splits
+            if from_pairs <= pairs:
+                yield from_pairs, from_splits, pairs - from_pairs + from_splits, splits - from_splits
+
+    # 依次决定每个飞机主体、每个四张的带牌，最后三张带单张或者对子、剩下的三张两两组成双三张，返回 (出牌次数, 第一个的带牌)
+    # 飞机主体的带牌为 (单张数, 对子数, 用一半的四张数, 整个四张数, 三张数, 是否带对子)，四张的带牌为 (单张数, 对子数, 用一半的四张数)
+    # 飞机主体的单张先从后面的飞机主体剩下的单张中选（这些单张不能作为后面那个飞机的带牌，先用掉更好）
+    @staticmethod
+    def __match(planes, quads, triples, pairs, splits, singles):
+        key = (planes, quads, triples, pairs, splits, singles)
+        result = HandDecomposer.__matches.get(key)
+        if result is not None:
+            return result
+
+        options = []  # (带牌, 剩下的状态)
+        if planes:
+            (length, own), rest = planes[0], planes[1:]
+            free = singles + own  # 这个飞机的带牌选好以后，主体的点数中剩下的单张也可以给别的牌带
+            # 没有带牌：两个三张是双三张，四个三张是特别的飞机（其中一个三张作为带牌）
+            if length in (2, 4):
+                options.append(((0, 0, 0, 0, 0, False), (rest, quads, triples, pairs, splits, free)))
+            # 带单张（带牌每个点数 1、2 或者 4 张），四个以上的三张可以把另外一个三张作为带牌
+            if length * 4 <= PLAY_MAX_CARDS:
+                for extra in (0, 1) if length >= 3 and triples else (0,):
+                    units = length - 3 * extra
+                    for whole in range(min(splits, units // 4) + 1):
+                        for pair_count in range((units - 4 * whole) // 2 + 1):
+                            single_count = units - 4 * whole - 2 * pair_count
+                            need = single_count
+                            rest_planes = []
+                            for rest_length, rest_own in rest:
+                                used = min(need, rest_own)
+                                need -= used
+                                rest_planes.append((rest_length, rest_own - used))
+                            if need > singles:
+                                continue
+                            for from_pairs, from_splits, rest_pairs, rest_splits in \
+                                    HandDecomposer.__take_pairs(pair_count, pairs, splits - whole):
+                                options.append(((single_count, from_pairs, from_splits, whole, extra, False),
+                                                (tuple(rest_planes), quads, triples - extra, rest_pairs, rest_splits, free - need)))
+            # 带对子（整个四张算两个对子）
+            if length * 5 <= PLAY_MAX_CARDS:
+                for whole in range(min(splits, length // 2) + 1):
+                    for from_pairs, from_splits, rest_pairs, rest_splits in \
+                            HandDecomposer.__take_pairs(length - 2 * whole, pairs, splits - whole):
+                        options.append(((0, from_pairs, from_splits, whole, 0, True),
+                                        (rest, quads, triples, rest_pairs, rest_splits, free)))
+        elif quads:
+            # 炸弹、四带一、四带二（两个单张或者一个对子）、四带两对
+            options.append(((0, 0, 0), ((), quads - 1, triples, pairs, splits, singles)))
+            for single_count in (1, 2):
+                if single_count <= singles:
+                    options.append(((single_count, 0, 0), ((), quads - 1, triples, pairs, splits, singles - single_count)))
+            for pair_count in (1, 2):
+                for from_pairs, from_splits, rest_pairs, rest_splits in HandDecomposer.__take_pairs(pair_count, pairs, splits):
+                    options.append(((0, from_pairs, from_splits), ((), quads - 1, triples, rest_pairs, rest_splits, singles)))
+        else:
+            # 三张尽量带牌，剩下的三张两两组成双三张，剩下的单张、对子单独出
+            pieces = singles + pairs + splits * 2
+            kicked = min(triples, pieces)
+            result = (kicked + (triples - kicked + 1) // 2 + pieces - kicked, None)
+
+        if planes or quads:
+            result = (PLAY_MAX_CARDS + 1, None)  # 飞机主体没有合适的带牌时不是合法的拆法
+            for kickers, state in options:
+                count = HandDecomposer.__match(*state)[0] + 1
+                if count < result[0]:
+                    result = (count, kickers)
+        HandDecomposer.__matches[key] = result
+        return result
+
+    # 按 __leaf、__match 选出的拆法生成剩下的牌的出牌（signature 中已经去掉了顺子、连对和飞机主体）
+    @staticmethod
+    def __build(signature, planes):
+        counts = [signature >> rank_index * SIGNATURE_BITS & 31 for rank_index in range(RANK_COUNT)]
+        count, (splits_count, triple_splits, pair_splits, single_splits, rocket), plane_keys = \
+            HandDecomposer.__leaf(signature, planes)
+        plays = []
+
+        # 飞机主体按个数键的顺序排列，主体的点数中剩下的单张由各自的飞机单独保存
+        plane_ranks = set()
+        plane_list = []
+        for start, length in planes:
+            own = [rank_index for rank_index in range(start, start + length) if counts[rank_index] == 1]
+            plane_list.append((length, start, own))
+            plane_ranks.update(range(start, start + length))
+        plane_list.sort(key=lambda plane: (plane[0], len(plane[2])))
+
+        singles = [rank_index for rank_index in range(13) if counts[rank_index] == 1 and rank_index not in plane_ranks]
+        pairs = [rank_index for rank_index in range(13) if counts[rank_index] == 2]
+        triples = [rank_index for rank_index in range(13) if counts[rank_index] == 3]
+        quads = [rank_index for rank_index in range(13) if counts[rank_index] == 4]
+        splits = quads[:splits_count]
+        for rank_index in quads[splits_count:splits_count + triple_splits]:
+            triples.append(rank_index)
+            singles.append(rank_index)
+        quads = quads[splits_count + triple_splits:]
+        for rank_index in triples[:pair_splits]:
+            pairs.append(rank_index)
+            singles.append(rank_index)
+        triples = triples[pair_splits:]
+        for rank_index in pairs[:single_splits]:
+            singles += [rank_index, rank_index]
+        pairs = pairs[single_splits:]
+        jokers = [rank_index for rank_index in (13, 14) if counts[rank_index]]
+        if rocket:
+            plays.append(make_signature({13: 1, 14: 1}))
+        else:
+            singles += jokers
+
+        def take(items, count):
+            taken = items[:count]
+            del items[:count]
+            return taken
+
+        def make(count_map, rank_list, count):
+            for rank_index in rank_list:
+                count_map[rank_index] = count_map.get(rank_index, 0) + count
+            return count_map
+
+        while True:
+            state = (tuple((length, len(own)) for length, start, own in plane_list), len(quads), len(triples), len(pairs),
+                     len(splits), len(singles))
+            kickers = HandDecomposer.__matches[state][1]
+            if plane_list:
+                length, start, own = plane_list.pop(0)
+                single_count, from_pairs, from_splits, whole, extra, with_pairs = kickers
+                count_map = {rank_index: 3 for rank_index in range(start, start + length)}
+                chosen = []
+                for rest_length, rest_start, rest_own in plane_list:
+                    chosen += take(rest_own, single_count - len(chosen))
+                chosen += take(singles, single_count - len(chosen))
+                make(count_map, chosen, 1)
+                make(count_map, take(pairs, from_pairs), 2)
+                make(count_map, take(splits, whole), 4)
+                halves = take(splits, from_splits)
+                make(count_map, halves, 2)
+                pairs += halves
+                make(count_map, take(triples, extra), 3)
+                singles += own
+                plays.append(make_signature(count_map))
+            elif quads:
+                single_count, from_pairs, from_splits = kickers
+                count_map = {quads.pop(0): 4}
+                make(count_map, take(singles, single_count), 1)
+                make(count_map, take(pairs, from_pairs), 2)
+                halves = take(splits, from_splits)
+                make(count_map, halves, 2)
+                pairs += halves
+                plays.append(make_signature(count_map))
+            else:
+                pieces = [(rank_index, 1) for rank_index in singles] + [(rank_index, 2) for rank_index in pairs] + \
+                         [(rank_index, 2) for rank_index in splits for i in range(2)]
+                kicked = min(len(triples), len(pieces))
+                for rank_index, (piece_rank, piece_count) in zip(triples, pieces):
+                    plays.append(make_signature(make({rank_index: 3}, [piece_rank], piece_count)))
+                for i in range(kicked, len(triples), 2):
+                    plays.append(make_signature(make({}, triples[i:i + 2], 3)))
+                for piece_rank, piece_count in pieces[kicked:]:
+                    plays.append(piece_count << piece_rank * SIGNATURE_BITS)
+                return plays
+
+    # 完整搜索：最小的点数一定在某一次出牌中，依次尝试包含这个点数的每一种出牌，返回出牌签名的列表
+    @staticmethod
+    def __exhaustive(signature, table):
+        if signature == 0:
+            return []
+        plays = table.get(signature)
+        if plays is not None:
+            return plays
+
+        lowest = HandDecomposer.__lowest(signature)
+        counts = [signature >> rank_index * SIGNATURE_BITS & 31 for rank_index in range(RANK_COUNT)]
+        for play, card_type, power in PlayTable.generate_count_moves(counts):
+            if play >> lowest * SIGNATURE_BITS & 31:
+                rest = HandDecomposer.__exhaustive(signature - play, table)
+                if plays is None or len(rest) + 1 < len(plays):
+                    plays = [play] + rest
+        table[signature] = plays
+        return plays
+
+
+HandDecomposer.init()
+
+
+# 测试
+def test():
+    assert len(Card.get_all()) == 54 and len(set(Card.get_all())) == 54
+    assert Card("10", "♥") is Card.parse("♥10") is Card.from_id(CARD_IDS["♥10"])
+    assert Card("大王") is Card("大王", "") and Card("大王").get_power() == 100
+    assert str(Card.from_id(0)) == "◆3" and Card.from_id(0).get_rank() == "3" and Card.from_id(0).get_suit() == "◆"
+
+    # 排序与原来按（权值, 花色字符）排序一致
+    cards = list(Card.get_all())
+    assert sorted(cards, key=lambda card: (card.get_power(), card.get_suit())) == sorted(reversed(cards))
+
+    for name in ["3", "♥1", "♥小王", ""]:
+        try:
+            Card.parse(name)
+        except ValueError as ex:
+            pass
+        else:
+            assert False, "无效牌未通过"
+
+    assert [Card.from_id(card_id).get_rank_index() for card_id in (0, 3, 4, 51, 52, 53)] == [0, 0, 1, 12, 13, 14]
+
+    # 手牌
+    hand = Hand([Card.parse(name) for name in ["◆3", "♥3", "♠5", "♥2", "大王"]])
+    assert len(hand) == 5 and Card.parse("♥3") in hand and Card.parse("♣3") not in hand
+    assert hand.get_names() == ["大王", "♥2", "♠5", "♥3", "◆3"] and str(hand) == "大王 ♥2 ♠5 ♥3 ◆3"
+    assert hand.get_cards() == sorted(hand.get_cards(), reverse=True) and hand.get_smallest() is Card.parse("◆3")
+    assert hand.get_count(0) == 2 and hand.get_count(14) == 1 and sum(hand.get_counts()) == 5
+    assert hand.get_rank_cards(0) == [Card.parse("♥3"), Card.parse("◆3")] and hand.get_rank_cards(14) == [Card.parse("大王")]
+    assert hand.has_cards([Card.parse("◆3"), Card.parse("大王")]) and not hand.has_cards([Card.parse("◆3")] * 2)
+    for cards in [[Card.parse("♣3")], [Card.parse("◆3"), Card.parse("◆3")]]:
+        try:
+            hand.remove_cards(cards)
+        except ValueError as ex:
+            pass
+        else:
+            assert False, "移除了没有的牌"
+    assert len(hand) == 5
+    hand.remove_cards([Card.parse("♥3"), Card.parse("大王")])
+    assert hand.get_names() == ["♥2", "♠5", "◆3"] and hand.get_count(0) == 1 and hand.get_count(14) == 0
+    assert hand.get_signature() == make_signature({0: 1, 2: 1, 12: 1})
+    hand.clear()
+    assert len(hand) == 0 and hand.get_mask() == 0 and hand.get_smallest() is None and hand.get_names() == []
+
+    # 牌型表
+    def classify(names):
+        return PlayTable.classify_cards([Card.parse(name) for name in names])
+
+    assert classify(["♥3", "♠3"]) == (CARD_ORDER_TYPE['一对'], 3) and classify(["♥3", "♠4"]) is None
+    assert classify(["小王", "大王"]) == (CARD_ORDER_TYPE['王炸'], 100) and classify(["♥2", "小王"]) is None
+    assert classify(["♥10", "♥J", "♥Q", "♥K", "♥A"]) == (CARD_ORDER_TYPE['顺子'], 10)
+    assert classify(["♥J", "♥Q", "♥K", "♥A", "♥2"]) is None
+    assert classify(["♥3", "♠3", "◆3", "♥4", "♠4", "◆4", "♥5", "大王"]) == (CARD_ORDER_TYPE['飞机'], 3)
+    # 特别的飞机：一个三张当做带的牌，其余三张必须连续
+    assert classify(["♥3", "♠3", "◆3", "♥4", "♠4", "◆4", "♥5", "♠5", "◆5", "♥6", "♠6", "◆6"]) == (CARD_ORDER_TYPE['飞机'], 4)
+    assert classify(["♥3", "♠3", "◆3", "♥5", "♠5", "◆5", "♥7", "♠7", "◆7", "♥9", "♠9", "◆9"]) is None
+    assert classify(["♥3"] * 21) is None
+
+    # 出牌生成：与穷举手牌中所有点数组合再查表的结果一致
+    import random
+    rng = random.Random(1)
+
+    def sub_signatures(counts, rank_index=0):
+        if rank_index == RANK_COUNT:
+            yield 0
+            return
+        for signature in sub_signatures(counts, rank_index + 1):
+            for count in range(counts[rank_index] + 1):
+                yield signature + (count << rank_index * SIGNATURE_BITS)
+
+    for i in range(20):
+        hand = Hand(rng.sample(Card.get_all(), 14))
+        moves = {signature: (card_type, power) for signature, card_type, power in PlayTable.generate_moves(hand)}
+        expected = {signature: PlayTable.classify(signature) for signature in sub_signatures(hand.get_counts())
+                    if PlayTable.classify(signature) is not None}
+        assert moves == expected
+        for signature, card_type, power in PlayTable.generate_moves(hand):
+            cards = hand.pick_cards(signature)
+            assert hand.has_cards(cards) and PlayTable.classify_cards(cards) == (card_type, power)
+
+        last_signature = rng.choice(list(PlayTable.get_all().keys()))
+        last_type, last_power = PlayTable.classify(last_signature)
+        last = (last_type, last_power, get_signature_size(last_signature))
+        beats = {signature for signature, card_type, power in PlayTable.generate_moves(hand, last)}
+        assert beats == {signature for signature, (card_type, power) in expected.items()
+                         if PlayTable.beats(card_type, power, get_signature_size(signature), last)}
+
+    hand = Hand([Card.parse(name) for name in ["♥3", "◆3", "♠3", "♥4", "♠4", "◆4", "♣4", "小王", "大王"]])
+    assert hand.pick_cards(make_signature({0: 2, 1: 1})) == [Card.parse("◆3"), Card.parse("♠3"), Card.parse("◆4")]
+    moves = {card_type.name for signature, card_type, power in
+             PlayTable.generate_moves(hand, (CARD_ORDER_TYPE['炸弹'], 3, 4))}
+    assert moves == {'炸弹', '王炸'}
+    moves = {card_type.name for signature, card_type, power in
+             PlayTable.generate_moves(hand, (CARD_ORDER_TYPE['王炸'], 100, 2))}
+    assert moves == {'炸弹', '王炸'}
+
+    # 压制表：与原来 Play.compare_last 逐条判断的规则对照，每个合法出牌都属于一个类别
+    def reference_beats(play, last):
+        if play[0] == CARD_ORDER_TYPE['王炸']:
+            return True
+        if play[0] == CARD_ORDER_TYPE['炸弹']:
+            return last[0] != CARD_ORDER_TYPE['炸弹'] or play[1] > last[1]
+        return play[0] == last[0] and play[1] > last[1] and (play[0] not in PlayDominance.RUN_TYPES or play[2] == last[2])
+
+    plays = [PlayDominance.get_play(class_id) for class_id in range(PlayDominance.get_size())]
+    assert len(set(plays)) == len(plays)
+    assert {PlayTable.get_class(signature) for signature in PlayTable.get_all()} == set(range(len(plays)))
+    for signature, (card_type, power) in PlayTable.get_all().items():
+        assert PlayDominance.get_play(PlayTable.get_class(signature)) == (card_type, power, get_signature_size(signature))
+    for last_id, last in enumerate(plays):
+        beaters = [class_id for class_id, play in enumerate(plays) if reference_beats(play, last)]
+        assert sorted(PlayDominance.get_beaters(last_id)) == beaters
+        assert all(PlayDominance.beats(class_id, last_id) == (class_id in beaters) for class_id in range(len(plays)))
+        assert PlayDominance.get_beater_types(last_id) == {plays[class_id][0].name for class_id in beaters}
+        # 提示顺序：同类型的按权值从小到大，然后是炸弹，最后是王炸
+        order = [plays[class_id] for class_id in PlayDominance.get_beaters(last_id)]
+        ranks = {CARD_ORDER_TYPE['炸弹']: 1, CARD_ORDER_TYPE['王炸']: 2}
+        assert order == sorted(order, key=lambda play: (ranks.get(play[0], 0), play[1]))
+    rocket_id = PlayDominance.get_class(CARD_ORDER_TYPE['王炸'], 100, 2)
+    bomb_id = PlayDominance.get_class(CARD_ORDER_TYPE['炸弹'], 20, 4)
+    assert PlayDominance.beats(rocket_id, bomb_id) and PlayDominance.beats(bomb_id, rocket_id)
+    assert PlayTable.beats(CARD_ORDER_TYPE['炸弹'], 3, 4, (CARD_ORDER_TYPE['王炸'], 100, 2))
+    assert PlayDominance.get_class(CARD_ORDER_TYPE['一张'], 0, 1) is None and not PlayDominance.beats(None, bomb_id)
+
+    # 发牌：相同种子的发牌相同，每次发出全部 54 张不重复的牌
+    hands, remain = Deck(random.Random(7)).deal()
+    assert [len(cards) for cards in hands] == [17, 17, 17] and len(remain) == 3
+    assert set(sum(hands, remain)) == set(Card.get_all())
+    assert Deck(random.Random(7)).deal() == (hands, remain)
+    deck = Deck(random.Random(7))
+    assert deck.deal() == (hands, remain) and deck.deal() != (hands, remain)
+    hands, remain = deck.deal_hands()
+    assert sum(hand.get_mask() for hand in hands) + Hand(remain).get_mask() == (1 << 54) - 1
+    hand = Hand([Card.parse("♥3")])
+    try:
+        hand.add_cards([Card.parse("♠3"), Card.parse("♥3")])
+    except ValueError as ex:
+        assert len(hand) == 1 and hand.get_count(0) == 1
+    else:
+        assert False, "添加了重复的牌"
+
+    # 掩码的牌型签名
+    for i in range(100):
+        hand = Hand(rng.sample(Card.get_all(), rng.randint(0, 54)))
+        assert get_mask_signature(hand.get_mask()) == hand.get_signature()
+
+    # 出牌索引：出牌后增量更新的结果与重新生成一致
+    for i in range(20):
+        hand = Hand(rng.sample(Card.get_all(), 20))
+        move_index = MoveIndex(hand)
+        while len(hand) > 0:
+            expected = set(PlayTable.generate_moves(hand))
+            assert set(move_index.get_moves()) == expected and len(move_index) == len(expected)
+            last_signature = rng.choice(list(PlayTable.get_all().keys()))
+            last_type, last_power = PlayTable.classify(last_signature)
+            last = (last_type, last_power, get_signature_size(last_signature))
+            assert sorted(move_index.get_moves(last)) == sorted(PlayTable.generate_moves(hand, last))
+
+            cards = hand.pick_cards(rng.choice(list(expected))[0])
+            hand.remove_cards(cards)
+            move_index.remove_cards(cards)
+
+    # 提示：从最小的牌开始依次提示更大的牌，全部提示过后从头开始
+    hand = Hand([Card.parse(name) for name in ["♥3", "♥5", "♠5", "♥9", "♠9", "◆9", "♣9", "♥K"]])
+    move_index = MoveIndex(hand)
+    last = (CARD_ORDER_TYPE['一对'], 4, 2)
+    hints = [move_index.next_hint(last, 1) for i in range(4)]
+    assert [(card_type.name, power) for signature, card_type, power in hints] == \
+           [('一对', 5), ('一对', 9), ('炸弹', 9), ('一对', 5)]
+    assert move_index.next_hint(last, 2)[2] == 5 and move_index.next_hint(last, 2)[2] == 9
+    assert move_index.next_hint(None, 3)[1:] == (CARD_ORDER_TYPE['一张'], 3)
+    hand.remove_cards([Card.parse("♥9")])
+    move_index.remove_cards([Card.parse("♥9")])
+    assert [hint[1:] for hint in move_index.get_moves(last)] == [(CARD_ORDER_TYPE['一对'], 5), (CARD_ORDER_TYPE['一对'], 9)]
+    assert move_index.next_hint((CARD_ORDER_TYPE['王炸'], 100, 2), 4) is None
+
+    # 手牌拆分：出牌次数最少，每次出牌都合法，合起来正好是这手牌
+    def decompose_names(names):
+        return HandDecomposer.decompose(Hand([Card.parse(name) for name in names]).get_signature())
+
+    assert HandDecomposer.decompose(0) == ()
+    assert len(decompose_names(["♥3", "♥4", "♥5", "♥6", "♥7", "♠9", "♥9"])) == 2
+    assert len(decompose_names(["♥3", "♠3", "◆3", "♥4", "♠4", "◆4", "♥9", "♥K"])) == 1  # 飞机
+    assert len(decompose_names(["♥4", "♠4", "◆4", "♣4", "♥7", "♠7", "◆7", "♣7", "♥J", "♠J", "◆J", "♣J"])) == 2  # 四带两对、四带二
+    assert len(decompose_names(["小王", "大王", "♥2", "♥3"])) == 3
+    assert len(decompose_names(["小王", "大王", "♥3", "♠3", "◆3", "♥4", "♠4", "◆4"])) == 1  # 大小王作为飞机的带牌
+
+    # 与逐个出牌的完整搜索对照（手牌中多放三张、四张和连续的点数）
+    reference_table = {}
+
+    def reference(signature):
+        if signature not in reference_table:
+            counts = [signature >> rank_index * SIGNATURE_BITS & 31 for rank_index in range(RANK_COUNT)]
+            lowest = min(rank_index for rank_index in range(RANK_COUNT) if counts[rank_index])
+            reference_table[signature] = min(reference(signature - play) + 1 for play, card_type, power in
+                                             PlayTable.generate_count_moves(counts) if play >> lowest * SIGNATURE_BITS & 31)
+        return reference_table[signature]
+
+    reference_table[0] = 0
+    for i in range(300):
+        start = rng.randint(0, 9)
+        rank_list = list(range(start, start + rng.randint(2, 5))) + rng.sample(range(RANK_COUNT), 2)
+        counts = [0] * RANK_COUNT
+        for j in range(rng.randint(1, 12)):
+            rank_index = rng.choice(rank_list)
+            counts[rank_index] = min(counts[rank_index] + 1, RANK_LIMITS[rank_index])
+        signature = make_signature(dict(enumerate(counts)))
+        plays = HandDecomposer.decompose(signature)
+        assert sum(plays) == signature and all(PlayTable.classify(play) is not None for play in plays)
+        assert len(plays) == reference(signature) == HandDecomposer.count(signature)
+
+    # 地主的 20 张牌
+    deck = Deck(rng)
+    for i in range(200):
+        hands, bottom = deck.deal_hands()
+        hands[0].add_cards(bottom)
+        plays = HandDecomposer.decompose(hands[0].get_signature())
+        assert sum(plays) == hands[0].get_signature() and all(PlayTable.classify(play) is not None for play in plays)
+    assert HandDecomposer.get_fallbacks() == 0
+
+    # LRU 缓存：超过大小时删除最久没有用到的
+    max_cache_size = HandDecomposer.MAX_CACHE_SIZE
+    HandDecomposer.MAX_CACHE_SIZE = 2
+    try:
+        signatures = [make_signature({rank_index: 1}) for rank_index in range(3)]
+        for signature in signatures + signatures[:1]:
+            HandDecomposer.decompose(signature)
+        HandDecomposer.decompose(make_signature({5: 2}))
+        assert HandDecomposer.get_cache_size() == 2 and HandDecomposer.is_cached(signatures[0])
+        assert not HandDecomposer.is_cached(signatures[1])
+    finally:
+        HandDecomposer.MAX_CACHE_SIZE = max_cache_size
+
+    try:
+        Card.from_id(0).__power = 1
+    except AttributeError as ex:
+        pass
+    else:
+        assert False, "牌被修改"
+
+
+if __name__ == '__main__':
+    test()
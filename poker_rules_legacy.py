@@ -0,0 +1,480 @@
+# 原来逐条判断的出牌规则（服务器端的 check_card_type 和客户端的 get_cards_type，保持原样）
+# 只用于验证 poker_rules 的牌型表与原来的规则一致（python poker_benchmark.py classify --verify）以及性能对比
+# 与原来唯一的区别：找不到有效权值时抛出 ValueError（原来抛出 MyException）
+
+from poker_rules import Card, CARD_ORDER_TYPE
+
+
+class LegacyCardOrder:
+    CARD_ORDER_TYPE = CARD_ORDER_TYPE
+
+    @staticmethod
+    def make_card_list(card_str_list):
+        return [Card.parse(card_str) for card_str in card_str_list]
+
+    # 检查扑克牌类型
+    # 返回值为:(result类型是否正确,power权值)
+    @staticmethod
+    def check_card_type(cards, cards_type):
+
+        result = False
+        power = 0
+
+        cards.sort()
+
+        # 统计数量
+        card_count_map = {}
+        power_list = []
+        for item in cards:
+            item_power = item.get_power()
+            if item_power not in card_count_map.keys():
+                card_count_map[item_power] = 0
+            card_count_map[item_power] += 1
+        power_list = tuple(card_count_map.keys())
+
+        # 数量列表
+        count_list = []
+        # 每个数量对应牌的列表
+        count_card_map = {}
+        for item_power in card_count_map.keys():
+            count = card_count_map[item_power]
+            if count not in count_card_map.keys():
+                count_card_map[count] = []
+            count_card_map[count].append(item_power)
+        count_list = tuple(count_card_map.keys())
+
+        # 判断是否为一张
+        if cards_type == LegacyCardOrder.CARD_ORDER_TYPE['一张']:
+            result = len(cards) == 1
+            power = cards[0].get_power()
+
+        # 判断是否为一对
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['一对']:
+            # 1. 计数只有1种
+            # 2. 有数量为2个的牌
+            # 3. 数量为2个的牌有1种
+            result = len(count_card_map) == 1 \
+                     and 2 in count_list \
+                     and len(count_card_map[2]) == 1
+            power = cards[0].get_power()
+
+        # 判断是否为三张
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['三张']:
+            # 1. 计数只有1种
+            # 2. 有数量为3个的牌
+            # 3. 数量为3个的牌有1种
+            result = len(count_card_map) == 1 \
+                     and 3 in count_list \
+                     and len(count_card_map[3]) == 1
+            power = cards[0].get_power()
+
+        # 判断是否为双三张
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['双三张']:
+            # 1. 计数只有1种
+            # 2. 有数量为3个的牌
+            # 3. 数量为3个的牌有2种
+            result = len(count_card_map) == 1 \
+                     and 3 in count_list \
+                     and len(count_card_map[3]) == 2
+            power = cards[0].get_power()
+
+        # 判断是否为三带一
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['三带一']:
+            # 1. 计数只有2种
+            # 2. 有数量为3个的牌
+            # 3. 有数量为1个的牌
+            # 4. 数量为3个的牌有1种
+            # 5. 数量为1个的牌有1种
+            result = len(count_card_map) == 2 \
+                     and 3 in count_list \
+                     and 1 in count_list \
+                     and len(count_card_map[3]) == 1 \
+                     and len(count_card_map[1]) == 1
+            power = count_card_map[3][0]
+
+        # 判断是否为三带二
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['三带二']:
+            # 1. 计数只有2种
+            # 2. 有数量为3个的牌
+            # 3. 有数量为2个的牌
+            # 4. 数量为3个的牌有1种
+            # 5. 数量为2个的牌有1种
+            result = len(count_card_map) == 2 \
+                     and 3 in count_list \
+                     and 2 in count_list \
+                     and len(count_card_map[3]) == 1 \
+                     and len(count_card_map[2]) == 1
+            power = count_card_map[3][0]
+
+        # 判断是否为四带一
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['四带一']:
+            # 1. 计数只有2种
+            # 2. 有数量为4个的牌
+            # 3. 有数量为1个的牌
+            # 4. 数量为4个的牌有1种
+            # 5. 数量为1个的牌有1种
+            result = len(count_card_map) == 2 \
+                     and 4 in count_list \
+                     and 1 in count_list \
+                     and len(count_card_map[4]) == 1 \
+                     and len(count_card_map[1]) == 1
+            power = count_card_map[4][0]
+
+        # 判断是否为四带二
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['四带二']:
+            # 1. 有数量为4个的牌
+            # 2. 数量为4个的牌有1种
+            # 3. 其他牌数量为2
+            result = 4 in count_list \
+                     and len(count_card_map[4]) == 1 \
+                     and len(cards) - 4 == 2
+            power = count_card_map[4][0]
+
+        # 判断是否为四带两对
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['四带两对']:
+            # 1. 计数只有2种
+            # 2. 有数量为4个的牌
+            # 3. 有数量为2个的牌
+            # 4. 数量为4个的牌有1种
+            # 5. 数量为2个的牌有2种
+            result = len(count_card_map) == 2 \
+                     and 4 in count_list \
+                     and 2 in count_list \
+                     and len(count_card_map[4]) == 1 \
+                     and len(count_card_map[2]) == 2
+            power = count_card_map[4][0]
+
+        # 判断是否为顺子
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['顺子']:
+            # 1. 计数只有1种
+            # 2. 有数量为1个的牌
+            # 3. 数量为1个的牌大于等于5种
+            result = len(count_card_map) == 1 \
+                     and 1 in count_list \
+                     and len(count_card_map[1]) >= 5 \
+                     and LegacyCardOrder.__is_continuous(count_card_map[1])
+            power = min(count_card_map[1])  # 取最小值为权值
+
+        # 判断是否为连对
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['连对']:
+            # 1. 计数只有1种
+            # 2. 有数量为2个的牌
+            # 3. 数量为2个的牌大于等于3种
+            # 4. 数量为2个的牌连续
+            result = len(count_card_map) == 1 \
+                     and 2 in count_list \
+                     and len(count_card_map[2]) >= 3 \
+                     and LegacyCardOrder.__is_continuous(count_card_map[2])
+            power = min(count_card_map[2])  # 取最小值为权值
+
+        # 判断是否为飞机
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['飞机']:
+            # 1. 有数量为3个的牌
+            # 2. 数量为3个的牌大于等于2
+            # 3. 牌数为3的牌种类数量 等于 其他牌数量
+            # 4. 数量为3个的牌连续
+            result = 3 in count_list \
+                     and len(count_card_map[3]) >= 2 \
+                     and len(count_card_map[3]) == len(cards) - len(count_card_map[3]) * 3 \
+                     and LegacyCardOrder.__is_continuous(count_card_map[3])
+            power = min(count_card_map[3])  # 取最小值为权值
+
+            # 特判特别的飞机（比如三个飞机带三个相同的牌）
+            if not result:
+                # 1. 有数量为3个的牌
+                # 2. 数量为3个的牌大于等于3
+                # 3. 牌数为3的牌种类数量-1 等于 其他牌数量+3
+                # 4. 数量为3个的牌连续 有【牌数为3的牌种类数量-1】个连续的
+                result = 3 in count_list \
+                         and len(count_card_map[3]) >= 3 \
+                         and len(count_card_map[3]) - 1 == len(cards) - len(count_card_map[3]) * 3 + 3
+                count_card_map[3].sort()
+                # 优先取最小的牌当做 带的牌
+                if LegacyCardOrder.__is_continuous(count_card_map[3][1:]):
+                    power = min(count_card_map[3][1:])  # 取最小值为权值
+                elif LegacyCardOrder.__is_continuous(count_card_map[3][:-1]):
+                    power = min(count_card_map[3][:-1])  # 取最小值为权值
+                else:
+                    raise ValueError("未找到有效权值")
+
+        # 判断是否为飞机带对子
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['飞机带对子']:
+            # 1. 计数只有2种
+            # 2. 有数量为3个的牌
+            # 3. 有数量为2个的牌
+            # 4. 数量为3个的牌大于等于2
+            # 5. 牌数为2的牌种类数量 等于 牌数为3的牌种类数量
+            # 6. 数量为3个的牌连续
+            result = len(count_card_map) == 2 \
+                     and 3 in count_list \
+                     and 2 in count_list \
+                     and len(count_card_map[3]) >= 2 \
+                     and len(count_card_map[2]) == len(count_card_map[3]) \
+                     and LegacyCardOrder.__is_continuous(count_card_map[3])
+            power = min(count_card_map[3])
+
+            #  特判特别的飞机带对子（比如两个飞机带四个相同的牌）
+            if not result:
+                # 1. 有数量为3个的牌
+                # 2. 只能有牌为3张、2张、4张的（所以只判断没有数量为1的牌）
+                # 3. 数量为3个的牌大于等于2
+                # 4. 除【数量为3个的牌】其他牌数量/2 等于 牌数为3的牌种类数量
+                # 5. 数量为3个的牌连续
+                result = 3 in count_list \
+                         and 1 not in count_list \
+                         and len(count_card_map[3]) >= 2 \
+                         and (len(cards) - len(count_card_map[3]) * 3) / 2 == len(count_card_map[3]) \
+                         and LegacyCardOrder.__is_continuous(count_card_map[3])
+                power = min(count_card_map[3])
+
+        # 判断是否为炸弹
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['炸弹']:
+            # 1. 计数只有1种
+            # 2. 有数量为4个的牌
+            # 3. 数量为4个的牌有1种
+            result = len(count_card_map) == 1 \
+                     and 4 in count_list \
+                     and len(count_card_map[4]) == 1
+            power = cards[0].get_power()
+
+        # 判断为王炸
+        elif cards_type == LegacyCardOrder.CARD_ORDER_TYPE['王炸']:
+            # 1. 计数只有1种
+            # 2. 有数量为1个的牌
+            # 3. 数量为1个的牌有2种
+            # 4. 大王在其中
+            # 5. 小王在其中
+            result = len(count_card_map) == 1 \
+                     and 1 in count_list \
+                     and len(count_card_map[1]) == 2 \
+                     and Card('大王', '').get_power() in count_card_map[1] \
+                     and Card('小王', '').get_power() in count_card_map[1]
+            power = Card('大王', '').get_power()
+        return result, power
+
+    @staticmethod
+    # 获取出牌类型
+    # 返回值为 出牌类型
+    # 如果返回值为-1 则出牌不符合规则
+    def get_cards_type(card_str_list):
+
+        # 通过卡片字符串列表 生成 卡片对象列表
+        cards = LegacyCardOrder.make_card_list(card_str_list)
+
+        cards.sort()
+
+        # 判断是否为一张
+        if len(cards) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['一张'].value
+
+        # 统计数量
+        card_count_map = {}
+        power_list = []
+        for item in cards:
+            power = item.get_power()
+            if power not in card_count_map.keys():
+                card_count_map[power] = 0
+            card_count_map[power] += 1
+        power_list = tuple(card_count_map.keys())
+
+        # 数量列表
+        count_list = []
+        # 每个数量对应牌的列表
+        count_card_map = {}
+        for power in card_count_map.keys():
+            count = card_count_map[power]
+            if count not in count_card_map.keys():
+                count_card_map[count] = []
+            count_card_map[count].append(power)
+        count_list = tuple(count_card_map.keys())
+
+        # 判断是否为一对
+        # 1. 计数只有1种
+        # 2. 有数量为2个的牌
+        # 3. 数量为2个的牌有1种
+        if len(count_card_map) == 1 \
+                and 2 in count_list \
+                and len(count_card_map[2]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['一对'].value
+
+        # 判断是否为三张
+        # 1. 计数只有1种
+        # 2. 有数量为3个的牌
+        # 3. 数量为3个的牌有1种
+        if len(count_card_map) == 1 \
+                and 3 in count_list \
+                and len(count_card_map[3]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['三张'].value
+
+        # 判断是否为双三张
+        # 1. 计数只有1种
+        # 2. 有数量为3个的牌
+        # 3. 数量为3个的牌有2种
+        if len(count_card_map) == 1 \
+                and 3 in count_list \
+                and len(count_card_map[3]) == 2:
+            return LegacyCardOrder.CARD_ORDER_TYPE['双三张'].value
+
+        # 判断是否为三带一
+        # 1. 计数只有2种
+        # 2. 有数量为3个的牌
+        # 3. 有数量为1个的牌
+        # 4. 数量为3个的牌有1种
+        # 5. 数量为1个的牌有1种
+        if len(count_card_map) == 2 \
+                and 3 in count_list \
+                and 1 in count_list \
+                and len(count_card_map[3]) == 1 \
+                and len(count_card_map[1]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['三带一'].value
+
+        # 判断是否为三带二
+        # 1. 计数只有2种
+        # 2. 有数量为3个的牌
+        # 3. 有数量为2个的牌
+        # 4. 数量为3个的牌有1种
+        # 5. 数量为2个的牌有1种
+        if len(count_card_map) == 2 \
+                and 3 in count_list \
+                and 2 in count_list \
+                and len(count_card_map[3]) == 1 \
+                and len(count_card_map[2]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['三带二'].value
+
+        # 判断是否为四带一
+        # 1. 计数只有2种
+        # 2. 有数量为4个的牌
+        # 3. 有数量为1个的牌
+        # 4. 数量为4个的牌有1种
+        # 5. 数量为1个的牌有1种
+        if len(count_card_map) == 2 \
+                and 4 in count_list \
+                and 1 in count_list \
+                and len(count_card_map[4]) == 1 \
+                and len(count_card_map[1]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['四带一'].value
+
+        # 判断是否为四带二
+        # 1. 有数量为4个的牌
+        # 2. 数量为4个的牌有1种
+        # 3. 其他牌数量为2
+        if 4 in count_list \
+                and len(count_card_map[4]) == 1 \
+                and len(cards) - 4 == 2:
+            return LegacyCardOrder.CARD_ORDER_TYPE['四带二'].value
+
+        # 判断是否为四带两对
+        # 1. 计数只有2种
+        # 2. 有数量为4个的牌
+        # 3. 有数量为2个的牌
+        # 4. 数量为4个的牌有1种
+        # 5. 数量为2个的牌有2种
+        if len(count_card_map) == 2 \
+                and 4 in count_list \
+                and 2 in count_list \
+                and len(count_card_map[4]) == 1 \
+                and len(count_card_map[2]) == 2:
+            return LegacyCardOrder.CARD_ORDER_TYPE['四带两对'].value
+
+        # 判断是否为顺子
+        # 1. 计数只有1种
+        # 2. 有数量为1个的牌
+        # 5. 数量为1个的牌大于等于5种
+        if len(count_card_map) == 1 \
+                and 1 in count_list \
+                and len(count_card_map[1]) >= 5 \
+                and LegacyCardOrder.__is_continuous(count_card_map[1]):
+            return LegacyCardOrder.CARD_ORDER_TYPE['顺子'].value
+
+        # 判断是否为连对
+        # 1. 计数只有1种
+        # 2. 有数量为2个的牌
+        # 3. 数量为2个的牌大于等于3种
+        # 4. 数量为2个的牌连续
+        if len(count_card_map) == 1 \
+                and 2 in count_list \
+                and len(count_card_map[2]) >= 3 \
+                and LegacyCardOrder.__is_continuous(count_card_map[2]):
+            return LegacyCardOrder.CARD_ORDER_TYPE['连对'].value
+
+        # 判断是否为飞机
+        # 1. 有数量为3个的牌
+        # 2. 数量为3个的牌大于等于2
+        # 3. 牌数为3的牌种类数量 等于 其他牌数量
+        # 4. 数量为3个的牌连续
+        if 3 in count_list \
+                and len(count_card_map[3]) >= 2 \
+                and len(count_card_map[3]) == len(cards) - len(count_card_map[3]) * 3 \
+                and LegacyCardOrder.__is_continuous(count_card_map[3]):
+            return LegacyCardOrder.CARD_ORDER_TYPE['飞机'].value
+
+        # 特判特别的飞机（比如三个飞机带三个相同的牌）
+        # 1. 有数量为3个的牌
+        # 2. 数量为3个的牌大于等于3
+        # 3. 牌数为3的牌种类数量-1 等于 其他牌数量+3
+        # 4. 数量为3个的牌连续 有【牌数为3的牌种类数量-1】个连续的
+        if 3 in count_list \
+                and len(count_card_map[3]) >= 3 \
+                and len(count_card_map[3]) - 1 == len(cards) - len(count_card_map[3]) * 3 + 3:
+            return LegacyCardOrder.CARD_ORDER_TYPE['飞机'].value
+
+        # 判断是否为飞机带对子
+        # 1. 计数只有2种
+        # 2. 有数量为3个的牌
+        # 3. 有数量为2个的牌
+        # 4. 数量为3个的牌大于等于2
+        # 5. 牌数为2的牌种类数量 等于 牌数为3的牌种类数量
+        # 6. 数量为3个的牌连续
+        if len(count_card_map) == 2 \
+                and 3 in count_list \
+                and 2 in count_list \
+                and len(count_card_map[3]) >= 2 \
+                and len(count_card_map[2]) == len(count_card_map[3]) \
+                and LegacyCardOrder.__is_continuous(count_card_map[3]):
+            return LegacyCardOrder.CARD_ORDER_TYPE['飞机带对子'].value
+
+        #  特判特别的飞机带对子（比如两个飞机带四个相同的牌）
+        # 1. 有数量为3个的牌
+        # 2. 只能有牌为3张、2张、4张的（所以只判断没有数量为1的牌）
+        # 3. 数量为3个的牌大于等于2
+        # 4. 除【数量为3个的牌】其他牌数量/2 等于 牌数为3的牌种类数量
+        # 5. 数量为3个的牌连续
+        if 3 in count_list \
+                and 1 not in count_list \
+                and len(count_card_map[3]) >= 2 \
+                and (len(cards) - len(count_card_map[3]) * 3) / 2 == len(count_card_map[3]) \
+                and LegacyCardOrder.__is_continuous(count_card_map[3]):
+            return LegacyCardOrder.CARD_ORDER_TYPE['飞机带对子'].value
+
+        # 判断是否为炸弹
+        # 1. 计数只有1种
+        # 2. 有数量为4个的牌
+        # 3. 数量为4个的牌有1种
+        if len(count_card_map) == 1 \
+                and 4 in count_list \
+                and len(count_card_map[4]) == 1:
+            return LegacyCardOrder.CARD_ORDER_TYPE['炸弹'].value
+
+        # 判断为王炸
+        # 1. 计数只有1种
+        # 2. 有数量为1个的牌
+        # 3. 数量为1个的牌有2种
+        # 4. 大王在其中
+        # 5. 小王在其中
+        if len(count_card_map) == 1 \
+                and 1 in count_list \
+                and len(count_card_map[1]) == 2 \
+                and Card('大王', '').get_power() in count_card_map[1] \
+                and Card('小王', '').get_power() in count_card_map[1]:
+            return LegacyCardOrder.CARD_ORDER_TYPE['王炸'].value
+
+        return -1
+
+    # 判断数组是否连续
+    @staticmethod
+    def __is_continuous(arr):
+        arr.sort()
+        for i in range(1, len(arr)):
+            if arr[i] != arr[i - 1] + 1:
+                return False
+        return True
@@ -2,8 +2,27 @@ import json
 import random
 import enum
 import socket
-from threading import Thread
+import asyncio
+import argparse
+from threading import Thread, Lock, RLock, current_thread
 import time
+import math
+import select
+import collections
+import contextlib
+import io
+import os
+import zlib
+import multiprocessing
+from multiprocessing import reduction
+from concurrent.futures import ThreadPoolExecutor
+
+from poker_protocol import FrameError, Handshake, JSON_CODEC, BINARY_CODEC, CODECS, CARD_TYPE_NAMES, split_play_command
+from poker_record import GameRecord, RecordWriter, ALL_MASK, replay
+from poker_rules import Card, Deck, Hand, PlayTable, PlayDominance, MoveIndex, CARD_IDS, CARD_ORDER_TYPE, get_mask_signature
+from poker_ai import SearchPlayer, TableView, WinEstimator, estimate_bid
+
+MAX_COMMAND_SIZE = 1024  # 客户端单条指令的最大字节数
 
 
 class PLAY_STATE(enum.Enum):
@@ -38,82 +57,20 @@ class MyException(Exception):
         return str(self.__code) + ":\n" + self.__message
 
 
-# 定义扑克类
-class Card:
-    RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    SUITS = ['♥', '◆', '♣', '♠']
-    POWERS = {'3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14,
-              '2': 20, '小王': 99, '大王': 100}
-
-    def __init__(self, rank, suit):
-
-        if rank not in self.POWERS.keys():
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.WARNING, "无效牌【" + rank + "】")
-
-        self.__rank = rank
-        self.__suit = suit
-        self.__name = suit + rank
-        self.__power = self.POWERS[rank]
-
-    # 重载字符串表示方法
-    def __str__(self):
-        return self.__name
-
-    # 重载运算符实现排序
-    def __lt__(self, other):
-        if self.__power == other.__power:
-            return self.__suit < other.__suit
-
-        return self.__power < other.__power
-
-    def __eq__(self, other):
-        return self.__name == other.__name
-
-    def __hash__(self):
-        return hash(self.__name)
-
-    def get_rank(self):
-        return self.__rank
-
-    def get_power(self):
-        return self.__power
-
-
 # 定义扑克盒类
 class CardBox:
 
     # 构造方法
-    def __init__(self):
-        self.__cards = []
+    # 一局游戏一直使用同一副牌（重新发牌只需要再洗一次），rng 为带种子的随机数生成器时可以复现发牌
+    def __init__(self, rng=None):
+        self.__deck = Deck(rng)
+        self.__cards = []  # 剩余的牌（底牌）
 
-    # 生成牌
-    def create(self):
-        for suit in Card.SUITS:
-            for rank in Card.RANKS:
-                self.__cards.append(Card(rank, suit))
-        self.__cards.append(Card('小王', ''))
-        self.__cards.append(Card('大王', ''))
-        self.shuffle()
-
-    # 洗牌
-    def shuffle(self):
-        random.shuffle(self.__cards)
-
-    # 拿一张牌
-    def get_card(self):
-        if len(self.__cards) == 0:
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ERROR, "程序错误，牌已经发完了")
-
-        top_card = self.__cards[0]
-        self.__cards.remove(top_card)
-        return top_card
-
-    # 发牌，每人默认发17张牌
+    # 洗牌并发牌，每人默认发17张牌（每人一次拿走洗好的牌中连续的一段）
     def deal(self, players, per_cards=17):
-        for rounds in range(per_cards):
-            for player in players:
-                card = self.get_card()
-                player.add_card(card)
+        hands, self.__cards = self.__deck.deal(len(players), per_cards)
+        for player, cards in zip(players, hands):
+            player.add_cards(cards)
 
     # 获取剩余牌（获取底牌）
     def get_remain(self):
@@ -129,52 +86,140 @@ class Message:
                  my_index=None, my_card_list=None,
                  name_list=None, card_count_list=None,
                  last_card_player_index=None, last_card_type=None, last_card_list=None,
-                 remain_card_list=None,
+                 remain_card_list=None, hint_card_list=None,
                  state=None):
         obj = {
             'my_index': my_index, 'name_list': name_list, 'my_card_list': my_card_list,
             'top_message': top_message, 'card_count_list': card_count_list,
             'last_card_player_index': last_card_player_index, 'last_card_type': last_card_type,
             'last_card_list': last_card_list,
-            'remain_card_list': remain_card_list,
+            'remain_card_list': remain_card_list, 'hint_card_list': hint_card_list,
             'state': None
             }
         if state != None:
             obj['state'] = state.value
 
-        data = {}
-        for k, v in obj.items():
-            if v != None:
-                data[k] = v
-
-        self.__data = data
+        self.__data = {k: v for k, v in obj.items() if v is not None}
+        self.__fields = {}  # 编码格式 -> 编码后的字段（第一次获取时编码）
 
     def get_data(self):
         return self.__data
 
+    # 获取编码后的字段（字段名 -> 编码后的字段）
+    def get_fields(self, codec=JSON_CODEC):
+        fields = self.__fields.get(codec)
+        if fields is None:
+            fields = codec.encode_fields(self.__data)
+            self.__fields[codec] = fields
+        return fields
+
+
+# 定时器（由时间轮到期后执行回调）
+class Timer:
+
+    def __init__(self, tick, callback, args):
+        self.__tick = tick
+        self.__callback = callback
+        self.__args = args
+        self.__cancelled = False
+
+    # 到期的格数
+    def get_tick(self):
+        return self.__tick
+
+    def cancel(self):
+        self.__cancelled = True
+
+    def is_cancelled(self):
+        return self.__cancelled
+
+    def run(self):
+        if not self.__cancelled:
+            self.__callback(*self.__args)
+
+
+# 定义时间轮类（哈希时间轮）
+# 服务器只有一个时间轮，负责所有玩家的心跳、叫分和出牌的超时、胜利后的结束等待
+# 时间轮每 tick 秒拨动一格，定时器按到期格数放入对应的槽，拨到该槽时执行已经到期的定时器
+class TimerWheel:
+
+    def __init__(self, tick=0.1, slot_count=512, clock=time.monotonic):
+        self.__tick = tick
+        self.__slots = [[] for i in range(slot_count)]
+        self.__clock = clock
+        self.__start = clock()
+        self.__ticks = 0  # 已经拨过的格数
+        self.__lock = Lock()
+
+    # 当前时间对应的格数
+    def __now_tick(self):
+        return int((self.__clock() - self.__start) / self.__tick + 1e-9)
+
+    # 添加定时器，delay 秒后执行 callback(*args)
+    def schedule(self, delay, callback, *args):
+        with self.__lock:
+            tick = max(self.__now_tick(), self.__ticks) + max(1, math.ceil(delay / self.__tick))
+            timer = Timer(tick, callback, args)
+            self.__slots[tick % len(self.__slots)].append(timer)
+        return timer
+
+    # 把时间轮拨到当前时间，执行所有到期的定时器
+    # 返回值为执行的定时器数量
+    def advance(self):
+        due_list = []
+        with self.__lock:
+            now_tick = self.__now_tick()
+            while self.__ticks < now_tick:
+                self.__ticks += 1
+                slot_index = self.__ticks % len(self.__slots)
+                remain = []
+                for timer in self.__slots[slot_index]:
+                    if timer.is_cancelled():
+                        continue
+                    if timer.get_tick() <= self.__ticks:
+                        due_list.append(timer)
+                    else:
+                        remain.append(timer)  # 还要再转几圈
+                self.__slots[slot_index] = remain
+
+        # 回调可能会再添加定时器，所以在锁外执行
+        for timer in due_list:
+            try:
+                timer.run()
+            except Exception as ex:
+                print(ex)
 
-# 定义玩家类
-class Player:
+        return len(due_list)
+
+    # 线程模式：在一个线程中循环拨动时间轮
+    def run_forever(self):
+        while True:
+            time.sleep(self.__tick)
+            self.advance()
+
+    # 协程模式：在事件循环中循环拨动时间轮
+    async def run_async(self):
+        while True:
+            await asyncio.sleep(self.__tick)
+            self.advance()
+
+
+# 定义座位类
+# 座位只保存玩家名称和手中的牌，不涉及网络连接，因此无网络的对局（测试、模拟）也可以直接使用
+class Seat:
 
     # 构造方法
-    def __init__(self, name, clientsocket, addr, room):
+    def __init__(self, name):
 
         self.__name = name
-        self.__cards = []
-        self.__clientsocket = clientsocket
-        self.__addr = addr
-        self.__room = room
-        self.__th_close = False
-        self.__th = Thread(target=self.while_send)
-        self.__th.start()
+        self.__hand = Hand()
+        self.__move_index = None  # 手牌能出的所有牌（第一次使用时生成，出牌后增量更新，摸牌后重新生成）
 
     # 重载字符串表示方法
     def __str__(self):
         rep = ''
-        if self.__cards:
-            rep = self.__name + ": "
-            for card in self.__cards:
-                rep += str(card) + " "
+        if len(self.__hand) > 0:
+            rep = self.__name + ": " + str(self.__hand)
         else:
             rep = "无牌"
 
@@ -183,50 +228,128 @@ class Player:
     def get_name(self):
         return self.__name
 
+    # 是否为服务器端的机器人
+    def is_bot(self):
+        return False
+
     # 添加一张牌
     def add_card(self, card):
-        self.__cards.append(card)
+        self.__hand.add_card(card)
+        self.__move_index = None
 
     # 添加多张牌
     def add_cards(self, cards):
-        self.__cards.extend(cards)
+        self.__hand.add_cards(cards)
+        self.__move_index = None
 
-    # 整理牌（排序）
+    # 整理牌（手牌始终按从大到小排列，不需要再排序）
     def sort_cards(self):
-        self.__cards.sort(reverse=True)
+        pass
 
     # 移除多张牌
     def remove_cards(self, cards):
-        myCards = self.__cards.copy()
-        for card in cards:
-            if card not in myCards:
-                raise MyException(MyException.EXCEPTION_CODE_TYPE.WARNING, f"你没有足够的【{str(card)}】")
-            myCards.remove(card)
-        self.__cards = myCards
+        try:
+            self.__hand.remove_cards(cards)
+        except ValueError as ex:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.WARNING, str(ex))
+        if self.__move_index is not None:
+            self.__move_index.remove_cards(cards)
+
+    # 手牌（不要直接修改）
+    def get_hand(self):
+        return self.__hand
+
+    # 出牌索引（不要直接修改）
+    def get_move_index(self):
+        if self.__move_index is None:
+            self.__move_index = MoveIndex(self.__hand)
+        return self.__move_index
 
     def get_cards(self):
-        return self.__cards.copy()
+        return self.__hand.get_cards()
+
+    def get_card_count(self):
+        return len(self.__hand)
 
     def clear(self):
-        self.__cards.clear()
+        self.__hand.clear()
+        self.__move_index = None
+
+    def get_card_str_list(self):
+        return self.__hand.get_names()
+
+
+# 定义玩家类（通过网络连接的座位）
+class Player(Seat):
+    HEARTBEAT_INTERVAL = 5  # 心跳间隔秒数
+    SEND_TIMEOUT = 10  # 线程模式下写套接字的超时秒数（客户端一直不读取时断开连接，不会一直阻塞房间线程）
+
+    # 构造方法
+    # frame_reader 为握手之后使用的帧读取对象（其中可能还缓存着握手之后的数据），codec 为握手时协商的编码格式
+    def __init__(self, name, clientsocket, addr, room, frame_reader=None, codec=JSON_CODEC):
+
+        super().__init__(name)
+        self.__clientsocket = clientsocket
+        if clientsocket is not None:
+            clientsocket.settimeout(Player.SEND_TIMEOUT)
+        self.__send_lock = Lock()  # 心跳和游戏消息可能由不同的线程发送，同一个套接字的写入不能交错
+        self.__addr = addr
+        self.__room = room
+        self.__codec = codec
+        self.__frame_reader = frame_reader if frame_reader is not None else codec.create_reader(MAX_COMMAND_SIZE)
+        self.__recipient = codec.encode_recipient(name)  # 编码后的玩家名称，拼接在每个消息体后面
+        self.__th_close = False
+        self.__heartbeat = None
+        self.start_heartbeat()
+
+    def get_room(self):
+        return self.__room
+
+    # 连接是否已经关闭
+    def is_closed(self):
+        return self.__th_close
+
+    # 获取编码后的玩家名称
+    def get_recipient(self):
+        return self.__recipient
+
+    # 获取与客户端协商的编码格式
+    def get_codec(self):
+        return self.__codec
 
     def send(self, code, data):
+        self.send_encoded(self.__codec.encode_message(code, data))
+
+    # 发送已经编码的消息体（广播时同一个消息体发送给每个玩家，只序列化一次）
+    def send_encoded(self, body):
+        self.send_frames([body])
+
+    # 发送多个已经编码的消息体（只写一次套接字）
+    def send_frames(self, bodies):
+        if self.__th_close:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
+
         try:
-            j = json.dumps({'code': code, 'data': data, 'player': self.__name})
-            data = j + "\n"
-            self.__clientsocket.send(data.encode("utf-8"))
-        except ConnectionError as ex:
+            with self.__send_lock:
+                self.__clientsocket.sendall(self.__recipient.join(bodies) + self.__recipient)
+        except OSError as ex:
             self.close()
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.__name + "】退出房间")
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
 
+    # 读取一次套接字，返回收到的完整指令列表（数据不完整时为空列表）
+    # 连接关闭或者指令超长时关闭连接
     def receive(self):
         try:
-            data = str(self.__clientsocket.recv(1024).decode("utf-8"))
-            # print("receive:" + data)
-            return data.strip()
-        except ConnectionError as ex:
+            frames = self.__frame_reader.read_from(self.__clientsocket)
+            # print("receive:" + str(frames))
+            return [self.__codec.decode_command(frame) for frame in frames]
+        except (OSError, FrameError) as ex:
             self.close()
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.__name + "】退出房间")
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
+
+    # 套接字描述符（线程模式下房间用 select 等待所有玩家的输入）
+    def fileno(self):
+        return self.__clientsocket.fileno()
 
     def send_message(self, message):
         self.send(0, message.get_data())
@@ -235,36 +358,175 @@ class Player:
         self.send(1, message)
 
     def send_stop_play(self):
-        self.send(-1, None)
+        self.send_encoded(self.__codec.get_stop_body())
 
-    # 发送心跳包
-    def while_send(self):
-        while not self.__th_close:
-            self.send_message(Message())
-            time.sleep(5)
+    # 启动心跳（由房间的时间轮调度，不占用线程；到期后交给房间发送，时间轮线程不写套接字）
+    def start_heartbeat(self):
+        self.__heartbeat = self.__room.get_timer().schedule(Player.HEARTBEAT_INTERVAL, self.__room.post,
+                                                            self.__send_heartbeat)
 
-    def get_card_str_list(self):
-        return [str(card) for card in self.__cards]
+    # 停止心跳
+    def stop_heartbeat(self):
+        if self.__heartbeat is not None:
+            self.__heartbeat.cancel()
 
-    def receive_message(self):
+    # 发送心跳包
+    def __send_heartbeat(self):
+        if self.is_closed():
+            return
 
-        while True:
-            msg = self.receive()
-            if len(msg.split("\n")) == 1:
-                return msg
+        try:
+            self.send_encoded(self.__codec.get_heartbeat_body())
+        except MyException as ex:
+            return
 
-            self.send_message("格式错误，请重新输入")
+        self.start_heartbeat()
 
     def close(self):
+        if self.__th_close:
+            return
         self.__th_close = True
+        self.stop_heartbeat()
         self.__room.remove_player(self)
         self.__clientsocket.close()
 
     def __hash__(self):
-        return hash(str(self.__addr) + "\n" + self.__room.get_name() + "\n" + self.__name)
+        return hash(str(self.__addr) + "\n" + self.__room.get_name() + "\n" + self.get_name())
 
     def __eq__(self, other):
-        return self.__addr == other.__addr and self.__name == other.__name and self.__room.get_name() == other.__room.get_name()
+        if not isinstance(other, Player):
+            return False
+        return self.__addr == other.__addr and self.get_name() == other.get_name() and self.__room.get_name() == other.__room.get_name()
+
+
+# 定义协程玩家类
+# 与Player相同，但通过asyncio的流收发消息
+class AsyncPlayer(Player):
+    WRITE_LIMIT = 1 << 20  # 没有发送出去的字节数上限（客户端一直不读取时断开连接，不会一直占用内存）
+
+    def __init__(self, name, reader, writer, room, frame_reader=None, codec=JSON_CODEC):
+        self.__reader = reader
+        self.__writer = writer
+        self.__closed = False
+        self.__frame_reader = frame_reader if frame_reader is not None else codec.create_reader(MAX_COMMAND_SIZE)
+        super().__init__(name, None, writer.get_extra_info('peername'), room, self.__frame_reader, codec)
+
+    # 连接是否已经关闭
+    def is_closed(self):
+        return self.__closed
+
+    def send_frames(self, bodies):
+        if self.__closed or self.__writer.is_closing():
+            self.close()
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
+
+        recipient = self.get_recipient()
+        self.__writer.write(recipient.join(bodies) + recipient)
+        if self.__writer.transport.get_write_buffer_size() > AsyncPlayer.WRITE_LIMIT:
+            self.__writer.transport.abort()  # 丢弃没有发送出去的数据
+            self.close()
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
+
+    # 等待并返回收到的完整指令列表（数据不完整时为空列表）
+    async def receive(self):
+        try:
+            data = await self.__reader.read(4096)
+            if len(data) == 0:
+                raise ConnectionError("连接已经关闭")
+            frames = self.__frame_reader.feed(data)
+            return [self.get_codec().decode_command(frame) for frame in frames]
+        except (OSError, FrameError) as ex:
+            self.close()
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ALL, "【" + self.get_name() + "】退出房间")
+
+    # 循环接收玩家指令，交给房间处理，直到连接关闭
+    async def while_receive(self):
+        try:
+            while not self.__closed:
+                for commend in await self.receive():
+                    self.get_room().on_command(self, commend)
+        except MyException as ex:
+            pass
+
+    def close(self):
+        if self.__closed:
+            return
+        self.__closed = True
+        self.stop_heartbeat()
+        self.get_room().remove_player(self)
+        self.__writer.close()
+
+
+# 定义机器人类（服务器端的座位：填补空座位、接替断线的玩家）
+# 没有网络连接，发送给它的消息都忽略；轮到它时房间调用 decide，根据这个座位能看到的局面叫分或者出牌
+class BotPlayer(Seat):
+    BUDGET = SearchPlayer.BUDGET  # 每次出牌的搜索秒数（硬性限制，一桌机器人不会占满 CPU）
+
+    def __init__(self, name, budget=None, rng=None):
+        super().__init__(name)
+        self.__budget = budget if budget is not None else BotPlayer.BUDGET
+        self.__search = SearchPlayer(self.__budget, rng)
+        # 叫分时估计胜率（没有安装 numpy 时按大牌估计）；每批模拟前按剩余时间缩小这一批，不超出搜索时间
+        self.__estimator = None
+        if WinEstimator is not None:
+            self.__estimator = WinEstimator(rng.getrandbits(32) if rng is not None else None)
+
+    def is_bot(self):
+        return True
+
+    def is_closed(self):
+        return False
+
+    def get_codec(self):
+        return JSON_CODEC
+
+    def send_encoded(self, body):
+        pass
+
+    def send_frames(self, bodies):
+        pass
+
+    def send_message(self, message):
+        pass
+
+    def send_info(self, message):
+        pass
+
+    def send_stop_play(self):
+        pass
+
+    def close(self):
+        pass
+
+    # 轮到机器人操作：返回 (事件, 数据)（在调用的线程中搜索）
+    def decide(self, play):
+        return self.finish(self.think(self.observe(play)))
+
+    # 搜索需要的局面（在游戏所在的线程中获取，之后搜索不再读取游戏的状态）
+    def observe(self, play):
+        if play.get_phase() == PLAY_PHASE.MARKING:
+            return PLAY_PHASE.MARKING, list(self.get_hand().get_counts()), play.get_max_mark()
+        player_index = [player is self for player in play.get_players()].index(True)
+        return PLAY_PHASE.PLAYING, play.get_table_view(player_index)
+
+    # 按局面搜索（可以在工作线程中执行，搜索时间从开始搜索时计算）
+    # 返回 (事件, 数据)，出牌时数据为 (牌型签名, 出牌类型)
+    def think(self, observation):
+        if observation[0] == PLAY_PHASE.MARKING:
+            counts, max_mark = observation[1:]
+            return PLAY_EVENT.BID, str(estimate_bid(counts, max_mark, self.__estimator, time.perf_counter() + self.__budget))
+
+        move = self.__search.choose(observation[1])
+        if move is None:
+            return PLAY_EVENT.PASS, None
+        return PLAY_EVENT.PLAY, move[:2]
+
+    # 把搜索结果转换成游戏的输入（在游戏所在的线程中执行）
+    def finish(self, decision):
+        event, data = decision
+        if event == PLAY_EVENT.PLAY:
+            data = CardOrder(self.get_hand().pick_cards(data[0]), data[1])
+        return event, data
 
 
 class PLAY_STATE(enum.Enum):
@@ -276,288 +538,63 @@ class PLAY_STATE(enum.Enum):
 
 # 出牌逻辑类
 class CardOrder:
-    CARD_ORDER_TYPE = enum.Enum('CARD_ORDER_TYPE', ('一张', '一对', '三张', '双三张',
-                                                    '三带一', '三带二', '四带一', '四带二', '四带两对',
-                                                    '顺子', '连对', '飞机', '飞机带对子', '炸弹', '王炸'))
+    CARD_ORDER_TYPE = CARD_ORDER_TYPE
 
-    def __init__(self, cards, cards_type):
+    # cards_type 为 None 时由服务器根据牌型表判断出牌类型
+    def __init__(self, cards, cards_type=None):
 
         if len(cards) == 0:
             raise MyException(MyException.EXCEPTION_CODE_TYPE.WARNING, "出牌为空")
 
-        result, power = self.check_card_type(cards, cards_type)
-        if not result:
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "出牌不符合规则")
+        if cards_type is None:
+            cards_type, power = self.classify(cards)
+        else:
+            result, power = self.check_card_type(cards, cards_type)
+            if not result:
+                raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "出牌不符合规则")
 
         self.__cards = cards
         self.__power = 0
         self.__type = cards_type
         self.__power = power
+        self.__play_class = PlayDominance.get_class(cards_type, power, len(cards))
+
+    # 判断扑克牌类型（查牌型表）
+    # 牌型表中每个签名只属于一种牌型，所以查到的就是唯一合法的出牌类型，能否压过上次出牌由 compare_last 查压制表判断
+    # 返回值为:(出牌类型,power权值)
+    @staticmethod
+    def classify(cards):
+        cards.sort()
+        play = PlayTable.classify_cards(cards)
+        if play is None:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "出牌不符合规则")
+        return play
 
-    # 检查扑克牌类型
+    # 检查扑克牌类型（查牌型表）
     # 返回值为:(result类型是否正确,power权值)
     @staticmethod
     def check_card_type(cards, cards_type):
-
-        result = False
-        power = 0
-
         cards.sort()
-
-        # 统计数量
-        card_count_map = {}
-        power_list = []
-        for item in cards:
-            item_power = item.get_power()
-            if item_power not in card_count_map.keys():
-                card_count_map[item_power] = 0
-            card_count_map[item_power] += 1
-        power_list = tuple(card_count_map.keys())
-
-        # 数量列表
-        count_list = []
-        # 每个数量对应牌的列表
-        count_card_map = {}
-        for item_power in card_count_map.keys():
-            count = card_count_map[item_power]
-            if count not in count_card_map.keys():
-                count_card_map[count] = []
-            count_card_map[count].append(item_power)
-        count_list = tuple(count_card_map.keys())
-
-        # 判断是否为一张
-        if cards_type == CardOrder.CARD_ORDER_TYPE['一张']:
-            result = len(cards) == 1
-            power = cards[0].get_power()
-
-        # 判断是否为一对
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['一对']:
-            # 1. 计数只有1种
-            # 2. 有数量为2个的牌
-            # 3. 数量为2个的牌有1种
-            result = len(count_card_map) == 1 \
-                     and 2 in count_list \
-                     and len(count_card_map[2]) == 1
-            power = cards[0].get_power()
-
-        # 判断是否为三张
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['三张']:
-            # 1. 计数只有1种
-            # 2. 有数量为3个的牌
-            # 3. 数量为3个的牌有1种
-            result = len(count_card_map) == 1 \
-                     and 3 in count_list \
-                     and len(count_card_map[3]) == 1
-            power = cards[0].get_power()
-
-        # 判断是否为双三张
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['双三张']:
-            # 1. 计数只有1种
-            # 2. 有数量为3个的牌
-            # 3. 数量为3个的牌有2种
-            result = len(count_card_map) == 1 \
-                     and 3 in count_list \
-                     and len(count_card_map[3]) == 2
-            power = cards[0].get_power()
-
-        # 判断是否为三带一
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['三带一']:
-            # 1. 计数只有2种
-            # 2. 有数量为3个的牌
-            # 3. 有数量为1个的牌
-            # 4. 数量为3个的牌有1种
-            # 5. 数量为1个的牌有1种
-            result = len(count_card_map) == 2 \
-                     and 3 in count_list \
-                     and 1 in count_list \
-                     and len(count_card_map[3]) == 1 \
-                     and len(count_card_map[1]) == 1
-            power = count_card_map[3][0]
-
-        # 判断是否为三带二
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['三带二']:
-            # 1. 计数只有2种
-            # 2. 有数量为3个的牌
-            # 3. 有数量为2个的牌
-            # 4. 数量为3个的牌有1种
-            # 5. 数量为2个的牌有1种
-            result = len(count_card_map) == 2 \
-                     and 3 in count_list \
-                     and 2 in count_list \
-                     and len(count_card_map[3]) == 1 \
-                     and len(count_card_map[2]) == 1
-            power = count_card_map[3][0]
-
-        # 判断是否为四带一
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['四带一']:
-            # 1. 计数只有2种
-            # 2. 有数量为4个的牌
-            # 3. 有数量为1个的牌
-            # 4. 数量为4个的牌有1种
-            # 5. 数量为1个的牌有1种
-            result = len(count_card_map) == 2 \
-                     and 4 in count_list \
-                     and 1 in count_list \
-                     and len(count_card_map[4]) == 1 \
-                     and len(count_card_map[1]) == 1
-            power = count_card_map[4][0]
-
-        # 判断是否为四带二
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['四带二']:
-            # 1. 有数量为4个的牌
-            # 2. 数量为4个的牌有1种
-            # 3. 其他牌数量为2
-            result = 4 in count_list \
-                     and len(count_card_map[4]) == 1 \
-                     and len(cards) - 4 == 2
-            power = count_card_map[4][0]
-
-        # 判断是否为四带两对
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['四带两对']:
-            # 1. 计数只有2种
-            # 2. 有数量为4个的牌
-            # 3. 有数量为2个的牌
-            # 4. 数量为4个的牌有1种
-            # 5. 数量为2个的牌有2种
-            result = len(count_card_map) == 2 \
-                     and 4 in count_list \
-                     and 2 in count_list \
-                     and len(count_card_map[4]) == 1 \
-                     and len(count_card_map[2]) == 2
-            power = count_card_map[4][0]
-
-        # 判断是否为顺子
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['顺子']:
-            # 1. 计数只有1种
-            # 2. 有数量为1个的牌
-            # 3. 数量为1个的牌大于等于5种
-            result = len(count_card_map) == 1 \
-                     and 1 in count_list \
-                     and len(count_card_map[1]) >= 5 \
-                     and CardOrder.__is_continuous(count_card_map[1])
-            power = min(count_card_map[1])  # 取最小值为权值
-
-        # 判断是否为连对
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['连对']:
-            # 1. 计数只有1种
-            # 2. 有数量为2个的牌
-            # 3. 数量为2个的牌大于等于3种
-            # 4. 数量为2个的牌连续
-            result = len(count_card_map) == 1 \
-                     and 2 in count_list \
-                     and len(count_card_map[2]) >= 3 \
-                     and CardOrder.__is_continuous(count_card_map[2])
-            power = min(count_card_map[2])  # 取最小值为权值
-
-        # 判断是否为飞机
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['飞机']:
-            # 1. 有数量为3个的牌
-            # 2. 数量为3个的牌大于等于2
-            # 3. 牌数为3的牌种类数量 等于 其他牌数量
-            # 4. 数量为3个的牌连续
-            result = 3 in count_list \
-                     and len(count_card_map[3]) >= 2 \
-                     and len(count_card_map[3]) == len(cards) - len(count_card_map[3]) * 3 \
-                     and CardOrder.__is_continuous(count_card_map[3])
-            power = min(count_card_map[3])  # 取最小值为权值
-
-            # 特判特别的飞机（比如三个飞机带三个相同的牌）
-            if not result:
-                # 1. 有数量为3个的牌
-                # 2. 数量为3个的牌大于等于3
-                # 3. 牌数为3的牌种类数量-1 等于 其他牌数量+3
-                # 4. 数量为3个的牌连续 有【牌数为3的牌种类数量-1】个连续的
-                result = 3 in count_list \
-                         and len(count_card_map[3]) >= 3 \
-                         and len(count_card_map[3]) - 1 == len(cards) - len(count_card_map[3]) * 3 + 3
-                count_card_map[3].sort()
-                # 优先取最小的牌当做 带的牌
-                if CardOrder.__is_continuous(count_card_map[3][1:]):
-                    power = min(count_card_map[3][1:])  # 取最小值为权值
-                elif CardOrder.__is_continuous(count_card_map[3][:-1]):
-                    power = min(count_card_map[3][:-1])  # 取最小值为权值
-                else:
-                    raise MyException(MyException.EXCEPTION_CODE_TYPE.ERROR, "未找到有效权值")
-
-        # 判断是否为飞机带对子
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['飞机带对子']:
-            # 1. 计数只有2种
-            # 2. 有数量为3个的牌
-            # 3. 有数量为2个的牌
-            # 4. 数量为3个的牌大于等于2
-            # 5. 牌数为2的牌种类数量 等于 牌数为3的牌种类数量
-            # 6. 数量为3个的牌连续
-            result = len(count_card_map) == 2 \
-                     and 3 in count_list \
-                     and 2 in count_list \
-                     and len(count_card_map[3]) >= 2 \
-                     and len(count_card_map[2]) == len(count_card_map[3]) \
-                     and CardOrder.__is_continuous(count_card_map[3])
-            power = min(count_card_map[3])
-
-            #  特判特别的飞机带对子（比如两个飞机带四个相同的牌）
-            if not result:
-                # 1. 有数量为3个的牌
-                # 2. 只能有牌为3张、2张、4张的（所以只判断没有数量为1的牌）
-                # 3. 数量为3个的牌大于等于2
-                # 4. 除【数量为3个的牌】其他牌数量/2 等于 牌数为3的牌种类数量
-                # 5. 数量为3个的牌连续
-                result = 3 in count_list \
-                         and 1 not in count_list \
-                         and len(count_card_map[3]) >= 2 \
-                         and (len(cards) - len(count_card_map[3]) * 3) / 2 == len(count_card_map[3]) \
-                         and CardOrder.__is_continuous(count_card_map[3])
-                power = min(count_card_map[3])
-
-        # 判断是否为炸弹
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['炸弹']:
-            # 1. 计数只有1种
-            # 2. 有数量为4个的牌
-            # 3. 数量为4个的牌有1种
-            result = len(count_card_map) == 1 \
-                     and 4 in count_list \
-                     and len(count_card_map[4]) == 1
-            power = cards[0].get_power()
-
-        # 判断为王炸
-        elif cards_type == CardOrder.CARD_ORDER_TYPE['王炸']:
-            # 1. 计数只有1种
-            # 2. 有数量为1个的牌
-            # 3. 数量为1个的牌有2种
-            # 4. 大王在其中
-            # 5. 小王在其中
-            result = len(count_card_map) == 1 \
-                     and 1 in count_list \
-                     and len(count_card_map[1]) == 2 \
-                     and Card('大王', '').get_power() in count_card_map[1] \
-                     and Card('小王', '').get_power() in count_card_map[1]
-            power = Card('大王', '').get_power()
-        return result, power
+        play = PlayTable.classify_cards(cards)
+        if play is None or play[0] != cards_type:
+            return False, 0
+        return True, play[1]
 
     @staticmethod
     def make_card_list(card_str_list):
-        # 根据输入生成牌列表   判断每张牌是否有花色，分割花色生成牌列表
+        # 根据输入查表获取牌列表（牌名称或者牌编号）
         card_list = []
-        for card_str in card_str_list:
-            if len(card_str) == 0:
-                continue
-
-            if card_str[0] in Card.SUITS:
-                card_list.append(Card(card_str[1:], card_str[0]))
-            else:
-                card_list.append(Card(card_str, ""))
+        try:
+            for card_str in card_str_list:
+                if isinstance(card_str, int):
+                    card_list.append(Card.from_id(card_str))
+                elif len(card_str) != 0:
+                    card_list.append(Card.parse(card_str))
+        except ValueError as ex:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.WARNING, str(ex))
 
         return card_list
 
-    # 判断数组是否连续
-    @staticmethod
-    def __is_continuous(arr):
-        arr.sort()
-        for i in range(1, len(arr)):
-            if arr[i] != arr[i - 1] + 1:
-                return False
-        return True
-
     def get_power(self):
         return self.__power
 
@@ -567,6 +604,13 @@ class CardOrder:
     def get_size(self):
         return len(self.__cards)
 
+    # 出牌类别编号（PlayDominance 压制表中的类别）
+    def get_play_class(self):
+        return self.__play_class
+
+    def get_cards(self):
+        return self.__cards.copy()
+
     def get_card_str_list(self):
         return [str(card) for card in self.__cards]
 
@@ -574,377 +618,1151 @@ class CardOrder:
         return " ".join([str(card) for card in self.__cards])
 
 
+# 一局游戏的阶段
+PLAY_PHASE = enum.Enum('PLAY_PHASE', ('MARKING', 'PLAYING', 'GAME_OVER', 'END'))
+
+
+# 输入给一局游戏的事件
+class PLAY_EVENT(enum.Enum):
+    BID = 0  # 叫分
+    PLAY = 1  # 出牌
+    PASS = 2  # 不出
+    DISCONNECT = 3  # 玩家断开连接
+    TIMEOUT = 4  # 等待超时
+    HINT = 5  # 提示
+
+
+# 出站消息类（一局游戏输出的消息）
+# to 为接收消息的玩家下标，ALL 表示发送给所有玩家（exclude 下标的玩家除外）
+# code 与 Player.send 的编码一致：0 游戏消息（Message），1 提示信息（字符串），-1 结束本局
+class Outbound:
+    ALL = -1
+
+    def __init__(self, code, data=None, to=ALL, exclude=-1):
+        self.__code = code
+        self.__data = data
+        self.__to = to
+        self.__exclude = exclude
+        self.__body = {}  # 编码格式 -> 编码后的消息体（所有接收者共用）
+
+    def get_code(self):
+        return self.__code
+
+    def get_data(self):
+        return self.__data
+
+    # 获取发送的内容（游戏消息为 Message 中的数据）
+    def get_payload(self):
+        if self.__code == 0:
+            return self.__data.get_data()
+        return self.__data
+
+    # 获取编码后的消息体（每种编码格式只在第一次获取时序列化）
+    def get_body(self, codec=JSON_CODEC):
+        body = self.__body.get(codec)
+        if body is None:
+            if self.__code == 0:
+                body = codec.join_fields(self.__data.get_fields(codec).values())
+            else:
+                body = codec.encode_message(self.__code, self.get_payload())
+            self.__body[codec] = body
+        return body
+
+    # 获取接收消息的玩家下标列表
+    def get_targets(self, player_count):
+        if self.__to != Outbound.ALL:
+            return [self.__to]
+        return [index for index in range(player_count) if index != self.__exclude]
+
+
+# 出站消息批次（每个玩家一个）
+# 一步中发送给同一个玩家的游戏消息按字段合并为一帧（后面的字段覆盖前面的字段），
+# 客户端收到一帧时只更新帧中带有的字段，所以合并后的效果与逐条发送相同；
+# 但客户端会同时显示最近两条顶端消息，因此顶端消息重复时另起一帧，其他编码的消息也单独成帧
+class OutboundBatch:
+
+    def __init__(self, codec=JSON_CODEC):
+        self.__codec = codec
+        self.__bodies = []  # 已经完成的消息体
+        self.__fields = {}  # 正在合并的字段
+
+    # 添加一个消息
+    def add(self, outbound):
+        if outbound.get_code() != 0:
+            self.__flush()
+            self.__bodies.append(outbound.get_body(self.__codec))
+            return
+
+        fields = outbound.get_data().get_fields(self.__codec)
+        if 'top_message' in fields and 'top_message' in self.__fields:
+            self.__flush()
+        self.__fields.update(fields)
+
+    # 结束正在合并的帧
+    def __flush(self):
+        if self.__fields:
+            self.__bodies.append(self.__codec.join_fields(self.__fields.values()))
+            self.__fields = {}
+
+    # 获取所有消息体
+    def get_bodies(self):
+        self.__flush()
+        return self.__bodies
+
+
 # 定义游戏类（一局的游戏）
 # 主要用来处理出牌逻辑
 # 封装每个游戏步骤：叫分，出牌，判断出牌大小
+# 游戏流程为状态机：输入一个事件（叫分、出牌、不出、断开、超时），返回需要发送的消息列表
+# 状态机本身不收发网络消息，由房间（或测试、模拟程序）负责把消息送达玩家
 class Play:
+    BID_TIMEOUT = 15  # 叫分超时秒数（超时按不叫处理）
+    TURN_TIMEOUT = 30  # 出牌超时秒数（超时自动出能压过上家的最小的牌（不用炸弹），没有则不出；任意牌则自动出权值最小的牌）
+    END_DELAY = 5  # 胜利后结束本局前的等待秒数
+    AUTHORITATIVE = False  # 为 True 时忽略客户端发送的出牌类型，全部由服务器判断
 
-    def __init__(self, room, players):
+    # rng 为洗牌使用的随机数生成器（默认每局一个新的生成器）
+    def __init__(self, players, rng=None):
 
         if len(players) != 3:
             raise MyException(MyException.EXCEPTION_CODE_TYPE.ERROR, "玩家人数必须为3人")
 
-        self.__room = room
-        self.__players = players
-        self.__cards = []
+        self.__players = list(players)
+        self.__card_box = CardBox(rng)
         self.__name_list = []  # 准备名称列表（名称:角色）
+        self.__phase = PLAY_PHASE.MARKING  # 当前阶段
         self.__players_index = 0  # 正在操作的玩家下标
         self.__landlord_index = 0  # 地主下标
+        self.__max_mark = 0  # 当前最高叫分
+        self.__max_player_index = 0  # 叫分最高的玩家下标
         self.__last_card_order = None  # 上一个出牌
         self.__last_players_index = 0  # 上一个出牌者的下标
         self.__free_deal = True  # 当前是否为任意牌（就是可以不用根据上次的出牌结果出的牌，可以出任意符合出牌逻辑的牌）
 
         self.__notify_deal = False  # 记录是否发送过出牌通知
+        self.__outbound = []  # 本次事件产生的出站消息
+        self.__step = 0  # 等待的操作每变化一次（轮到下一个人、进入下一阶段）加一，用来判断超时是否已经过期
+        self.__record = GameRecord([player.get_name() for player in self.__players])  # 对局记录
 
         # 清空用户原有内容（原来的牌）
         for player in self.__players:
             player.clear()
 
-    # 叫分阶段
-    def marking(self):
+    def get_players(self):
+        return self.__players.copy()
+
+    def get_phase(self):
+        return self.__phase
+
+    # 获取正在操作的玩家下标
+    def get_playing_index(self):
+        return self.__players_index
+
+    def get_landlord_index(self):
+        return self.__landlord_index
+
+    def get_last_card_order(self):
+        return self.__last_card_order
+
+    def is_free_deal(self):
+        return self.__free_deal
+
+    # 本局是否已经结束
+    def is_over(self):
+        return self.__phase == PLAY_PHASE.END
+
+    def get_step(self):
+        return self.__step
+
+    # 对局记录（GameRecord）
+    def get_record(self):
+        return self.__record
+
+    # 当前最高叫分
+    def get_max_mark(self):
+        return self.__max_mark
+
+    # 一个座位能看到的局面（机器人使用）：另外两个座位的手牌只知道合计，地主手中还没出的底牌是已知的
+    def get_table_view(self, player_index):
+        signatures = [player.get_hand().get_signature() for player in self.__players]
+        known = [0, 0, 0]
+        if self.__phase == PLAY_PHASE.PLAYING and player_index != self.__landlord_index:
+            landlord_mask = self.__players[self.__landlord_index].get_hand().get_mask()
+            known[self.__landlord_index] = get_mask_signature(landlord_mask & self.__record.get_bottom_mask())
+        return TableView(player_index, self.__landlord_index, signatures[player_index],
+                         [player.get_card_count() for player in self.__players],
+                         sum(signatures) - signatures[player_index], known, self.__get_last(), self.__last_players_index)
+
+    # 让另一个座位接替 player_index 的玩家继续本局（玩家断线时由机器人接替，玩家加入时接替机器人），返回需要发送的消息列表
+    def replace_player(self, player_index, seat):
+        old = self.__players[player_index]
+        cards = old.get_cards()
+        old.clear()
+        seat.clear()
+        seat.add_cards(cards)
+        self.__players[player_index] = seat
+        if self.__phase == PLAY_PHASE.PLAYING:
+            seat.get_move_index()
+
+        role = self.__name_list[player_index].partition(":")[2]
+        self.__name_list[player_index] = seat.get_name() + (":" + role if role else "")
+        self.__send_all(Message(f"【{old.get_name()}】退出房间，由【{seat.get_name()}】接替", name_list=self.__name_list),
+                        player_index)
+        self.__send(player_index, Message(f"接替【{old.get_name()}】", my_index=player_index, name_list=self.__name_list,
+                                          my_card_list=seat.get_card_str_list(), state=PLAY_STATE.WAIT))
+
+        if self.__phase == PLAY_PHASE.PLAYING:
+            self.__send(player_index, Message(card_count_list=[player.get_card_count() for player in self.__players]))
+            if not self.__free_deal:
+                self.__send(player_index, Message(last_card_player_index=self.__last_players_index,
+                                                  last_card_list=self.__last_card_order.get_card_str_list(),
+                                                  last_card_type=self.__last_card_order.get_type().name))
+
+        # 轮到这个座位时重新提醒（并重新计算超时）
+        if player_index == self.__players_index:
+            self.__step += 1
+            if self.__phase == PLAY_PHASE.MARKING:
+                self.__prompt_mark(False)
+            elif self.__phase == PLAY_PHASE.PLAYING:
+                self.__prompt_deal()
+
+        return self.__take_outbound()
+
+    # 当前出牌玩家可以出的所有牌（CardOrder 的生成器，相同点数不同花色的出牌只生成一种）
+    # 出任意牌时可以出所有牌型，否则只生成能压过上次出牌的牌（从小到大，炸弹在后）
+    def get_moves(self):
+        playing = self.__players[self.__players_index]
+        for signature, card_type, power in playing.get_move_index().get_moves(self.__get_last()):
+            yield CardOrder(playing.get_hand().pick_cards(signature), card_type)
+
+    # 当前出牌玩家的提示：依次返回下一个更大的能出的牌（CardOrder），没有能出的牌时返回 None
+    def get_hint(self):
+        playing = self.__players[self.__players_index]
+        move = playing.get_move_index().next_hint(self.__get_last(), self.__step)
+        if move is None:
+            return None
+        return CardOrder(playing.get_hand().pick_cards(move[0]), move[1])
+
+    # 上次出牌 (出牌类型, 权值, 牌数)，出任意牌时为 None
+    def __get_last(self):
+        if self.__free_deal:
+            return None
+        return (self.__last_card_order.get_type(), self.__last_card_order.get_power(), self.__last_card_order.get_size())
+
+    # 获取当前等待的超时秒数，None 表示不需要超时
+    def get_timeout(self):
+        if self.__phase == PLAY_PHASE.MARKING:
+            return Play.BID_TIMEOUT
+        elif self.__phase == PLAY_PHASE.PLAYING:
+            return Play.TURN_TIMEOUT
+        elif self.__phase == PLAY_PHASE.GAME_OVER:
+            return Play.END_DELAY
+        return None
+
+    # 发送消息给一个玩家
+    def __send(self, index, message):
+        self.__outbound.append(Outbound(0, message, to=index))
 
-        # 如果全为0分 则需要重新发牌，重新叫分
-        while True:
-            # 清空用户原有内容（原来的牌）
-            for player in self.__players:
-                player.clear()
-
-            # 重新买一盒牌
-            card_box = CardBox()
-            card_box.create()
-
-            # 发牌
-            card_box.deal(self.__players, 17)
-
-            # 玩家整理手中的牌
-            for player in self.__players:
-                player.sort_cards()
-
-            # 展示每个玩家（牌）
-            for player in self.__players:
-                player.send_message(Message(my_card_list=player.get_card_str_list()))
-
-            # 开始叫分
-            max_mark = 0
-            max_player_index = 0
-            for playing_index in range(len(self.__players)):
-                playing = self.__players[playing_index]
-                self.__room.send_all_message(Message(f"等待【{playing.get_name()}】叫分"), playing_index)
-
-                # 判断这个人是否叫分在正常范围内
-                # 如果叫分有误则一直循环 直到叫分正确
-                while True:
-                    playing.send_message(Message("请叫分（0~3）", state=PLAY_STATE.MARKING))
-                    msg = playing.receive_message()
-
-                    # 如果接收的内容是一个非数字 则重新叫分
-                    if not msg.isnumeric():
-                        playing.send_message(Message("格式错误，请输入纯数字", state=PLAY_STATE.MARKING))
-                        continue
-                    mark = int(msg)
-
-                    # 叫分正常 则跳出循环
-                    if 0 <= mark <= 3:
-                        # 修改用户名称 使得通过名称标记叫分大小
-                        self.__name_list[playing_index] = playing.get_name() + f":{mark}分"
-                        break
-
-                    playing.send_message(Message("叫分范围有误，请重新叫分", state=PLAY_STATE.MARKING))
-
-                self.__room.send_all_message(Message(f"【{playing.get_name()}】叫 {mark} 分", name_list=self.__name_list, state=PLAY_STATE.WAIT))
-
-                # 判断叫分大小
-                if mark > max_mark:
-                    max_mark = mark
-                    max_player_index = playing_index  # 标记叫分最大的那个人
-
-                    # 分等于3直接结束叫分
-                    if mark == 3:
-                        break
-
-            # 叫分完成准备开始游戏
-            if max_mark != 0:
-                self.__landlord_index = max_player_index
-                self.__players_index = max_player_index
-                self.__last_players_index = max_player_index
-
-                # 准备名称列表（名称:角色）
-                self.__name_list = []
-                for playing_index in range(len(self.__players)):
-                    role = ''
-                    if playing_index == self.__landlord_index:
-                        role = '地主'
-                    else:
-                        role = '农民'
-                    self.__name_list.append(self.__players[playing_index].get_name() + ":" + role)
-
-                # 摸底牌
-                remain_cards = card_box.get_remain()
-                self.__players[self.__landlord_index].add_cards(remain_cards)
-                self.__players[self.__landlord_index].sort_cards()
-                self.__players[self.__landlord_index].send_message(Message(my_card_list=self.__players[self.__landlord_index].get_card_str_list()))
-
-                # 展示底牌
-                self.__room.send_all_message(Message(f"地主是:{self.__players[self.__landlord_index].get_name()}", name_list=self.__name_list,
-                                                     remain_card_list=[str(card) for card in remain_cards], state=PLAY_STATE.WAIT))
-                break
+    # 发送全体消息
+    def __send_all(self, message, exclude=-1):
+        self.__outbound.append(Outbound(0, message, exclude=exclude))
 
-    # 出牌阶段
-    def deal(self):
+    # 取出本次产生的消息
+    def __take_outbound(self):
+        outbound = self.__outbound
+        self.__outbound = []
+        return outbound
 
-        # 玩家轮换出牌
-        while True:
-            playing = self.__players[self.__players_index]
-            try:
-                card_count_list = []
+    # 开始游戏
+    def start(self):
 
-                # 统计 每个玩家的剩余牌数
-                for player in self.__players:
-                    card_count_list.append(len(player.get_cards()))
+        # 设置玩家名称
+        for playing in self.__players:
+            self.__name_list.append(playing.get_name())
 
-                self.__room.send_all_message(Message(card_count_list=card_count_list, state=PLAY_STATE.WAIT))
+        for i in range(len(self.__players)):
+            self.__send(i, Message("开始游戏!", name_list=self.__name_list, my_index=i))
 
-                # 出牌提醒
-                # 如果上次出牌者是本人，则说明没人出牌压它，所以可以出任意牌了
-                if self.__last_players_index == self.__players_index:
-                    self.__last_card_order = None
-                    self.__free_deal = True
+        # 叫分
+        self.__new_round()
 
-                # 出一次牌
-                if self.__free_deal:
-                    self.free_deal_cards(playing)
-                else:
-                    self.normal_deal_cards(playing)
-
-                # 迭代下一个玩家
-                self.__players_index += 1
-                self.__players_index %= len(self.__players)
-                self.__free_deal = False
-                self.__notify_deal = False
-
-                # 判断是否胜利
-                result = False
-                for playing_index in range(len(self.__players)):
-                    card_list = self.__players[playing_index].get_cards()
-                    if len(card_list) == 0:
-                        self.__room.send_all_message(Message(f"【{self.__name_list[playing_index]}】胜利！5秒后结束本局游戏", state=PLAY_STATE.WAIT))
-                        time.sleep(5)
-                        self.__room.stop_play()
-                        result = True
-                        break
-                if result:
-                    break
+        return self.__take_outbound()
 
-            except MyException as ex:
-                if ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ERROR:
-                    raise ex
-                elif ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ALL:
-                    self.__room.send_all_message(Message(ex.get_message()))
-                elif ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ONE:
-                    playing.send_message(Message(ex.get_message()))
-                else:
-                    print(ex.get_message())
+    # 输入一个事件，返回需要发送的消息列表（出牌事件的 data 为出牌指令或者 CardOrder）
+    def feed(self, event, player_index=-1, data=None):
 
-    # 出一次任意牌
-    def free_deal_cards(self, playing):
-        if self.__notify_deal != True:
-            self.__room.send_all_message(Message(f"轮到【{self.__name_list[self.__players_index]}】出任意牌了", last_card_list=[]))
-            self.__notify_deal = True
-        playing.send_message(Message(state=PLAY_STATE.FREE))
+        if self.__phase == PLAY_PHASE.END:
+            return []
 
-        # 接受用户指令（出的牌或者是不出）
-        commend = playing.receive_message().strip()
+        if event == PLAY_EVENT.DISCONNECT:
+            self.__send_all(Message(f"【{self.__players[player_index].get_name()}】退出房间"), player_index)
+            self.__phase = PLAY_PHASE.END
+            self.__step += 1
+
+        elif event == PLAY_EVENT.TIMEOUT:
+            self.__timeout()
+
+        elif player_index != self.__players_index or self.__phase == PLAY_PHASE.GAME_OVER:
+            self.__send(player_index, Message("还没有轮到你"))
+
+        elif self.__phase == PLAY_PHASE.MARKING:
+            if event == PLAY_EVENT.BID:
+                self.__mark(data)
+
+        elif self.__phase == PLAY_PHASE.PLAYING:
+            if event in (PLAY_EVENT.PLAY, PLAY_EVENT.PASS):
+                self.__deal(event, data)
+            elif event == PLAY_EVENT.HINT:
+                self.__hint()
+
+        return self.__take_outbound()
+
+    # 输入玩家发来的原始指令（根据当前阶段转换为叫分、出牌或不出事件）
+    def feed_command(self, player_index, commend):
+        commend = commend.strip()
+
+        if self.__phase == PLAY_PHASE.MARKING:
+            return self.feed(PLAY_EVENT.BID, player_index, commend)
 
-        # 用户不出牌
         if commend == "不出" or commend.lower() == "pass":
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "本次你为任意牌，必须出牌")
+            return self.feed(PLAY_EVENT.PASS, player_index)
 
-        card_str_list = commend[:-2].split()
-        cards_type = commend[-2:]
-        if not cards_type.isnumeric():
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ERROR, "出牌类型需要根据数值来判断")
+        if commend == "提示" or commend.lower() == "hint":
+            return self.feed(PLAY_EVENT.HINT, player_index)
 
-        card_list = CardOrder.make_card_list(card_str_list)
-        card_order = CardOrder(card_list, CardOrder.CARD_ORDER_TYPE(int(cards_type)))
+        return self.feed(PLAY_EVENT.PLAY, player_index, commend)
 
-        # 移除玩家手中的牌
-        playing.remove_cards(card_list)
+    # 发牌并开始新一轮叫分
+    def __new_round(self):
 
-        # 展示出牌
-        playing.send_message(Message(my_card_list=playing.get_card_str_list()))
-        self.__room.send_all_message(Message(last_card_player_index=self.__players_index,
-                                             last_card_list=card_order.get_card_str_list(),
-                                             last_card_type=card_order.get_type().name,
-                                             state=PLAY_STATE.WAIT))
+        # 清空用户原有内容（原来的牌）
+        for player in self.__players:
+            player.clear()
 
-        # 存储本次出牌
-        self.__last_card_order = card_order
-        self.__last_players_index = self.__players_index
+        # 洗牌、发牌
+        self.__card_box.deal(self.__players, 17)
+        hand_masks = [player.get_hand().get_mask() for player in self.__players]
+        self.__record.set_deal(hand_masks, ALL_MASK ^ hand_masks[0] ^ hand_masks[1] ^ hand_masks[2])
 
-    # 出一次普通牌
-    def normal_deal_cards(self, playing):
-        if self.__notify_deal != True:
-            self.__room.send_all_message(Message(f"轮到【{self.__name_list[self.__players_index]}】出牌了"))
-            self.__notify_deal = True
-        playing.send_message(Message(state=PLAY_STATE.PLAYING))
+        # 展示每个玩家（牌）
+        for i in range(len(self.__players)):
+            self.__send(i, Message(my_card_list=self.__players[i].get_card_str_list()))
+
+        # 开始叫分
+        self.__phase = PLAY_PHASE.MARKING
+        self.__step += 1
+        self.__max_mark = 0
+        self.__max_player_index = 0
+        self.__players_index = 0
+        self.__prompt_mark(True)
+
+    # 提醒玩家叫分
+    def __prompt_mark(self, notify_all):
+        playing = self.__players[self.__players_index]
+        if notify_all:
+            self.__send_all(Message(f"等待【{playing.get_name()}】叫分"), self.__players_index)
+        self.__send(self.__players_index, Message("请叫分（0~3）", state=PLAY_STATE.MARKING))
+
+    # 叫分阶段：处理一次叫分
+    def __mark(self, msg):
+        playing_index = self.__players_index
+        playing = self.__players[playing_index]
+
+        # 如果接收的内容是一个非数字 则重新叫分
+        if not msg.isnumeric():
+            self.__send(playing_index, Message("格式错误，请输入纯数字", state=PLAY_STATE.MARKING))
+            self.__prompt_mark(False)
+            return
+        mark = int(msg)
 
-        # 接受用户指令（出的牌或者是不出）
-        commend = playing.receive_message().strip()
+        # 判断这个人是否叫分在正常范围内
+        if not 0 <= mark <= 3:
+            self.__send(playing_index, Message("叫分范围有误，请重新叫分", state=PLAY_STATE.MARKING))
+            self.__prompt_mark(False)
+            return
 
-        # 用户不出牌
-        if commend == "不出" or commend.lower() == "pass":  # 不出提醒消息
-            self.__room.send_all_message(Message(f"【{self.__name_list[self.__players_index]}】选择了不出", state=PLAY_STATE.WAIT))
+        self.__record.add_bid(mark)
+
+        # 修改用户名称 使得通过名称标记叫分大小
+        self.__name_list[playing_index] = playing.get_name() + f":{mark}分"
+        self.__send_all(Message(f"【{playing.get_name()}】叫 {mark} 分", name_list=self.__name_list, state=PLAY_STATE.WAIT))
+
+        # 判断叫分大小
+        if mark > self.__max_mark:
+            self.__max_mark = mark
+            self.__max_player_index = playing_index  # 标记叫分最大的那个人
+
+        # 分等于3 或者所有人都叫过分 则结束叫分
+        self.__players_index += 1
+        self.__step += 1
+        if mark == 3 or self.__players_index == len(self.__players):
+            self.__finish_marking()
+        else:
+            self.__prompt_mark(True)
+
+    # 叫分完成
+    def __finish_marking(self):
+
+        # 如果全为0分 则需要重新发牌，重新叫分
+        if self.__max_mark == 0:
+            self.__new_round()
             return
 
-        card_str_list = commend[:-2].split()
-        cards_type = commend[-2:]
-        if not cards_type.isnumeric():
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ERROR, "出牌类型需要根据数值来判断")
+        # 叫分完成准备开始游戏
+        self.__landlord_index = self.__max_player_index
+        self.__players_index = self.__max_player_index
+        self.__record.set_landlord_index(self.__landlord_index)
+        self.__last_players_index = self.__max_player_index
+
+        # 准备名称列表（名称:角色）
+        self.__name_list = []
+        for playing_index in range(len(self.__players)):
+            role = ''
+            if playing_index == self.__landlord_index:
+                role = '地主'
+            else:
+                role = '农民'
+            self.__name_list.append(self.__players[playing_index].get_name() + ":" + role)
+
+        # 摸底牌
+        landlord = self.__players[self.__landlord_index]
+        remain_cards = self.__card_box.get_remain()
+        landlord.add_cards(remain_cards)
+        self.__send(self.__landlord_index, Message(my_card_list=landlord.get_card_str_list()))
+
+        # 生成每个玩家的出牌索引（手牌确定之后只生成一次，全部不叫重新发牌时不会生成）
+        for player in self.__players:
+            player.get_move_index()
+
+        # 展示底牌
+        self.__send_all(Message(f"地主是:{landlord.get_name()}", name_list=self.__name_list,
+                                remain_card_list=[str(card) for card in remain_cards], state=PLAY_STATE.WAIT))
+
+        # 出牌
+        self.__phase = PLAY_PHASE.PLAYING
+        self.__prompt_deal()
+
+    # 出牌提醒
+    def __prompt_deal(self):
+        card_count_list = []
+
+        # 统计 每个玩家的剩余牌数
+        for player in self.__players:
+            card_count_list.append(player.get_card_count())
+
+        self.__send_all(Message(card_count_list=card_count_list, state=PLAY_STATE.WAIT))
+
+        # 如果上次出牌者是本人，则说明没人出牌压它，所以可以出任意牌了
+        if self.__last_players_index == self.__players_index:
+            self.__last_card_order = None
+            self.__free_deal = True
+
+        if self.__free_deal:
+            if self.__notify_deal != True:
+                self.__send_all(Message(f"轮到【{self.__name_list[self.__players_index]}】出任意牌了", last_card_list=[]))
+                self.__notify_deal = True
+            self.__send(self.__players_index, Message(state=PLAY_STATE.FREE))
+        else:
+            if self.__notify_deal != True:
+                self.__send_all(Message(f"轮到【{self.__name_list[self.__players_index]}】出牌了"))
+                self.__notify_deal = True
+            self.__send(self.__players_index, Message(state=PLAY_STATE.PLAYING))
+
+    # 出牌阶段：处理一次出牌或者不出
+    def __deal(self, event, commend):
+        try:
+            # 出一次牌
+            if self.__free_deal:
+                self.free_deal_cards(event, commend)
+            else:
+                self.normal_deal_cards(event, commend)
+
+            self.__next_player()
+
+        except MyException as ex:
+            if ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ERROR:
+                raise ex
+            elif ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ALL:
+                self.__send_all(Message(ex.get_message()))
+            elif ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ONE:
+                self.__send(self.__players_index, Message(ex.get_message()))
+            else:
+                print(ex.get_message())
+
+            # 重新提醒出牌
+            self.__prompt_deal()
+
+    # 迭代下一个玩家，并判断是否胜利
+    def __next_player(self):
+        self.__players_index += 1
+        self.__players_index %= len(self.__players)
+        self.__free_deal = False
+        self.__notify_deal = False
+        self.__step += 1
+
+        # 判断是否胜利
+        for playing_index in range(len(self.__players)):
+            if self.__players[playing_index].get_card_count() == 0:
+                self.__send_all(Message(f"【{self.__name_list[playing_index]}】胜利！{Play.END_DELAY}秒后结束本局游戏", state=PLAY_STATE.WAIT))
+                self.__phase = PLAY_PHASE.GAME_OVER
+                self.__record.set_winner_index(playing_index)
+                return
+
+        self.__prompt_deal()
+
+    # 等待超时：叫分按不叫处理，出牌自动出出牌索引中最小的牌（跟牌时不用炸弹，没有能出的牌则不出），结束等待则结束本局
+    def __timeout(self):
+        if self.__phase == PLAY_PHASE.MARKING:
+            self.__mark("0")
+
+        elif self.__phase == PLAY_PHASE.PLAYING:
+            card_order = next(self.get_moves(), None)
+            if card_order is None or (not self.__free_deal and card_order.get_type() in PlayDominance.BOMB_TYPES):
+                self.__deal(PLAY_EVENT.PASS, None)
+            else:
+                self.__deal(PLAY_EVENT.PLAY, card_order)
+
+        elif self.__phase == PLAY_PHASE.GAME_OVER:
+            self.__outbound.append(Outbound(-1))
+            self.__phase = PLAY_PHASE.END
+            self.__step += 1
+
+    # 提示当前出牌玩家：发送提示的牌（客户端收到后选中这些牌），再次提示换下一个更大的牌
+    def __hint(self):
+        card_order = self.get_hint()
+        if card_order is None:
+            self.__send(self.__players_index, Message("没有能压过上家的牌", hint_card_list=[]))
+        else:
+            self.__send(self.__players_index, Message(f"提示：{card_order}", hint_card_list=card_order.get_card_str_list()))
+
+    # 解析出牌指令
+    # 出牌类型可以省略（由服务器判断）；AUTHORITATIVE 为 True 时忽略客户端发送的出牌类型
+    # 无网络对局（超时自动出牌、模拟）可以直接传入 CardOrder（创建时已经检查过牌型）
+    @staticmethod
+    def parse_card_order(commend):
+        if isinstance(commend, CardOrder):
+            return commend
 
+        card_str_list, cards_type = split_play_command(commend)
         card_list = CardOrder.make_card_list(card_str_list)
-        card_order = CardOrder(card_list, CardOrder.CARD_ORDER_TYPE(int(cards_type)))
+        if cards_type is None or Play.AUTHORITATIVE:
+            return CardOrder(card_list)
+
+        try:
+            cards_type = CardOrder.CARD_ORDER_TYPE(cards_type)
+        except ValueError as ex:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "无效的出牌类型")
+        return CardOrder(card_list, cards_type)
+
+    # 出一次任意牌
+    def free_deal_cards(self, event, commend):
+
+        # 用户不出牌
+        if event == PLAY_EVENT.PASS:
+            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "本次你为任意牌，必须出牌")
+
+        card_order = self.parse_card_order(commend)
+        self.__play_card_order(card_order)
+
+    # 出一次普通牌
+    def normal_deal_cards(self, event, commend):
+
+        # 用户不出牌
+        if event == PLAY_EVENT.PASS:  # 不出提醒消息
+            self.__send_all(Message(f"【{self.__name_list[self.__players_index]}】选择了不出", state=PLAY_STATE.WAIT))
+            self.__record.add_turn(self.__players_index, 0, 0)
+            return
+
+        card_order = self.parse_card_order(commend)
 
         # 与上局的牌比较大小
         if not self.compare_last(card_order):
             raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "出牌不符合规则")
 
+        self.__play_card_order(card_order)
+
+    # 打出一手牌（已经通过规则检查）
+    def __play_card_order(self, card_order):
+        playing = self.__players[self.__players_index]
+
         # 移除玩家手中的牌
-        playing.remove_cards(card_list)
+        playing.remove_cards(card_order.get_cards())
+        mask = 0
+        for card in card_order.get_cards():
+            mask |= 1 << card.get_id()
+        self.__record.add_turn(self.__players_index, mask, card_order.get_type().value)
 
         # 展示出牌
-        playing.send_message(Message(my_card_list=playing.get_card_str_list()))
-        self.__room.send_all_message(Message(last_card_player_index=self.__players_index,
-                                             last_card_list=card_order.get_card_str_list(),
-                                             last_card_type=card_order.get_type().name,
-                                             state=PLAY_STATE.WAIT))
+        self.__send(self.__players_index, Message(my_card_list=playing.get_card_str_list()))
+        self.__send_all(Message(last_card_player_index=self.__players_index,
+                                last_card_list=card_order.get_card_str_list(),
+                                last_card_type=card_order.get_type().name,
+                                state=PLAY_STATE.WAIT))
 
         # 存储本次出牌
         self.__last_card_order = card_order
         self.__last_players_index = self.__players_index
 
-    # 与上局的牌比较大小
+    # 与上局的牌比较大小（查 PlayDominance 的压制表）
     # 返回值   True    出牌比得过上局
     #         False   出牌不比上局大 或者 与上局牌类型不符
     def compare_last(self, card_order):
-
-        # 如果是王炸直接炸掉上局的牌
-        if card_order.get_type() == card_order.CARD_ORDER_TYPE["王炸"]:
-            return True
-
-        # 如果是炸弹
-        elif card_order.get_type() == card_order.CARD_ORDER_TYPE["炸弹"]:
-            # 如果上次出牌也是炸弹 则需要判断炸弹的大小
-            if self.__last_card_order.get_type() == card_order.CARD_ORDER_TYPE["炸弹"] \
-                    and card_order.get_power() <= self.__last_card_order.get_power():
-                return False
-            else:
-                return True  # 上局不为炸弹 或者 比上局的炸弹更大
-        else:
-            # 判断普通牌 出牌规则
-            # 1. 必须与上次出牌类型相同
-            # 2. 必须大于上次出牌的权值
-            # 3. 如果为 【"顺子", "连对", "飞机", "飞机带对子"】 则必须与上次出牌的数量相等
-            if card_order.get_type() != self.__last_card_order.get_type() \
-                    or card_order.get_power() <= self.__last_card_order.get_power() \
-                    or (str(card_order.get_type().name) in ["顺子", "连对", "飞机", "飞机带对子"] \
-                        and card_order.get_size() != self.__last_card_order.get_size()):
-                return False
-            else:
-                return True
-
-        return False
-
-    # 开始游戏
-    def start(self):
-
-        # 设置玩家名称
-        for playing in self.__players:
-            self.__name_list.append(playing.get_name())
-
-        for i in range(len(self.__players)):
-            player = self.__players[i]
-            player.send_message(Message("开始游戏!", name_list=self.__name_list, my_index=i))
-
-        # 叫分
-        self.marking()
-
-        # 出牌
-        self.deal()
+        return PlayDominance.beats(card_order.get_play_class(), self.__last_card_order.get_play_class())
 
 
 # 定义桌子类
+# 房间负责驱动一局游戏的状态机：把玩家指令和超时作为事件输入，再把输出的消息发送给玩家
+# 超时由服务器的时间轮调度；线程模式下每个房间一个线程等待所有玩家的输入，协程模式下由玩家的接收协程推送指令
 class Room:
+    RECORDER = None  # 对局记录的写入对象（RecordWriter），None 为不记录
+    BOT_FILL = None  # 人数不够时等待几秒后用机器人补满空座位（None 为不使用机器人，断线的玩家也不由机器人接替）
+    BOT_DELAY = 1.0  # 轮到机器人时等待几秒再操作（让玩家看清上一步）
+    BOT_WORKERS = 1  # 协程模式下搜索机器人操作的线程数（所有房间共用）
+    __bot_executor = None
 
     # 构造方法
-    def __init__(self, name):
+    def __init__(self, name, timer):
         self.__name = name
         self.__players = []
+        self.__timer = timer
+        self.__play = None  # 正在进行的一局游戏
+        self.__timeout = None  # 当前等待操作的超时定时器
+        self.__timeout_step = -1  # 超时定时器对应的等待步骤
+        self.__wakeup = None  # 线程模式下用来唤醒 select 的套接字对
+        self.__thread = None  # 线程模式下的房间线程
+        self.__running = False  # 房间线程是否继续运行
+        self.__lock = RLock()  # 线程模式下时间轮线程也会输入超时事件，需要加锁
+        self.__fill_timer = None  # 用机器人补满空座位的定时器
+        self.__bot_timer = None  # 轮到机器人操作的定时器
+        self.__tasks = collections.deque()  # 线程模式下交给房间线程执行的定时器回调 (回调, 参数)
+        self.__bot_count = 0  # 已经创建的机器人数（用于机器人名称）
 
     # 获取房间名称
     def get_name(self):
         return self.__name
 
-    # 发送全体消息
+    def get_timer(self):
+        return self.__timer
+
+    # 获取正在进行的一局游戏（没有则为 None）
+    def get_play(self):
+        return self.__play
+
+    # 发送全体消息（每种编码格式只序列化一次）
     def send_all_message(self, message, exclude=-1):
+        outbound = Outbound(0, message)
         for player_index in range(len(self.__players)):
             if player_index == exclude:
                 continue
-            self.__players[player_index].send_message(message)
+            player = self.__players[player_index]
+            player.send_encoded(outbound.get_body(player.get_codec()))
 
     # 结束本次游戏
     def stop_play(self):
         for player in self.__players:
             player.send_stop_play()
 
-    # 添加一个玩家
+    # 添加一个玩家（人满时接替房间中的一个机器人，正在游戏中则接着机器人的手牌继续本局）
     def add_player(self, player):
-        if len(self.__players) >= 3:
-            player.send_info("每桌最多3位玩家，玩家已经满了")
-            raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "每桌最多3位玩家，玩家已经满了")
+        with self.__lock:
+            bot = None
+            if len(self.__players) >= 3:
+                bots = [item for item in self.__players if item.is_bot()]
+                if not bots:
+                    player.send_info("每桌最多3位玩家，玩家已经满了")
+                    raise MyException(MyException.EXCEPTION_CODE_TYPE.ONE, "每桌最多3位玩家，玩家已经满了")
+                bot = bots[0]
+                self.__players[self.__players.index(bot)] = player
+            else:
+                self.__players.append(player)
 
-        self.__players.append(player)
+            self.__send_player_list("【" + player.get_name() + "】加入了房间")
+            if bot is not None:
+                self.__take_seat(bot, player)
 
-        name_list = []
-        for player in self.__players:
-            name_list.append(player.get_name())
-        for i in range(len(self.__players)):
-            player = self.__players[i]
-            player.send_message(Message("【" + player.get_name() + "】加入了房间", name_list=name_list, my_index=i))
+        self.__wake()
 
     def remove_player(self, item):
-        self.__players.remove(item)
-
-        name_list = []
-        for player in self.__players:
-            name_list.append(player.get_name())
-
+        with self.__lock:
+            if item not in self.__players:
+                return
+
+            # 正在叫分、出牌时由机器人接替（房间中还有其他玩家时）
+            play = self.__play
+            humans = [player for player in self.__players if player is not item and not player.is_bot()]
+            if (Room.BOT_FILL is not None and humans and play is not None and item in play.get_players()
+                    and play.get_phase() in (PLAY_PHASE.MARKING, PLAY_PHASE.PLAYING)):
+                bot = self.__create_bot()
+                self.__players[self.__players.index(item)] = bot
+                self.__take_seat(item, bot)
+                self.__wake()
+                return
+
+            self.__players.remove(item)
+            if not humans:
+                self.__players = []  # 只剩机器人时机器人也离开
+
+            # 正在游戏中则结束本局
+            if play is not None and item in play.get_players():
+                self.__play = None
+                self.__cancel_timeout()
+                self.__deliver(play, play.feed(PLAY_EVENT.DISCONNECT, play.get_players().index(item)))
+                self.__save_record(play)
+
+            self.__send_player_list(f"【{item.get_name()}】退出了房间")
+            self.stop_play()
+            self.__schedule_fill()
+
+        self.__wake()
+
+    # 发送房间的玩家列表
+    def __send_player_list(self, top_message):
+        name_list = [player.get_name() for player in self.__players]
         for i in range(len(self.__players)):
-            player = self.__players[i]
-            player.send_message(Message(f"【{item.get_name()}】退出了房间", name_list=name_list, my_index=i))
+            self.__players[i].send_message(Message(top_message, name_list=name_list, my_index=i))
+
+    def __create_bot(self):
+        self.__bot_count += 1
+        return BotPlayer(f"机器人{self.__bot_count}")
+
+    # 正在进行的一局中 seat 接替 item 的座位
+    def __take_seat(self, item, seat):
+        play = self.__play
+        players = play.get_players() if play is not None else []
+        if item in players:
+            self.__deliver(play, play.replace_player(players.index(item), seat))
+            self.__schedule_timeout(play)
+
+    # 人数不够时等待 BOT_FILL 秒后用机器人补满（房间中至少有一个玩家）
+    def __schedule_fill(self):
+        if Room.BOT_FILL is None or self.__fill_timer is not None or len(self.__players) == 0:
+            return
+        self.__fill_timer = self.__timer.schedule(Room.BOT_FILL, self.post, self.__fill_bots)
+
+    def __fill_bots(self):
+        with self.__lock:
+            self.__fill_timer = None
+            if self.__play is not None or not any(not player.is_bot() for player in self.__players):
+                return
+            while len(self.__players) < 3:
+                bot = self.__create_bot()
+                self.__players.append(bot)
+                self.__send_player_list(f"【{bot.get_name()}】加入了房间")
+            self.start_play()
+
+        self.__wake()
+
+    # 把一局游戏一步输出的消息发送给对应的玩家（每个玩家合并后只写一次）
+    # 一个玩家的消息编码失败或者连接断开不影响同一桌的其他玩家
+    def __deliver(self, play, outbound_list):
+        players = play.get_players()
+        targets = [[] for player in players]
+        for outbound in outbound_list:
+            for index in outbound.get_targets(len(players)):
+                targets[index].append(outbound)
+
+        for index in range(len(players)):
+            player = players[index]
+            if player.is_closed() or not targets[index]:
+                continue
+            try:
+                batch = OutboundBatch(player.get_codec())
+                for outbound in targets[index]:
+                    batch.add(outbound)
+                player.send_frames(batch.get_bodies())
+            except MyException as ex:
+                pass  # 连接已经断开，remove_player 会结束本局
+            except FrameError as ex:
+                print(f"【{player.get_name()}】的消息编码失败：{ex}")
+
+    # 开始一局游戏（人数不够或者正在游戏中则不开始）
+    def start_play(self):
+        with self.__lock:
+            if self.__play is not None:
+                return
+
+            if len(self.__players) != 3:
+                self.send_all_message(Message("等待其他玩家加入"))
+                self.__schedule_fill()
+                return
+
+            play = Play(self.__players)
+            self.__play = play
+            self.__deliver(play, play.start())
+            self.__schedule_timeout(play)
+
+    # 输入一个事件给正在进行的一局游戏
+    # event 为 None 时 data 为玩家发来的原始指令
+    def __feed(self, play, event, player_index=-1, data=None):
+        with self.__lock:
+            if play is not self.__play:
+                return
+
+            if event is None:
+                outbound_list = play.feed_command(player_index, data)
+            else:
+                outbound_list = play.feed(event, player_index, data)
+            self.__deliver(play, outbound_list)
 
-        self.stop_play()
+            if play.is_over():
+                self.__play = None
+                self.__cancel_timeout()
+                self.__save_record(play)
 
-    # 重复游戏
-    def while_play(self):
+                # 人数足够则直接开始下一局
+                self.start_play()
+            else:
+                self.__schedule_timeout(play)
+
+    # 一局结束后追加对局记录（一次写入）
+    @staticmethod
+    def __save_record(play):
+        if Room.RECORDER is None:
+            return
         try:
-            while True:
-                self.play()
+            Room.RECORDER.append(play.get_record())
+        except OSError as ex:
+            print(f"写入对局记录失败：{ex}")
 
-                if len(self.__players) != 3:
-                    break
+    # 等待的操作变化后重新设置超时
+    def __schedule_timeout(self, play):
+        if play.get_step() == self.__timeout_step:
+            return
 
-        except MyException as ex:
-            print(str(ex))
+        self.__cancel_timeout()
+        self.__timeout_step = play.get_step()
+        timeout = play.get_timeout()
+        if timeout is not None:
+            self.__timeout = self.__timer.schedule(timeout, self.post, self.on_timeout, play, play.get_step())
+
+        # 轮到机器人叫分、出牌
+        playing = play.get_players()[play.get_playing_index()]
+        if playing.is_bot() and play.get_phase() in (PLAY_PHASE.MARKING, PLAY_PHASE.PLAYING):
+            self.__bot_timer = self.__timer.schedule(Room.BOT_DELAY, self.post, self.on_bot_turn, play, play.get_step())
+
+    def __cancel_timeout(self):
+        if self.__timeout is not None:
+            self.__timeout.cancel()
+            self.__timeout = None
+        if self.__bot_timer is not None:
+            self.__bot_timer.cancel()
+            self.__bot_timer = None
+        self.__timeout_step = -1
+
+    # 收到玩家指令
+    def on_command(self, player, commend):
+        play = self.__play
+        if play is None or player not in play.get_players():
+            return
+        self.__feed(play, None, play.get_players().index(player), commend)
+
+    # 等待超时（step 与当前步骤不同说明超时已经过期）
+    def on_timeout(self, play, step):
+        with self.__lock:
+            if play.get_step() != step:
+                return
+            self.__feed(play, PLAY_EVENT.TIMEOUT)
+
+    # 执行时间轮到期的回调（心跳、超时、机器人操作、补满空座位）
+    # 线程模式下交给房间线程执行：所有房间共用的时间轮线程不写套接字、不等待房间的锁，一个客户端不读取不会拖住其他房间
+    # 协程模式下时间轮和房间在同一个事件循环中，直接执行
+    def post(self, callback, *args):
+        if self.__wakeup is None:
+            callback(*args)
+            return
+        self.__tasks.append((callback, args))
+        self.__wake()
+
+    # 轮到机器人操作（step 与当前步骤不同说明已经过期）
+    # 线程模式下在房间线程中搜索；协程模式下交给工作线程搜索，不阻塞所有房间共用的事件循环
+    def on_bot_turn(self, play, step):
+        with self.__lock:
+            if play is not self.__play or play.get_step() != step:
+                return
+            player_index = play.get_playing_index()
+            playing = play.get_players()[player_index]
+            if not playing.is_bot():
+                return
 
-    # 开始游戏
-    def play(self):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError as ex:
+                loop = None
+            if loop is None:
+                event, data = playing.decide(play)
+                self.__feed(play, event, player_index, data)
+                return
+
+            future = loop.run_in_executor(Room.__get_bot_executor(), playing.think, playing.observe(play))
+            future.add_done_callback(lambda future: self.__finish_bot(play, step, playing, future))
+
+    # 协程模式：机器人的搜索结果回到事件循环后输入游戏（搜索期间游戏已经变化则丢弃）
+    def __finish_bot(self, play, step, playing, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(future.exception())
+            return
+
+        with self.__lock:
+            if play is not self.__play or play.get_step() != step:
+                return
+            player_index = play.get_playing_index()
+            if play.get_players()[player_index] is not playing:
+                return
+            event, data = playing.finish(future.result())
+            self.__feed(play, event, player_index, data)
+
+    # 协程模式下搜索机器人操作的线程池（所有房间共用，第一次使用时创建）
+    @staticmethod
+    def __get_bot_executor():
+        if Room.__bot_executor is None:
+            Room.__bot_executor = ThreadPoolExecutor(Room.BOT_WORKERS, thread_name_prefix="bot")
+        return Room.__bot_executor
 
-        if len(self.__players) != 3:
-            self.send_all_message(Message("等待其他玩家加入"))
+    # 关闭搜索机器人操作的线程池（等待正在进行的搜索结束，之后使用时重新创建）
+    @staticmethod
+    def shutdown_bot_executor():
+        if Room.__bot_executor is not None:
+            Room.__bot_executor.shutdown()
+            Room.__bot_executor = None
+
+    # 唤醒线程模式下等待输入的线程（玩家列表发生了变化）
+    def __wake(self):
+        if self.__wakeup is not None:
+            try:
+                self.__wakeup[1].send(b'\0')
+            except OSError as ex:
+                pass
+
+    # 线程模式：启动房间线程（唤醒用的套接字对在启动前创建，之后到期的定时器回调都交给房间线程执行）
+    def start_thread(self, daemon=False):
+        self.__wakeup = socket.socketpair()
+        self.__running = True
+        self.__thread = Thread(target=self.while_receive, daemon=daemon)
+        self.__thread.start()
+
+    # 线程模式：结束房间线程并关闭唤醒用的套接字对（等待房间线程执行完已经交给它的回调，之后的回调直接执行）
+    def stop_thread(self):
+        if self.__thread is None:
             return
+        self.post(self.__end_thread)
+        self.__thread.join()
+        self.__thread = None
+        wakeup = self.__wakeup
+        self.__wakeup = None
+        for item in wakeup:
+            item.close()
+
+    def __end_thread(self):
+        self.__running = False
+
+    # 线程模式：循环等待房间内所有玩家的指令（每个房间一个线程，由 start_thread 启动，stop_thread 结束）
+    def while_receive(self):
+        while self.__running:
+            with self.__lock:
+                players = [player for player in self.__players if not player.is_closed() and not player.is_bot()]
 
-        p = Play(self, self.__players)
-        p.start()
+            try:
+                readable, _, _ = select.select(players + [self.__wakeup[0]], [], [])
+            except (ValueError, OSError) as ex:
+                continue  # 等待期间有玩家断开
+
+            for item in readable:
+                if item is self.__wakeup[0]:
+                    item.recv(1024)
+                    while self.__tasks:
+                        callback, args = self.__tasks.popleft()
+                        try:
+                            callback(*args)
+                        except Exception as ex:
+                            print(ex)
+                    continue
+
+                if item.is_closed():
+                    continue
+
+                try:
+                    for commend in item.receive():
+                        self.on_command(item, commend)
+                except MyException as ex:
+                    pass  # 玩家退出房间
+
+
+# 握手统计（线程模式和协程模式共用）
+# 记录握手的耗时、超时和失败次数，以及正在握手的连接数（握手队列深度）
+class HandshakeStats:
+    LATENCY_SAMPLES = 1024  # 计算耗时分位数时保留的最近样本数
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__accepted = 0  # 接收的连接数
+        self.__completed = 0  # 完成握手的连接数
+        self.__timed_out = 0  # 握手超时的连接数
+        self.__failed = 0  # 握手失败（断开、格式错误）的连接数
+        self.__pending = 0  # 正在握手的连接数
+        self.__max_pending = 0  # 正在握手的最大连接数
+        self.__latency_total = 0.0
+        self.__latency_max = 0.0
+        self.__latency_samples = collections.deque(maxlen=HandshakeStats.LATENCY_SAMPLES)
+
+    # 接收了一个连接，开始握手
+    def on_accept(self):
+        with self.__lock:
+            self.__accepted += 1
+            self.__pending += 1
+            self.__max_pending = max(self.__max_pending, self.__pending)
+
+    # 握手完成，latency 为握手耗时秒数
+    def on_complete(self, latency):
+        with self.__lock:
+            self.__completed += 1
+            self.__pending -= 1
+            self.__latency_total += latency
+            self.__latency_max = max(self.__latency_max, latency)
+            self.__latency_samples.append(latency)
+
+    def on_timeout(self):
+        with self.__lock:
+            self.__timed_out += 1
+            self.__pending -= 1
+
+    def on_fail(self):
+        with self.__lock:
+            self.__failed += 1
+            self.__pending -= 1
+
+    def get_accepted(self):
+        return self.__accepted
+
+    def get_completed(self):
+        return self.__completed
+
+    def get_timed_out(self):
+        return self.__timed_out
+
+    def get_failed(self):
+        return self.__failed
+
+    # 获取握手队列深度（正在握手的连接数）
+    def get_pending(self):
+        return self.__pending
+
+    def get_max_pending(self):
+        return self.__max_pending
+
+    # 获取平均握手耗时秒数
+    def get_latency_mean(self):
+        if self.__completed == 0:
+            return 0.0
+        return self.__latency_total / self.__completed
+
+    def get_latency_max(self):
+        return self.__latency_max
+
+    # 获取最近样本的握手耗时分位数（percent 为 0~100）
+    def get_latency_percentile(self, percent):
+        with self.__lock:
+            samples = sorted(self.__latency_samples)
+        if len(samples) == 0:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def __str__(self):
+        return f"握手: 接收 {self.__accepted} 完成 {self.__completed} 超时 {self.__timed_out} 失败 {self.__failed}" \
+               f" 队列 {self.__pending}(最大 {self.__max_pending})" \
+               f" 耗时 平均 {self.get_latency_mean() * 1000:.1f}ms" \
+               f" P50 {self.get_latency_percentile(50) * 1000:.1f}ms" \
+               f" P99 {self.get_latency_percentile(99) * 1000:.1f}ms" \
+               f" 最大 {self.__latency_max * 1000:.1f}ms"
+
+
+# 握手阶段（线程模式）
+# 接收连接的线程只负责 accept，握手在这个阶段的线程中用 select 同时等待所有正在握手的连接，
+# 慢的连接不会阻塞其他连接；握手超时由时间轮调度；完成握手的连接交给 on_done(handshake, clientsocket, addr) 分配房间
+class HandshakeStage:
+    TIMEOUT = 10  # 握手超时秒数
+
+    def __init__(self, timer, stats, on_done, timeout=TIMEOUT):
+        self.__timer = timer
+        self.__stats = stats
+        self.__on_done = on_done
+        self.__timeout = timeout
+        self.__pending = {}  # 套接字 -> [地址, 握手对象, 开始时间, 超时定时器, 是否已经超时]
+        self.__lock = Lock()
+        self.__wakeup = socket.socketpair()
+
+    # 添加一个刚接收的连接（接收连接的线程调用）
+    def add(self, clientsocket, addr):
+        self.__stats.on_accept()
+        clientsocket.setblocking(False)
+        entry = [addr, Handshake(MAX_COMMAND_SIZE), time.monotonic(), None, False]
+        with self.__lock:
+            self.__pending[clientsocket] = entry
+            entry[3] = self.__timer.schedule(self.__timeout, self.__expire, entry)
+        self.__wake()
+
+    # 握手超时（时间轮线程调用，由握手线程关闭连接）
+    def __expire(self, entry):
+        entry[4] = True
+        self.__wake()
+
+    def __wake(self):
+        try:
+            self.__wakeup[1].send(b'\0')
+        except OSError as ex:
+            pass
+
+    # 结束一个连接的握手
+    def __remove(self, clientsocket):
+        with self.__lock:
+            entry = self.__pending.pop(clientsocket)
+        entry[3].cancel()
+        return entry
+
+    # 循环等待所有正在握手的连接
+    def run(self):
+        while True:
+            with self.__lock:
+                pending = list(self.__pending.items())
+
+            for clientsocket, entry in pending:
+                if entry[4]:
+                    self.__remove(clientsocket)
+                    self.__stats.on_timeout()
+                    clientsocket.close()
+
+            readable, _, _ = select.select([clientsocket for clientsocket, entry in pending if not entry[4]]
+                                           + [self.__wakeup[0]], [], [])
+            for clientsocket in readable:
+                if clientsocket is self.__wakeup[0]:
+                    clientsocket.recv(1024)
+                    continue
+
+                entry = self.__pending[clientsocket]
+                try:
+                    if not entry[1].read_from(clientsocket):
+                        continue
+                except BlockingIOError as ex:
+                    continue
+                except (OSError, FrameError) as ex:
+                    self.__remove(clientsocket)
+                    self.__stats.on_fail()
+                    clientsocket.close()
+                    continue
+
+                self.__remove(clientsocket)
+                self.__stats.on_complete(time.monotonic() - entry[2])
+                try:
+                    self.__on_done(entry[1], clientsocket, entry[0])
+                except Exception as ex:
+                    print(ex)
+
+
+# 定时输出握手统计
+def report_stats(timer, stats, interval):
+    print(stats)
+    timer.schedule(interval, report_stats, timer, stats, interval)
 
 
 # 测试
@@ -1099,6 +1917,410 @@ def test():
         assert CardOrder([Card("3", "♥"), Card("3", "♥"), Card("3", "♥"), Card("大王", "")],
                          CardOrder.CARD_ORDER_TYPE["三带一"]).get_power() == 3
 
+        seat = Seat("甲")
+        seat.add_cards([Card("3", "♥"), Card("3", "♠"), Card("大王", "")])
+        assert seat.get_card_str_list() == ["大王", "♥3", "♠3"]
+        try:
+            seat.remove_cards([Card("3", "♥"), Card("3", "♥")])
+        except MyException as ex:
+            assert ex.get_code() == MyException.EXCEPTION_CODE_TYPE.WARNING
+        else:
+            assert False, "移除了没有的牌"
+        seat.remove_cards([Card("3", "♥"), Card("大王", "")])
+        assert seat.get_card_count() == 1 and seat.get_hand().get_smallest() == Card("3", "♠")
+
+        # 出牌类型可以省略，由服务器判断
+        assert Play.parse_card_order("♥3 ♠3").get_type() == CardOrder.CARD_ORDER_TYPE["一对"]
+        assert Play.parse_card_order("♥10 ♠1002").get_type() == CardOrder.CARD_ORDER_TYPE["一对"]
+        for commend in ["♥3 ♠4", "♥3 ♠301", "♥399"]:
+            try:
+                Play.parse_card_order(commend)
+            except MyException as ex:
+                assert ex.get_code() == MyException.EXCEPTION_CODE_TYPE.ONE
+            else:
+                assert False, "错误的出牌通过了检查"
+        Play.AUTHORITATIVE = True
+        try:
+            assert Play.parse_card_order("♥3 ♠301").get_type() == CardOrder.CARD_ORDER_TYPE["一对"]
+        finally:
+            Play.AUTHORITATIVE = False
+
+        # 无网络对局：每次出生成的第一种牌，生成的出牌都能通过规则检查和比较
+        play = Play([Seat("甲"), Seat("乙"), Seat("丙")])
+        play.start()
+        play.feed(PLAY_EVENT.BID, 1, "3")
+        play.feed(PLAY_EVENT.BID, 0, "3")
+        while play.get_phase() == PLAY_PHASE.PLAYING:
+            moves = list(play.get_moves())
+            assert len(set(str(move) for move in moves)) == len(moves)
+            for move in moves:
+                assert play.is_free_deal() or play.compare_last(move)
+                assert Play.parse_card_order(str(move) + f"{move.get_type().value:02}").get_power() == move.get_power()
+            # 提示依次给出生成的每一种牌，全部提示过后从头开始
+            for i in range(min(len(moves), 3) + 1):
+                outbound_list = play.feed_command(play.get_playing_index(), "提示")
+                hint_card_list = outbound_list[0].get_data().get_data()['hint_card_list']
+                expected = moves[i].get_card_str_list() if i < len(moves) else moves[0].get_card_str_list() if moves else []
+                assert hint_card_list == expected
+            if len(moves) > 0:
+                play.feed_command(play.get_playing_index(), str(moves[0]) + f"{moves[0].get_type().value:02}")
+            else:
+                play.feed_command(play.get_playing_index(), "pass")
+        assert play.get_phase() == PLAY_PHASE.GAME_OVER
+
+        # 对局记录可以编码、解码，并且能通过规则引擎重放
+        record = play.get_record()
+        winner_index = [player.get_card_count() for player in play.get_players()].index(0)
+        assert record.get_landlord_index() == play.get_landlord_index() == 0
+        assert record.get_bids() == [3] and record.get_winner_index() == winner_index
+        assert GameRecord.decode(record.encode()) == record and replay(record) == winner_index
+
+        # 无网络对局：地主每次超时自动出牌，农民都不出，直到地主胜利
+        play = Play([Seat("甲"), Seat("乙"), Seat("丙")])
+        play.start()
+        play.feed(PLAY_EVENT.BID, 1, "3")
+        assert play.get_phase() == PLAY_PHASE.MARKING
+        play.feed(PLAY_EVENT.BID, 0, "3")
+        assert play.get_phase() == PLAY_PHASE.PLAYING and play.get_landlord_index() == 0
+        assert play.get_players()[0].get_card_count() == 20 and len(play.get_players()[0].get_cards()) == 20
+        while play.get_phase() == PLAY_PHASE.PLAYING:
+            if play.get_playing_index() == 0:
+                play.feed(PLAY_EVENT.TIMEOUT)
+            else:
+                play.feed_command(play.get_playing_index(), "pass")
+        assert play.get_phase() == PLAY_PHASE.GAME_OVER
+        assert play.get_players()[0].get_card_count() == 0
+        outbound_list = play.feed(PLAY_EVENT.TIMEOUT)
+        assert play.is_over() and outbound_list[0].get_code() == -1
+
+        # 王炸之后下家可以用炸弹压（与原来的比较规则一致）
+        play = Play([Seat("甲"), Seat("乙"), Seat("丙")], random.Random(1))
+        play.start()
+        while play.get_phase() == PLAY_PHASE.MARKING:
+            play.feed(PLAY_EVENT.BID, play.get_playing_index(), "3")
+        landlord_index = play.get_landlord_index()
+        next_index = (landlord_index + 1) % 3
+        players = play.get_players()
+        players[landlord_index].clear()
+        players[landlord_index].add_cards(CardOrder.make_card_list(["小王", "大王", "♥3"]))
+        players[next_index].clear()
+        players[next_index].add_cards(CardOrder.make_card_list(["♥4", "◆4", "♣4", "♠4", "♥5"]))
+        play.feed_command(landlord_index, "小王 大王")
+        assert play.get_playing_index() == next_index and not play.is_free_deal()
+        moves = list(play.get_moves())
+        assert [str(move.get_type().name) for move in moves] == ["炸弹"]
+        assert play.compare_last(moves[0])
+        play.feed_command(next_index, "♥4 ◆4 ♣4 ♠4")
+        assert players[next_index].get_card_str_list() == ["♥5"]
+        assert play.get_playing_index() == (next_index + 1) % 3
+
+        # 相同种子的随机数生成器发出相同的牌；全部不叫时用同一副牌重新发牌
+        card_lists = []
+        for i in range(2):
+            play = Play([Seat("甲"), Seat("乙"), Seat("丙")], random.Random(3))
+            play.start()
+            card_lists.append([player.get_card_str_list() for player in play.get_players()])
+            for player_index in range(3):
+                play.feed(PLAY_EVENT.BID, player_index, "0")
+            assert play.get_phase() == PLAY_PHASE.MARKING
+            assert sum(player.get_card_count() for player in play.get_players()) == 51
+            assert [player.get_card_str_list() for player in play.get_players()] != card_lists[-1]
+        assert card_lists[0] == card_lists[1]
+
+        # 出牌后出牌索引增量更新，与重新生成的结果一致
+        seat = Seat("甲")
+        seat.add_cards(CardOrder.make_card_list(["♥3", "♠3", "◆3", "♥4", "♠4", "♥5", "♥6", "♥7", "大王"]))
+        assert len(seat.get_move_index()) == len(list(PlayTable.generate_moves(seat.get_hand())))
+        seat.remove_cards(CardOrder.make_card_list(["♥3", "♥4"]))
+        assert set(seat.get_move_index().get_moves()) == set(PlayTable.generate_moves(seat.get_hand()))
+
+        # 牌编号、出牌类型编号与二进制协议一致
+        assert [card.get_id() for card in CardOrder.make_card_list(["◆3", "♥2", "小王", "大王"])] == [0, 51, 52, 53]
+        assert Card.from_id(CARD_IDS["♣10"]) == Card("10", "♣")
+        assert tuple(card_type.name for card_type in CardOrder.CARD_ORDER_TYPE) == CARD_TYPE_NAMES
+
+        # 出站消息批次：字段合并为一帧，顶端消息重复或者其他编码的消息另起一帧
+        batch = OutboundBatch()
+        batch.add(Outbound(0, Message(card_count_list=[17, 17, 20], state=PLAY_STATE.WAIT)))
+        batch.add(Outbound(0, Message("轮到【甲:地主】出牌了")))
+        batch.add(Outbound(0, Message(state=PLAY_STATE.PLAYING)))
+        batch.add(Outbound(0, Message("【甲:地主】选择了不出")))
+        batch.add(Outbound(-1))
+        bodies = batch.get_bodies()
+        assert len(bodies) == 3 and bodies[2] == Outbound(-1).get_body()
+        assert json.loads(bodies[0] + JSON_CODEC.encode_recipient("甲")) == {'code': 0, 'player': "甲", 'data': {
+            'card_count_list': [17, 17, 20], 'state': PLAY_STATE.PLAYING.value, 'top_message': "轮到【甲:地主】出牌了"}}
+
+        # 机器人：三个机器人无网络对局，叫分、出牌都符合规则
+        bots = [BotPlayer(name, 0.005, random.Random(seed)) for seed, name in enumerate(["甲", "乙", "丙"])]
+        play = Play(bots, random.Random(7))
+        play.start()
+        for i in range(300):
+            if play.get_phase() not in (PLAY_PHASE.MARKING, PLAY_PHASE.PLAYING):
+                break
+            player_index = play.get_playing_index()
+            event, data = bots[player_index].decide(play)
+            step = play.get_step()
+            play.feed(event, player_index, data)
+            assert play.get_step() != step, "机器人的操作没有被接受"
+        assert play.get_phase() == PLAY_PHASE.GAME_OVER
+        assert replay(play.get_record()) == play.get_record().get_winner_index()
+
+        # 机器人看到的局面：另外两个座位只知道合计，地主手中还没出的底牌是已知的
+        view = play.get_table_view(1)
+        landlord_index = play.get_landlord_index()
+        assert view.get_unseen() == sum(player.get_hand().get_signature() for player in play.get_players()) - \
+            bots[1].get_hand().get_signature()
+        assert view.get_sizes() == [player.get_card_count() for player in play.get_players()]
+        if landlord_index != 1:
+            bottom = play.get_record().get_bottom_mask()
+            assert view.get_known()[landlord_index] == get_mask_signature(bots[landlord_index].get_hand().get_mask() & bottom)
+
+        # 房间：人数不够时用机器人补满，玩家加入时接替机器人，玩家断线时由机器人接替
+        class TestSeat(Seat):  # 记录收到的消息体的座位（代替网络连接）
+            def __init__(self, name):
+                super().__init__(name)
+                self.bodies = []
+
+            def is_closed(self):
+                return False
+
+            def get_codec(self):
+                return JSON_CODEC
+
+            def send_frames(self, bodies):
+                self.bodies.extend(bodies)
+
+            def send_encoded(self, body):
+                self.bodies.append(body)
+
+            def send_message(self, message):
+                self.send_encoded(JSON_CODEC.encode_message(0, message.get_data()))
+
+            def send_info(self, message):
+                self.send_encoded(JSON_CODEC.encode_message(1, message))
+
+            def send_stop_play(self):
+                self.send_encoded(JSON_CODEC.get_stop_body())
+
+        bot_settings = (Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET)
+        Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET = 1.0, 0.1, 0.005
+        try:
+            now = [0.0]
+            timer = TimerWheel(tick=0.05, slot_count=64, clock=lambda: now[0])
+            room = Room("机器人", timer)
+            human = TestSeat("玩家")
+            room.add_player(human)
+            room.start_play()
+            assert room.get_play() is None
+            now[0] = 1.1
+            timer.advance()
+            play = room.get_play()
+            assert play is not None and [player.is_bot() for player in play.get_players()] == [False, True, True]
+
+            joined = None
+            for i in range(1000):
+                if play.get_phase() != PLAY_PHASE.MARKING and play.get_phase() != PLAY_PHASE.PLAYING:
+                    break
+                playing = play.get_players()[play.get_playing_index()]
+                if playing is human:
+                    room.on_command(human, "3" if play.get_phase() == PLAY_PHASE.MARKING else
+                                    str(next(play.get_moves(), "pass")))
+                elif playing is joined:
+                    room.on_command(joined, str(next(play.get_moves())) if play.is_free_deal() else "pass")
+                else:
+                    now[0] += 0.2
+                    timer.advance()
+
+                # 第二个玩家加入时接替机器人的手牌，断线后又由机器人接替
+                if i == 3:
+                    bot = play.get_players()[1]
+                    joined = TestSeat("玩家2")
+                    room.add_player(joined)
+                    assert play.get_players()[1] is joined and joined.get_cards() and not bot.get_cards()
+                if i == 12:
+                    cards = joined.get_cards()
+                    room.remove_player(joined)
+                    assert play.get_players()[1].is_bot() and play.get_players()[1].get_cards() == cards
+                    joined = None
+            assert play.get_phase() == PLAY_PHASE.GAME_OVER and play.get_landlord_index() == 0
+            assert replay(play.get_record()) == play.get_record().get_winner_index()
+
+            # 最后一个玩家离开时机器人也离开
+            room.remove_player(human)
+            assert room.get_play() is None
+            now[0] += 2
+            timer.advance()
+            assert room.get_play() is None
+        finally:
+            Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET = bot_settings
+
+        # 协程模式：机器人在工作线程中搜索，拨动时间轮不等待搜索，结果回到事件循环后才输入游戏
+        # （只检查先后顺序，不检查耗时：服务器启动时都会运行测试，繁忙的机器上耗时不稳定）
+        async def bot_in_executor():
+            now = [0.0]
+            timer = TimerWheel(tick=0.05, slot_count=64, clock=lambda: now[0])
+            room = Room("协程", timer)
+            human = TestSeat("玩家")
+            room.add_player(human)
+            room.start_play()
+            now[0] = Room.BOT_FILL + 0.1
+            timer.advance()
+            play = room.get_play()
+            bot_turns = 0
+            while bot_turns < 4 and play.get_phase() in (PLAY_PHASE.MARKING, PLAY_PHASE.PLAYING):
+                if play.get_players()[play.get_playing_index()] is human:
+                    room.on_command(human, "3" if play.get_phase() == PLAY_PHASE.MARKING else
+                                    str(next(play.get_moves(), "pass")))
+                    continue
+
+                step = play.get_step()
+                now[0] += Room.BOT_DELAY + 0.1
+                timer.advance()
+                # 搜索在事件循环中执行时拨动时间轮就已经输入了结果
+                assert play.get_step() == step
+                while play.get_step() == step:
+                    await asyncio.sleep(0.001)
+                assert room.get_play() is play
+                bot_turns += 1
+            assert bot_turns == 4
+
+        bot_settings = (Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET)
+        Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET = 1.0, 0.1, 0.2
+        try:
+            asyncio.run(bot_in_executor())
+        finally:
+            Room.shutdown_bot_executor()
+            Room.BOT_FILL, Room.BOT_DELAY, BotPlayer.BUDGET = bot_settings
+
+        # 协程模式：客户端一直不读取时没有发送出去的数据超过上限，断开连接
+        async def unread_client():
+            server_end, client_end = socket.socketpair()
+            try:
+                reader, writer = await asyncio.open_connection(sock=server_end)
+                player = AsyncPlayer("玩家", reader, writer, Room("协程", TimerWheel(clock=lambda: 0.0)))
+                try:
+                    for i in range(100000):
+                        player.send_info("x" * 1000)
+                except MyException as ex:
+                    pass
+                assert player.is_closed()
+                await asyncio.sleep(0)
+            finally:
+                client_end.close()
+
+        write_limit = AsyncPlayer.WRITE_LIMIT
+        AsyncPlayer.WRITE_LIMIT = 1 << 16
+        try:
+            asyncio.run(unread_client())
+        finally:
+            AsyncPlayer.WRITE_LIMIT = write_limit
+
+        # 一个玩家的消息编码失败（二进制格式的玩家列表中有超长的名称）不影响同一桌的其他玩家开始游戏
+        class BinarySeat(TestSeat):
+            def get_codec(self):
+                return BINARY_CODEC
+
+        seats = [TestSeat("名" * 100), BinarySeat("二进制"), TestSeat("玩家")]
+        room = Room("编码", TimerWheel(clock=lambda: 0.0))
+        for seat in seats:
+            room.add_player(seat)
+        counts = [len(seat.bodies) for seat in seats]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            room.start_play()
+        assert output.getvalue().startswith("【二进制】的消息编码失败")
+        assert room.get_play() is not None and room.get_play().get_phase() == PLAY_PHASE.MARKING
+        assert len(seats[0].bodies) > counts[0] and len(seats[2].bodies) > counts[2] and len(seats[1].bodies) == counts[1]
+
+        # 线程模式：时间轮到期的回调交给房间线程执行；客户端一直不读取时写套接字超时并断开，不会一直阻塞
+        send_timeout = Player.SEND_TIMEOUT
+        Player.SEND_TIMEOUT = 0.2
+        server_end, client_end = socket.socketpair()
+        now = [0.0]
+        timer = TimerWheel(tick=0.1, slot_count=8, clock=lambda: now[0])
+        room = Room("线程", timer)
+        try:
+            room.start_thread()
+            threads = []
+            room.post(lambda: threads.append(current_thread()))
+            player = Player("玩家", server_end, ("127.0.0.1", 0), room)
+            room.add_player(player)
+            now[0] = Player.HEARTBEAT_INTERVAL + 0.1
+            timer.advance()  # 心跳只是交给房间线程
+            for i in range(100):
+                if threads:
+                    break
+                time.sleep(0.01)
+            assert threads and threads[0] is not current_thread()
+
+            start = time.monotonic()
+            try:
+                for i in range(100000):
+                    player.send_info("x" * 1000)
+            except MyException as ex:
+                pass
+            assert player.is_closed() and time.monotonic() - start < 5
+        finally:
+            Player.SEND_TIMEOUT = send_timeout
+            room.stop_thread()
+            server_end.close()
+            client_end.close()
+
+        # 线程模式：成帧正确但无法解码的二进制指令只断开这个玩家，房间线程继续运行
+        socket_pairs = [socket.socketpair() for i in range(3)]
+        room = Room("解码", TimerWheel(clock=lambda: 0.0))
+        try:
+            room.start_thread()
+            players = [Player(f"玩家{i}", socket_pairs[i][0], ("127.0.0.1", i), room, codec=BINARY_CODEC)
+                       for i in range(3)]
+            for player in players:
+                room.add_player(player)
+            room.start_play()
+            socket_pairs[0][1].sendall(b"\x00\x01\x05")
+            for i in range(100):
+                if players[0].is_closed():
+                    break
+                time.sleep(0.01)
+            assert players[0].is_closed() and not players[1].is_closed() and not players[2].is_closed()
+            done = []
+            room.post(done.append, True)
+            for i in range(100):
+                if done:
+                    break
+                time.sleep(0.01)
+            assert done and room.get_play() is None
+        finally:
+            room.stop_thread()
+            for server_end, client_end in socket_pairs:
+                server_end.close()
+                client_end.close()
+
+        # 握手统计
+        stats = HandshakeStats()
+        for latency in [0.001, 0.003, 0.002]:
+            stats.on_accept()
+            stats.on_complete(latency)
+        stats.on_accept()
+        stats.on_accept()
+        stats.on_timeout()
+        assert stats.get_pending() == 1 and stats.get_max_pending() == 2 and stats.get_timed_out() == 1
+        assert stats.get_latency_percentile(50) == 0.002 and stats.get_latency_max() == 0.003
+
+        # 时间轮：只执行到期且没有取消的定时器
+        now = [0.0]
+        fired = []
+        timer = TimerWheel(tick=0.1, slot_count=8, clock=lambda: now[0])
+        timer.schedule(0.25, fired.append, "a")
+        timer.schedule(2.0, fired.append, "b")  # 超过一圈
+        timer.schedule(0.5, fired.append, "c").cancel()
+        now[0] = 0.3
+        assert timer.advance() == 1 and fired == ["a"]
+        now[0] = 1.9
+        assert timer.advance() == 0
+        now[0] = 2.05
+        assert timer.advance() == 1 and fired == ["a", "b"]
+
     except MyException as ex:
         print("没有通过测试")
         print(ex.get_message())
@@ -1109,36 +2331,287 @@ def test():
         raise ex
 
 
-if __name__ == '__main__':
+# 线程模式：一个线程接收连接，一个线程握手，一个线程拨动时间轮，每个房间一个线程等待玩家输入
+def serve_thread(host, port, stats_interval=0):
+    room_map = {}
+    timer = TimerWheel()
+    stats = HandshakeStats()
+    Thread(target=timer.run_forever).start()
+    if stats_interval > 0:
+        timer.schedule(stats_interval, report_stats, timer, stats, stats_interval)
+
+    # 完成握手后分配房间（在握手线程中执行）
+    # 加入房间时要给房间内的玩家发消息，交给房间线程执行：握手线程不写套接字，一个客户端不读取不会拖住其他连接的握手
+    def on_handshake(handshake, clientsocket, addr):
+        room_name = handshake.get_room_name()
+
+        if room_name not in room_map.keys():
+            room_map[room_name] = Room(room_name, timer)
+            room_map[room_name].start_thread()
+
+        room = room_map[room_name]
+        room.post(join_room, room, handshake, clientsocket, addr)
+
+    # 玩家加入房间并开始游戏（在房间线程中执行）
+    def join_room(room, handshake, clientsocket, addr):
+        player = Player(handshake.get_player_name(), clientsocket, addr, room, handshake.get_reader(),
+                        handshake.get_codec())
+        try:
+            room.add_player(player)
+        except MyException as ex:
+            player.close()
+            raise ex
 
-    test()
+        room.start_play()
 
-    room_map = {}
+        # 握手之后已经收到的指令
+        for commend in handshake.get_commands():
+            room.on_command(player, commend)
+
+    stage = HandshakeStage(timer, stats, on_handshake)
+    Thread(target=stage.run).start()
 
     # 创建 socket 对象
     serversocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    host = "0.0.0.0"
-    port = 9999
     serversocket.bind((host, port))
-    serversocket.listen(5)
+    serversocket.listen(128)
 
-    index = 0
     while True:
         try:
-            # 建立客户端连接
+            # 建立客户端连接（握手交给握手线程）
             clientsocket, addr = serversocket.accept()
-            name = str(clientsocket.recv(20).decode('utf-8')).strip().split("\n")
-            room_name = name[0].strip()
-            player_name = name[1].strip()
+            stage.add(clientsocket, addr)
+        except Exception as ex:
+            print(ex)
 
-            if room_name not in room_map.keys():
-                room_map[room_name] = Room(room_name)
 
-            room = room_map[room_name]
-            room.add_player(Player(player_name, clientsocket, addr, room))
+# 协程模式：接收连接、握手、心跳（时间轮）和出牌流程全部运行在同一个事件循环中
+async def serve_asyncio(host, port, stats_interval=0):
+    room_map = {}
+    timer = TimerWheel()
+    stats = HandshakeStats()
+    ticker = asyncio.ensure_future(timer.run_async())
+    if stats_interval > 0:
+        timer.schedule(stats_interval, report_stats, timer, stats, stats_interval)
+
+    # 握手：依次读取房间名称和玩家名称两帧（以及可选的二进制格式请求）
+    async def read_handshake(reader):
+        handshake = Handshake(MAX_COMMAND_SIZE)
+        while True:
+            data = await reader.read(4096)
+            if len(data) == 0:
+                raise ConnectionError("握手未完成连接已经关闭")
+            if handshake.feed(data):
+                return handshake
+
+    async def on_connect(reader, writer):
+        stats.on_accept()
+        start = time.monotonic()
+        try:
+            handshake = await asyncio.wait_for(read_handshake(reader), HandshakeStage.TIMEOUT)
+        except asyncio.TimeoutError as ex:
+            stats.on_timeout()
+            writer.close()
+            return
+        except (OSError, FrameError) as ex:
+            stats.on_fail()
+            writer.close()
+            return
+        stats.on_complete(time.monotonic() - start)
 
-            Thread(target=room.while_play).start()
+        await serve_player(room_map, timer, reader, writer, handshake.get_room_name(), handshake.get_player_name(),
+                           handshake.get_reader(), handshake.get_codec(), handshake.get_commands())
+
+    server = await asyncio.start_server(on_connect, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+# 协程模式：把完成握手的连接加入房间，并接收玩家指令直到连接关闭
+# commands 为握手之后已经收到的指令
+async def serve_player(room_map, timer, reader, writer, room_name, player_name, frame_reader, codec, commands):
+    try:
+        if room_name not in room_map.keys():
+            room_map[room_name] = Room(room_name, timer)
+
+        room = room_map[room_name]
+        player = AsyncPlayer(player_name, reader, writer, room, frame_reader, codec)
+        try:
+            room.add_player(player)
         except MyException as ex:
-            print(ex)
+            player.close()
+            raise ex
+
+        room.start_play()
+
+        for commend in commands:
+            room.on_command(player, commend)
+
+        await player.while_receive()
+    except MyException as ex:
+        print(ex)
+    except Exception as ex:
+        print(ex)
+
+
+# 多进程模式：主进程接收连接并握手，然后按房间名称把连接交给固定的工作进程（同一个房间的玩家总在同一个进程中）
+# 工作进程以协程模式运行房间；一个工作进程崩溃只影响它自己的房间，主进程会为之后的连接重新启动它
+class WorkerPool:
+
+    def __init__(self, count, end_delay, authoritative=False, record_dir=None, bot_fill=None, bot_budget=BotPlayer.BUDGET):
+        self.__end_delay = end_delay
+        self.__authoritative = authoritative
+        self.__record_dir = record_dir
+        self.__bot_fill = bot_fill
+        self.__bot_budget = bot_budget
+        self.__context = multiprocessing.get_context("spawn")
+        self.__workers = [self.__start_worker() for i in range(count)]
+
+    # 启动一个工作进程，返回 (进程, 连接)
+    def __start_worker(self):
+        conn, child_conn = self.__context.Pipe()
+        process = self.__context.Process(target=run_worker, args=(child_conn, self.__end_delay, self.__authoritative,
+                                                                     self.__record_dir, self.__bot_fill, self.__bot_budget),
+                                         daemon=True)
+        process.start()
+        child_conn.close()
+        return process, conn
+
+    # 房间对应的工作进程下标
+    def get_worker_index(self, room_name):
+        return zlib.crc32(room_name.encode("utf-8")) % len(self.__workers)
+
+    # 把完成握手的连接交给房间对应的工作进程（在握手线程中执行）
+    def hand_off(self, handshake, clientsocket, addr):
+        index = self.get_worker_index(handshake.get_room_name())
+        info = (handshake.get_room_name(), handshake.get_player_name(), handshake.get_codec().get_name(),
+                handshake.get_commands(), handshake.get_reader().take_pending())
+
+        for retry in range(2):
+            process, conn = self.__workers[index]
+            if process.is_alive():
+                try:
+                    conn.send(info)
+                    reduction.send_handle(conn, clientsocket.fileno(), process.pid)
+                    break
+                except OSError as ex:
+                    process.join(1)  # 工作进程正在退出
+
+            print(f"工作进程 {index} 已经退出，重新启动")
+            conn.close()
+            self.__workers[index] = self.__start_worker()
+
+        # 连接已经复制到工作进程中
+        clientsocket.close()
+
+
+# 工作进程入口
+def run_worker(conn, end_delay, authoritative=False, record_dir=None, bot_fill=None, bot_budget=BotPlayer.BUDGET):
+    Play.END_DELAY = end_delay
+    Play.AUTHORITATIVE = authoritative
+    Room.BOT_FILL = bot_fill
+    BotPlayer.BUDGET = bot_budget
+    if record_dir is not None:
+        Room.RECORDER = open_recorder(record_dir)
+    asyncio.run(serve_worker(conn))
+
+
+# 工作进程：接收主进程交来的连接，以协程模式运行房间
+async def serve_worker(conn):
+    room_map = {}
+    timer = TimerWheel()
+    ticker = asyncio.ensure_future(timer.run_async())
+    loop = asyncio.get_running_loop()
+    closed = asyncio.Event()
+
+    async def adopt(clientsocket, info):
+        room_name, player_name, codec_name, commands, pending = info
+        reader, writer = await asyncio.open_connection(sock=clientsocket)
+        codec = CODECS[codec_name]
+        frame_reader = codec.create_reader(MAX_COMMAND_SIZE)
+        try:
+            commands = commands + [codec.decode_command(frame) for frame in frame_reader.feed(pending)]
+        except FrameError as ex:
+            writer.close()
+            return
+        await serve_player(room_map, timer, reader, writer, room_name, player_name, frame_reader, codec, commands)
+
+    def on_hand_off():
+        try:
+            info = conn.recv()
+            clientsocket = socket.socket(fileno=reduction.recv_handle(conn))
+        except (EOFError, OSError) as ex:
+            # 主进程已经退出
+            loop.remove_reader(conn.fileno())
+            closed.set()
+            return
+        clientsocket.setblocking(False)
+        asyncio.ensure_future(adopt(clientsocket, info))
+
+    loop.add_reader(conn.fileno(), on_hand_off)
+    await closed.wait()
+
+
+# 打开对局记录文件：每个进程写自己的段文件 games-<进程号>.seg，不需要进程间加锁
+def open_recorder(record_dir):
+    os.makedirs(record_dir, exist_ok=True)
+    return RecordWriter(os.path.join(record_dir, f"games-{os.getpid()}.seg"))
+
+
+# 多进程模式：主进程一个线程接收连接，一个线程握手，握手完成后交给 workers 个工作进程
+def serve_process(host, port, workers, stats_interval=0, end_delay=Play.END_DELAY, authoritative=False, record_dir=None,
+                  bot_fill=None, bot_budget=BotPlayer.BUDGET):
+    pool = WorkerPool(workers, end_delay, authoritative, record_dir, bot_fill, bot_budget)
+    timer = TimerWheel()
+    stats = HandshakeStats()
+    Thread(target=timer.run_forever, daemon=True).start()
+    if stats_interval > 0:
+        timer.schedule(stats_interval, report_stats, timer, stats, stats_interval)
+
+    stage = HandshakeStage(timer, stats, pool.hand_off)
+    Thread(target=stage.run, daemon=True).start()
+
+    serversocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    serversocket.bind((host, port))
+    serversocket.listen(128)
+
+    while True:
+        try:
+            clientsocket, addr = serversocket.accept()
+            stage.add(clientsocket, addr)
         except Exception as ex:
             print(ex)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="斗地主服务器")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--mode", choices=["thread", "asyncio", "process"], default="thread",
+                        help="thread: 每个房间一个线程; asyncio: 单个事件循环处理所有连接; process: 多个工作进程（按房间分配）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="多进程模式的工作进程数")
+    parser.add_argument("--stats-interval", type=float, default=0, help="定时输出握手统计的间隔秒数（0 为不输出）")
+    parser.add_argument("--end-delay", type=float, default=Play.END_DELAY, help="胜利后结束本局前的等待秒数")
+    parser.add_argument("--authoritative", action="store_true", help="忽略客户端发送的出牌类型，全部由服务器判断")
+    parser.add_argument("--record-dir", help="对局记录目录（每局结束时追加到段文件，用 poker_record.py 重放）")
+    parser.add_argument("--bots", type=float, default=None, metavar="SECONDS",
+                        help="人数不够时等待几秒后用机器人补满空座位，断线的玩家也由机器人接替（默认不使用机器人）")
+    parser.add_argument("--bot-budget", type=float, default=BotPlayer.BUDGET, help="机器人每次出牌的搜索秒数")
+    args = parser.parse_args()
+
+    test()
+    Play.END_DELAY = args.end_delay
+    Play.AUTHORITATIVE = args.authoritative
+    Room.BOT_FILL = args.bots
+    BotPlayer.BUDGET = args.bot_budget
+    if args.record_dir is not None and args.mode != "process":
+        Room.RECORDER = open_recorder(args.record_dir)
+
+    if args.mode == "asyncio":
+        asyncio.run(serve_asyncio(args.host, args.port, args.stats_interval))
+    elif args.mode == "process":
+        serve_process(args.host, args.port, args.workers, args.stats_interval, args.end_delay, args.authoritative,
+                      args.record_dir, args.bots, args.bot_budget)
+    else:
+        serve_thread(args.host, args.port, args.stats_interval)
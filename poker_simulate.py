@@ -0,0 +1,262 @@
+# 无网络的自我对局模拟（平衡性调整、机器人评估、回归检查）
+# 直接驱动服务器的 Play（叫分、出牌、比较大小的规则都与联网对局相同），三个座位由进程内的智能体操作
+# 用法：python poker_simulate.py --games 10000 [--workers 4] [--seed 1] [--chunk 500] [--agents greedy,greedy,greedy]
+# 第 i 局使用种子 seed + i 的随机数生成器洗牌并提供给智能体，所以同一个种子的结果完全相同（与进程数、分块大小无关）
+# 对局按分块分配给进程池，每完成一块输出一次累计结果
+
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import poker_ai
+from poker_ai import SearchPlayer
+from poker_server import Play, Seat, CardOrder, PLAY_EVENT, PLAY_PHASE
+from poker_rules import PlayDominance
+
+SEAT_NAMES = ["甲", "乙", "丙"]
+MAX_GAME_STEPS = 2000  # 一局最多的操作次数（智能体一直出不合法的牌时结束模拟）
+
+
+# 贪心智能体：按手牌中的大牌叫分，每次出出牌索引中最小的牌（跟牌时不用炸弹，与超时自动出牌相同）
+class GreedyAgent:
+    NAME = "greedy"
+
+    # 叫分（0~3）：2、大小王和炸弹越多叫分越高
+    def bid(self, play, player_index, rng):
+        hand = play.get_players()[player_index].get_hand()
+        score = hand.get_count(12) + hand.get_count(13) + hand.get_count(14) * 2
+        score += 2 * sum(1 for count in hand.get_counts()[:13] if count == 4)
+        return min(3, score // 2)
+
+    # 出牌：返回要出的 CardOrder，不出时返回 None
+    def play(self, play, player_index, rng):
+        card_order = next(play.get_moves(), None)
+        if card_order is None or (not play.is_free_deal() and card_order.get_type() in PlayDominance.BOMB_TYPES):
+            return None
+        return card_order
+
+
+# 随机智能体：随机叫分，从所有能出的牌中随机出一种（跟牌时也可以不出）
+class RandomAgent:
+    NAME = "random"
+
+    def bid(self, play, player_index, rng):
+        return rng.randint(0, 3)
+
+    def play(self, play, player_index, rng):
+        moves = list(play.get_moves())
+        if not play.is_free_deal():
+            moves.append(None)
+        return rng.choice(moves)
+
+
+# 搜索智能体：与服务器端的机器人相同（poker_ai），每次出牌最多模拟 PLAYOUTS 次（不按时间限制，同一个种子的结果相同）
+class SearchAgent:
+    NAME = "search"
+    PLAYOUTS = 100
+
+    def __init__(self):
+        self.__search = SearchPlayer(60, None, SearchAgent.PLAYOUTS)
+
+    def bid(self, play, player_index, rng):
+        return poker_ai.bid(play.get_players()[player_index].get_hand().get_counts(), play.get_max_mark())
+
+    def play(self, play, player_index, rng):
+        self.__search.set_rng(rng)
+        move = self.__search.choose(play.get_table_view(player_index))
+        if move is None:
+            return None
+        return CardOrder(play.get_players()[player_index].get_hand().pick_cards(move[0]), move[1])
+
+
+AGENTS = {agent.NAME: agent for agent in (GreedyAgent, RandomAgent, SearchAgent)}
+
+
+# 模拟统计（可以合并多个分块的结果）
+class SimulationStats:
+
+    def __init__(self):
+        self.__games = 0  # 局数
+        self.__landlord_wins = 0  # 地主胜利的局数
+        self.__seat_landlords = [0, 0, 0]  # 每个座位当地主的局数
+        self.__seat_wins = [0, 0, 0]  # 每个座位胜利（地主胜利或者所在的农民一方胜利）的局数
+        self.__steps = 0  # 出牌阶段的操作次数（出牌和不出）
+        self.__redeals = 0  # 全部不叫重新发牌的次数
+        self.__marks = 0  # 叫分的总和
+        self.__elapsed = 0  # 模拟耗时（各个进程的耗时之和）
+
+    # 记录一局的结果
+    def add_game(self, landlord_index, winner_index, steps, redeals, mark):
+        self.__games += 1
+        self.__seat_landlords[landlord_index] += 1
+        if winner_index == landlord_index:
+            self.__landlord_wins += 1
+            self.__seat_wins[landlord_index] += 1
+        else:
+            for seat_index in range(3):
+                if seat_index != landlord_index:
+                    self.__seat_wins[seat_index] += 1
+        self.__steps += steps
+        self.__redeals += redeals
+        self.__marks += mark
+
+    def add_elapsed(self, elapsed):
+        self.__elapsed += elapsed
+
+    def get_games(self):
+        return self.__games
+
+    def get_landlord_wins(self):
+        return self.__landlord_wins
+
+    def get_seat_landlords(self):
+        return self.__seat_landlords.copy()
+
+    def get_seat_wins(self):
+        return self.__seat_wins.copy()
+
+    def get_steps(self):
+        return self.__steps
+
+    def get_redeals(self):
+        return self.__redeals
+
+    def get_marks(self):
+        return self.__marks
+
+    def get_elapsed(self):
+        return self.__elapsed
+
+    # 合并其他分块的统计
+    def merge(self, other):
+        self.__games += other.get_games()
+        self.__landlord_wins += other.get_landlord_wins()
+        self.__seat_landlords = [a + b for a, b in zip(self.__seat_landlords, other.get_seat_landlords())]
+        self.__seat_wins = [a + b for a, b in zip(self.__seat_wins, other.get_seat_wins())]
+        self.__steps += other.get_steps()
+        self.__redeals += other.get_redeals()
+        self.__marks += other.get_marks()
+        self.__elapsed += other.get_elapsed()
+
+    # 比较结果（不比较耗时）
+    def get_result(self):
+        return (self.__games, self.__landlord_wins, tuple(self.__seat_landlords), tuple(self.__seat_wins),
+                self.__steps, self.__redeals, self.__marks)
+
+    def __str__(self):
+        games = max(self.__games, 1)
+        seats = "  ".join(f"{SEAT_NAMES[i]} 地主 {self.__seat_landlords[i]} 胜 {self.__seat_wins[i] / games:.1%}" for i in range(3))
+        rate = self.__games / self.__elapsed if self.__elapsed > 0 else 0
+        return (f"局数: {self.__games}  地主胜率: {self.__landlord_wins / games:.1%}  平均叫分: {self.__marks / games:.2f}"
+                f"  平均出牌步数: {self.__steps / games:.1f}  重新发牌: {self.__redeals}\n"
+                f"{seats}\n"
+                f"单进程每秒: {rate:.0f} 局")
+
+
+# 模拟一局，返回 (地主下标, 胜利者下标, 出牌阶段操作次数, 重新发牌次数, 叫分)
+def run_game(seed, agents):
+    rng = random.Random(seed)
+    play = Play([Seat(name) for name in SEAT_NAMES], rng)
+    play.start()
+
+    steps = 0
+    redeals = 0
+    mark = 0
+    for i in range(MAX_GAME_STEPS):
+        phase = play.get_phase()
+        player_index = play.get_playing_index()
+        agent = agents[player_index]
+
+        if phase == PLAY_PHASE.MARKING:
+            bid = agent.bid(play, player_index, rng)
+            mark = max(mark, bid)
+            play.feed(PLAY_EVENT.BID, player_index, str(bid))
+            # 三个人都不叫时重新发牌，又从第一个人开始叫分
+            if play.get_phase() == PLAY_PHASE.MARKING and play.get_playing_index() == 0:
+                redeals += 1
+
+        elif phase == PLAY_PHASE.PLAYING:
+            card_order = agent.play(play, player_index, rng)
+            if card_order is None:
+                play.feed(PLAY_EVENT.PASS, player_index)
+            else:
+                play.feed(PLAY_EVENT.PLAY, player_index, card_order)
+            steps += 1
+
+        else:
+            break
+    else:
+        raise RuntimeError(f"第 {seed} 局超过 {MAX_GAME_STEPS} 次操作没有结束")
+
+    winner_index = [player.get_card_count() for player in play.get_players()].index(0)
+    return play.get_landlord_index(), winner_index, steps, redeals, mark
+
+
+# 模拟一块对局（进程池的任务）：种子为 seed ~ seed + count - 1
+def run_chunk(seed, count, agent_names):
+    agents = [AGENTS[name]() for name in agent_names]
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for game_seed in range(seed, seed + count):
+        stats.add_game(*run_game(game_seed, agents))
+    stats.add_elapsed(time.perf_counter() - start)
+    return stats
+
+
+# 分块并行模拟，每完成一块调用一次 on_chunk(累计结果)，返回全部结果
+def simulate(games, seed=1, workers=1, chunk=500, agent_names=("greedy", "greedy", "greedy"), on_chunk=None):
+    stats = SimulationStats()
+    chunks = [(seed + start, min(chunk, games - start)) for start in range(0, games, chunk)]
+
+    if workers <= 1:
+        for chunk_seed, count in chunks:
+            stats.merge(run_chunk(chunk_seed, count, agent_names))
+            if on_chunk is not None:
+                on_chunk(stats)
+        return stats
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(run_chunk, chunk_seed, count, agent_names) for chunk_seed, count in chunks]
+        for future in as_completed(futures):
+            stats.merge(future.result())
+            if on_chunk is not None:
+                on_chunk(stats)
+    return stats
+
+
+# 测试
+def test():
+    # 相同种子的结果相同，与分块大小、进程数无关
+    result = simulate(20, seed=5, chunk=7).get_result()
+    assert result == simulate(20, seed=5, chunk=20).get_result()
+    assert result == simulate(20, seed=5, chunk=5, workers=2).get_result()
+    assert result[0] == 20 and sum(result[2]) == 20 and sum(result[3]) == result[1] + (20 - result[1]) * 2
+
+    stats = simulate(10, seed=1, agent_names=("random", "greedy", "random"))
+    assert stats.get_games() == 10 and stats.get_steps() > 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="斗地主自我对局模拟")
+    parser.add_argument("--games", type=int, default=10000, help="对局数")
+    parser.add_argument("--seed", type=int, default=1, help="第一局的种子")
+    parser.add_argument("--workers", type=int, default=1, help="进程数")
+    parser.add_argument("--chunk", type=int, default=500, help="每个任务的对局数")
+    parser.add_argument("--agents", default="greedy,greedy,greedy", help=f"三个座位的智能体（{', '.join(AGENTS)}）")
+    args = parser.parse_args()
+
+    agent_names = args.agents.split(",")
+    if len(agent_names) != 3 or any(name not in AGENTS for name in agent_names):
+        parser.error(f"--agents 必须是三个智能体名称（{', '.join(AGENTS)}）")
+
+    test()
+
+    start = time.perf_counter()
+
+    def report(stats):
+        print(f"已完成 {stats.get_games()}/{args.games} 局  {stats.get_games() / (time.perf_counter() - start):.0f} 局/秒", flush=True)
+
+    stats = simulate(args.games, args.seed, args.workers, args.chunk, agent_names, report)
+    print(stats)
+    print(f"总耗时: {time.perf_counter() - start:.2f}s  每秒: {stats.get_games() / (time.perf_counter() - start):.0f} 局")